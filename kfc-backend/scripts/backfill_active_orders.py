@@ -0,0 +1,68 @@
+"""
+Script para poblar el índice disperso ActiveIndex con los pedidos activos
+existentes (creados antes de que existieran ActivePK/ActiveSK).
+
+Uso:
+    ORDERS_TABLE=kfc-orders-dev python scripts/backfill_active_orders.py <tenantId>
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from boto3.dynamodb.conditions import Key  # noqa: E402
+
+from src.utils.dynamodb import get_orders_table, query_all_items  # noqa: E402
+from src.models.order_status import ACTIVE_STATUSES  # noqa: E402
+from src.services.order_transitions import active_index_keys  # noqa: E402
+
+
+def backfill_tenant(tenant_id):
+    """Add or remove the ActiveIndex keys for every order of a tenant"""
+    table = get_orders_table()
+    added = 0
+    removed = 0
+
+    for order in query_all_items(
+        table,
+        Key('PK').eq(f'TENANT#{tenant_id}') & Key('SK').begins_with('ORDER#')
+    ):
+        key = {'PK': order['PK'], 'SK': order['SK']}
+        is_active = order.get('status') in ACTIVE_STATUSES
+
+        if is_active and 'ActivePK' not in order:
+            keys = active_index_keys(
+                tenant_id, order['orderId'], order.get('createdAt', ''))
+            table.update_item(
+                Key=key,
+                UpdateExpression='SET ActivePK = :pk, ActiveSK = :sk',
+                ExpressionAttributeValues={
+                    ':pk': keys['ActivePK'],
+                    ':sk': keys['ActiveSK']
+                }
+            )
+            added += 1
+        elif not is_active and 'ActivePK' in order:
+            table.update_item(
+                Key=key,
+                UpdateExpression='REMOVE ActivePK, ActiveSK'
+            )
+            removed += 1
+
+    return added, removed
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python scripts/backfill_active_orders.py <tenantId>")
+        sys.exit(1)
+
+    tenant_id = sys.argv[1]
+    print(f"🔄 Actualizando ActiveIndex para tenant {tenant_id}...")
+    added, removed = backfill_tenant(tenant_id)
+    print(f"✅ Pedidos activos indexados: {added}")
+    print(f"🧹 Pedidos cerrados removidos del índice: {removed}")
+
+
+if __name__ == "__main__":
+    main()
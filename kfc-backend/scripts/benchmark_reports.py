@@ -0,0 +1,114 @@
+"""
+Benchmark de los motores de reportes: agregación Python (OrderAggregator)
+contra el motor vectorizado con NumPy (ColumnarAggregator).
+
+Genera pedidos sintéticos en memoria (no usa DynamoDB), calcula las métricas
+de los reportes de ventas y de desempeño con ambos motores, verifica que los
+resultados coincidan y muestra los tiempos.
+
+Uso:
+    python scripts/benchmark_reports.py [pedidos] [días]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.order_status import OrderStatus  # noqa: E402
+from src.services.order_analytics import OrderAggregator  # noqa: E402
+from src.services.columnar_analytics import ColumnarAggregator, HAS_NUMPY  # noqa: E402
+
+
+STATUSES = [s.value for s in OrderStatus]
+STEPS = ['RECEIVED', 'COOKING', 'PACKING', 'DELIVERY']
+MENU = [(f'item-{i}', f'Producto {i}', round(5 + i * 1.5, 2)) for i in range(60)]
+
+
+def generate_orders(count, days):
+    """Pedidos sintéticos repartidos en los últimos `days` días"""
+    random.seed(42)
+    now = datetime.utcnow()
+    orders = []
+    for i in range(count):
+        created = now - timedelta(seconds=random.randint(0, days * 86400))
+        status = random.choice(STATUSES)
+        items = [
+            {'itemId': item_id, 'name': name, 'price': price, 'quantity': random.randint(1, 4)}
+            for item_id, name, price in random.sample(MENU, random.randint(1, 5))
+        ]
+        steps = []
+        step_start = created
+        for step in STEPS:
+            step_end = step_start + timedelta(minutes=random.randint(2, 25))
+            steps.append({
+                'step': step,
+                'staffId': f'staff-{random.randint(1, 40)}',
+                'staffName': 'Staff',
+                'startTime': step_start.isoformat(),
+                'endTime': step_end.isoformat()
+            })
+            step_start = step_end
+        orders.append({
+            'orderId': f'order-{i}',
+            'createdAt': created.isoformat(),
+            'status': status,
+            'total': sum(item['price'] * item['quantity'] for item in items),
+            'customerId': f'customer-{random.randint(1, count // 10 + 1)}',
+            'items': items,
+            'workflow': {
+                'steps': steps,
+                'totalTimeMinutes': (step_start - created).total_seconds() / 60
+            }
+        })
+    return orders
+
+
+def timed(label, aggregator_class, orders, metrics, **filters):
+    """Ejecuta una agregación y devuelve (segundos, agregador)"""
+    started = time.perf_counter()
+    aggregator = aggregator_class(metrics).consume(orders, **filters)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<8} {elapsed * 1000:9.1f} ms")
+    return elapsed, aggregator
+
+
+def main():
+    if not HAS_NUMPY:
+        print("❌ NumPy no está instalado: pip install numpy")
+        sys.exit(1)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+
+    print(f"📦 Generando {count} pedidos en {days} días...")
+    orders = generate_orders(count, days)
+    start = datetime.utcnow() - timedelta(days=days)
+
+    reports = [
+        ('Ventas', ('totals', 'periods', 'hours', 'items'),
+         {'start': start, 'exclude_statuses': [OrderStatus.CANCELLED.value]}),
+        ('Desempeño', ('totals', 'steps', 'fulfillment'),
+         {'start': start, 'include_statuses': [OrderStatus.COMPLETED.value]}),
+    ]
+
+    for name, metrics, filters in reports:
+        print(f"📊 Reporte de {name}")
+        python_time, python_result = timed('python', OrderAggregator, orders, metrics, **filters)
+        numpy_time, numpy_result = timed('numpy', ColumnarAggregator, orders, metrics, **filters)
+
+        assert python_result.orders == numpy_result.orders
+        assert abs(python_result.revenue - numpy_result.revenue) < 0.01 * max(1, python_result.revenue)
+        if 'items' in metrics:
+            assert [i['name'] for i in python_result.top_items(10)] == \
+                [i['name'] for i in numpy_result.top_items(10)]
+        if 'steps' in metrics:
+            assert python_result.step_summary().keys() == numpy_result.step_summary().keys()
+
+        print(f"  ✅ Resultados iguales, aceleración x{python_time / numpy_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
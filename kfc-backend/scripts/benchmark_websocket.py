@@ -0,0 +1,88 @@
+"""
+Benchmark del broadcast por WebSocket: envío secuencial contra el envío
+concurrente con el pool de hilos de send_to_connections.
+
+Levanta un servidor HTTP local que imita la API de administración de API
+Gateway (POST /@connections/{connectionId}) con una latencia fija por
+mensaje, y mide el tiempo de un broadcast a 10, 100 y 1000 conexiones.
+
+Uso:
+    python scripts/benchmark_websocket.py [latencia_ms] [workers]
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Credenciales y región ficticias: el stub no valida la firma
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils import websocket  # noqa: E402
+
+
+CONNECTION_COUNTS = (10, 100, 1000)
+
+
+def make_stub_handler(latency_seconds):
+    class StubHandler(BaseHTTPRequestHandler):
+        # Keep-alive, como API Gateway
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency_seconds)
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def timed_broadcast(connection_ids, message, workers):
+    """Envía un mensaje a todas las conexiones y devuelve (segundos, enviados)"""
+    started = time.perf_counter()
+    outcomes = websocket.send_to_connections(connection_ids, message, max_workers=workers)
+    elapsed = time.perf_counter() - started
+    sent = sum(1 for outcome in outcomes.values() if outcome == websocket.SENT)
+    return elapsed, sent
+
+
+def main():
+    latency_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else websocket.FANOUT_MAX_WORKERS
+
+    server = StubServer(('127.0.0.1', 0), make_stub_handler(latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['WEBSOCKET_API_ENDPOINT'] = f'http://127.0.0.1:{server.server_port}'
+
+    message = {'type': 'order_update', 'payload': {'orderId': 'benchmark', 'status': 'COOKING'}}
+    print(f"📡 Stub en el puerto {server.server_port}, latencia {latency_ms} ms, {workers} workers")
+    print(f"  {'conexiones':>10} {'secuencial':>12} {'concurrente':>12} {'aceleración':>12}")
+
+    for count in CONNECTION_COUNTS:
+        connection_ids = [f'conn-{i}' for i in range(count)]
+        sequential, sent_sequential = timed_broadcast(connection_ids, message, 1)
+        concurrent, sent_concurrent = timed_broadcast(connection_ids, message, workers)
+        assert sent_sequential == sent_concurrent == count
+        print(f"  {count:>10} {sequential * 1000:>9.1f} ms {concurrent * 1000:>9.1f} ms "
+              f"{'x' + format(sequential / concurrent, '.1f'):>12}")
+
+    server.shutdown()
+    print("✅ Benchmark completado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Script para recalcular los agregados del dashboard (AGG#HOUR#..., AGG#DAY#...,
+los sketches de duración de pasos AGG#SKETCH#..., los sketches de clientes
+AGG#CUSTOMERS#... y los de productos más vendidos AGG#TOPITEMS#...) a partir
+del historial de pedidos de un tenant.
+
+Uso:
+    ORDERS_TABLE=kfc-orders-dev python scripts/rebuild_dashboard_aggregates.py <tenantId> [desde] [hasta]
+
+Las fechas son YYYY-MM-DD (inclusive). Sin fechas se recalcula todo el historial.
+Conviene ejecutarlo fuera de horas pico: los eventos que lleguen durante el
+recálculo pueden contarse dos veces.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.order_aggregates import rebuild_aggregates, DAY_PREFIX  # noqa: E402
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python scripts/rebuild_dashboard_aggregates.py <tenantId> [desde] [hasta]")
+        sys.exit(1)
+
+    tenant_id = sys.argv[1]
+    start_day = sys.argv[2] if len(sys.argv) > 2 else None
+    end_day = sys.argv[3] if len(sys.argv) > 3 else None
+
+    print(f"📊 Recalculando agregados del dashboard para tenant {tenant_id}...")
+    buckets = rebuild_aggregates(tenant_id, start_day, end_day)
+
+    days = sorted(sk for sk in buckets if sk.startswith(DAY_PREFIX))
+    for sk in days:
+        bucket = buckets[sk]
+        print(f"  {sk[len(DAY_PREFIX):]}: {int(bucket['orders'])} pedidos, "
+              f"S/ {bucket['revenue']:.2f}")
+
+    print(f"✅ Buckets recalculados: {len(buckets)} ({len(days)} días)")
+
+
+if __name__ == "__main__":
+    main()
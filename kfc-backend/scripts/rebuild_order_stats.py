@@ -0,0 +1,39 @@
+"""
+Script para recalcular las estadísticas diarias de pedidos (STATS#DAY#...)
+a partir del historial de pedidos de un tenant.
+
+Uso:
+    ORDERS_TABLE=kfc-orders-dev python scripts/rebuild_order_stats.py <tenantId> [desde] [hasta]
+
+Las fechas son YYYY-MM-DD (inclusive). Sin fechas se recalcula todo el historial.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.order_stats import rebuild_daily_stats  # noqa: E402
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python scripts/rebuild_order_stats.py <tenantId> [desde] [hasta]")
+        sys.exit(1)
+
+    tenant_id = sys.argv[1]
+    start_day = sys.argv[2] if len(sys.argv) > 2 else None
+    end_day = sys.argv[3] if len(sys.argv) > 3 else None
+
+    print(f"📊 Recalculando estadísticas para tenant {tenant_id}...")
+    days = rebuild_daily_stats(tenant_id, start_day, end_day)
+
+    for day in sorted(days):
+        counters = days[day]
+        print(f"  {day}: {int(counters['totalOrders'])} pedidos, "
+              f"S/ {counters['totalRevenue']:.2f}")
+
+    print(f"✅ Días recalculados: {len(days)}")
+
+
+if __name__ == "__main__":
+    main()
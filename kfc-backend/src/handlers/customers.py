@@ -7,9 +7,16 @@ from datetime import datetime
 from boto3.dynamodb.conditions import Key
 
 from src.utils.response import (
-    success_response, created_response, error_response, not_found_response
+    success_response, created_response, error_response, not_found_response,
+    not_modified_response, too_many_requests_response
 )
 from src.utils.dynamodb import get_users_table, get_orders_table, put_item, get_item, query_items, update_item
+from src.utils.websocket import broadcast_new_order
+from src.utils.events import publish_order_event
+from src.services.order_transitions import update_order_fields, active_index_keys
+from src.services.order_versions import order_etag, check_not_modified
+from src.services.admission import admit_order, release_order, KitchenAtCapacityError
+from src.services.order_stats import record_order_created
 
 
 def get_customer_profile_handler(event, context):
@@ -309,6 +316,11 @@ def track_order_handler(event, context):
         if not tenant_id or not order_id:
             return error_response('Tenant ID and Order ID are required')
 
+        # Unchanged polls are answered from a projected version read
+        etag = check_not_modified(event, tenant_id, order_id, 'track')
+        if etag:
+            return not_modified_response(etag)
+
         table = get_orders_table()
 
         order = get_item(table, {
@@ -378,8 +390,9 @@ def track_order_handler(event, context):
             'trackingSteps': tracking_steps,
             'estimatedMinutes': estimated_time,
             'createdAt': order.get('createdAt'),
-            'deliveryPerson': order.get('deliveryPerson')
-        })
+            'deliveryPerson': order.get('deliveryPerson'),
+            'version': order.get('version')
+        }, headers={'ETag': order_etag(order, 'track')})
 
     except Exception as e:
         print(f"Track order error: {str(e)}")
@@ -422,15 +435,11 @@ def rate_order_handler(event, context):
 
         now = datetime.utcnow().isoformat()
 
-        update_item(
-            table,
-            {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
-            {
-                'rating': rating,
-                'ratingComment': comment,
-                'ratedAt': now
-            }
-        )
+        update_order_fields(tenant_id, order_id, {
+            'rating': rating,
+            'ratingComment': comment,
+            'ratedAt': now
+        })
 
         return success_response({
             'orderId': order_id,
@@ -465,6 +474,14 @@ def reorder_handler(event, context):
         if not original_order:
             return not_found_response('Order not found')
 
+        try:
+            admission = admit_order(tenant_id, original_order.get('locationId'))
+        except KitchenAtCapacityError as e:
+            return too_many_requests_response(
+                'Kitchen is at capacity, please retry later',
+                e.retry_after
+            )
+
         # Create new order with same items
         new_order_id = str(ulid.new())
         now = datetime.utcnow().isoformat()
@@ -472,8 +489,13 @@ def reorder_handler(event, context):
         new_order = {
             'PK': f'TENANT#{tenant_id}',
             'SK': f'ORDER#{new_order_id}',
-            'GSI1PK': f'TENANT#{tenant_id}',
-            'GSI1SK': f'STATUS#PENDING#{now}',
+            # Same index keys as create_order_handler, so the reorder shows
+            # up by status, by customer and among the active orders
+            'GSI1PK': f'TENANT#{tenant_id}#STATUS#PENDING',
+            'GSI1SK': now,
+            'GSI2PK': f'TENANT#{tenant_id}#CUSTOMER#{original_order.get("customerId")}',
+            'GSI2SK': now,
+            **active_index_keys(tenant_id, new_order_id, now),
             'orderId': new_order_id,
             'tenantId': tenant_id,
             'customerId': original_order.get('customerId'),
@@ -487,17 +509,55 @@ def reorder_handler(event, context):
             'deliveryAddress': original_order.get('deliveryAddress'),
             'orderType': original_order.get('orderType'),
             'status': 'PENDING',
+            # Same starting history and workflow as create_order_handler;
+            # transitions write into workflow.steps and assignedStaff
+            'statusHistory': [
+                {
+                    'status': 'PENDING',
+                    'timestamp': now,
+                    'message': 'Pedido repetido por el cliente'
+                }
+            ],
+            'workflow': {
+                'currentStep': 'PENDING',
+                'steps': [],
+                'assignedStaff': {}
+            },
             'reorderedFrom': order_id,
+            'locationId': original_order.get('locationId'),
+            'kitchenId': admission['kitchenId'],
+            'admittedAt': admission['admittedAt'],
+            'estimatedDeliveryTime': 45 + admission['extraWaitMinutes'],
+            'version': 1,
             'createdAt': now,
             'updatedAt': now
         }
 
-        put_item(table, new_order)
-
-        new_order.pop('PK', None)
-        new_order.pop('SK', None)
-        new_order.pop('GSI1PK', None)
-        new_order.pop('GSI1SK', None)
+        try:
+            put_item(table, new_order)
+        except Exception:
+            release_order(tenant_id, admission['kitchenId'])
+            raise
+
+        # A reorder is a new order: count it, notify staff and publish it
+        # like create_order_handler does
+        try:
+            record_order_created(tenant_id, new_order)
+        except Exception as stats_error:
+            print(f"Order statistics update error: {str(stats_error)}")
+
+        try:
+            broadcast_new_order(tenant_id, new_order)
+        except Exception as ws_error:
+            print(f"WebSocket broadcast error: {str(ws_error)}")
+
+        try:
+            publish_order_event('OrderCreated', tenant_id, new_order_id, new_order)
+        except Exception as event_error:
+            print(f"EventBridge publish error: {str(event_error)}")
+
+        for key in ('PK', 'SK', 'GSI1PK', 'GSI1SK', 'GSI2PK', 'GSI2SK', 'ActivePK', 'ActiveSK'):
+            new_order.pop(key, None)
 
         return created_response(new_order, 'Order created successfully')
 
@@ -2,13 +2,18 @@
 Dashboard handlers for analytics and reporting
 """
 import json
-from datetime import datetime, timedelta
 from collections import defaultdict
+from datetime import datetime, timedelta
 from boto3.dynamodb.conditions import Key, Attr
 
 from src.utils.response import success_response, error_response
-from src.utils.dynamodb import get_orders_table, query_items, scan_items
+from src.utils.dynamodb import get_orders_table, query_items, query_all_items, scan_items
 from src.models.order_status import OrderStatus, WORKFLOW_STEPS, get_status_display_name
+from src.services.order_aggregates import (
+    get_dashboard_totals, apply_order_event, get_step_percentiles, record_customer,
+    get_top_items, use_exact_top_items
+)
+from src.utils.websocket import get_presence
 
 
 def get_dashboard_handler(event, context):
@@ -22,15 +27,7 @@ def get_dashboard_handler(event, context):
 
         query_params = event.get('queryStringParameters') or {}
         date_range = query_params.get('range', 'today')  # today, week, month
-
-        table = get_orders_table()
-
-        # Get all orders for the tenant
-        orders = query_items(
-            table,
-            Key('PK').eq(f'TENANT#{tenant_id}') & Key(
-                'SK').begins_with('ORDER#')
-        )
+        exact_items = query_params.get('exactItems', '').lower() == 'true'
 
         now = datetime.utcnow()
 
@@ -44,100 +41,43 @@ def get_dashboard_handler(event, context):
         else:
             start_date = now - timedelta(days=1)
 
-        filtered_orders = []
-        for order in orders:
-            created_at = order.get('createdAt', '')
-            try:
-                order_date = datetime.fromisoformat(
-                    created_at.replace('Z', '+00:00'))
-                if order_date.replace(tzinfo=None) >= start_date:
-                    filtered_orders.append(order)
-            except:
-                pass
-
-        # Calculate statistics
-        total_orders = len(filtered_orders)
-        total_revenue = sum(order.get('total', 0) for order in filtered_orders)
-
-        # Orders by status
-        status_counts = defaultdict(int)
-        for order in filtered_orders:
-            status_counts[order.get('status', 'UNKNOWN')] += 1
-
-        # Active orders (not completed or cancelled)
-        active_statuses = [
-            OrderStatus.PENDING.value,
-            OrderStatus.RECEIVED.value,
-            OrderStatus.COOKING.value,
-            OrderStatus.PACKING.value,
-            OrderStatus.DELIVERY.value
-        ]
-        active_orders = [o for o in filtered_orders if o.get(
-            'status') in active_statuses]
-
-        # Calculate average preparation time (from RECEIVED to PACKED)
-        completed_orders = [o for o in filtered_orders if o.get(
-            'status') == OrderStatus.COMPLETED.value]
-        avg_prep_time = 0
-        if completed_orders:
-            total_prep_time = 0
-            valid_orders = 0
-            for order in completed_orders:
-                workflow = order.get('workflow', {})
-                total_time = workflow.get('totalTimeMinutes', 0)
-                if total_time > 0:
-                    total_prep_time += total_time
-                    valid_orders += 1
-            if valid_orders > 0:
-                avg_prep_time = total_prep_time / valid_orders
-
-        # Orders by hour (for chart)
-        orders_by_hour = defaultdict(int)
-        for order in filtered_orders:
-            created_at = order.get('createdAt', '')
-            try:
-                order_date = datetime.fromisoformat(
-                    created_at.replace('Z', '+00:00'))
-                hour = order_date.strftime('%H:00')
-                orders_by_hour[hour] += 1
-            except:
-                pass
-
-        # Revenue by hour
-        revenue_by_hour = defaultdict(float)
-        for order in filtered_orders:
-            created_at = order.get('createdAt', '')
-            try:
-                order_date = datetime.fromisoformat(
-                    created_at.replace('Z', '+00:00'))
-                hour = order_date.strftime('%H:00')
-                revenue_by_hour[hour] += order.get('total', 0)
-            except:
-                pass
-
-        # Top selling items
-        item_sales = defaultdict(
-            lambda: {'quantity': 0, 'revenue': 0, 'name': ''})
-        for order in filtered_orders:
-            for item in order.get('items', []):
-                item_id = item.get('itemId', item.get('name', 'unknown'))
-                item_sales[item_id]['quantity'] += item.get('quantity', 1)
-                item_sales[item_id]['revenue'] += item.get(
-                    'price', 0) * item.get('quantity', 1)
-                item_sales[item_id]['name'] = item.get('name', 'Unknown')
-
-        top_items = sorted(
-            [{'itemId': k, **v} for k, v in item_sales.items()],
-            key=lambda x: x['quantity'],
-            reverse=True
-        )[:10]
+        # Pre-aggregated hour/day buckets instead of the full order history
+        totals = get_dashboard_totals(tenant_id, start_date, now)
+
+        total_orders = int(totals['orders'])
+        total_revenue = totals['revenue']
+        status_counts = totals['statusCounts']
+
+        # Active orders (not completed or cancelled) from the sparse index
+        active_orders = query_items(
+            get_orders_table(),
+            Key('ActivePK').eq(f'TENANT#{tenant_id}') &
+            Key('ActiveSK').gte(start_date.isoformat()),
+            index_name='ActiveIndex'
+        )
+
+        # Average preparation time of completed orders
+        avg_prep_time = totals['prepMinutesSum'] / \
+            totals['prepCount'] if totals['prepCount'] else 0
+
+        # Top selling items: exact bucket counters for short windows,
+        # merged Space-Saving sketches otherwise
+        if exact_items or use_exact_top_items(start_date, now):
+            # Lines of cancelled orders net out to zero
+            top_items = sorted(
+                [{'itemId': k, **v} for k, v in totals['items'].items() if v['quantity'] > 0],
+                key=lambda x: x['quantity'],
+                reverse=True
+            )[:10]
+        else:
+            top_items = get_top_items(tenant_id, start_date, now)
 
         dashboard_data = {
             'summary': {
                 'totalOrders': total_orders,
                 'totalRevenue': round(total_revenue, 2),
                 'activeOrders': len(active_orders),
-                'completedOrders': len(completed_orders),
+                'completedOrders': status_counts.get(OrderStatus.COMPLETED.value, 0),
                 'averageOrderValue': round(total_revenue / total_orders, 2) if total_orders > 0 else 0,
                 'averagePrepTime': round(avg_prep_time, 1)
             },
@@ -148,6 +88,7 @@ def get_dashboard_handler(event, context):
                     'count': count
                 }
                 for status, count in status_counts.items()
+                if count > 0
             ],
             'activeOrders': sorted(
                 active_orders,
@@ -156,13 +97,15 @@ def get_dashboard_handler(event, context):
             )[:20],
             'ordersByHour': [
                 {'hour': hour, 'count': count}
-                for hour, count in sorted(orders_by_hour.items())
+                for hour, count in sorted(totals['ordersByHour'].items())
             ],
             'revenueByHour': [
                 {'hour': hour, 'revenue': round(revenue, 2)}
-                for hour, revenue in sorted(revenue_by_hour.items())
+                for hour, revenue in sorted(totals['revenueByHour'].items())
             ],
             'topItems': top_items,
+            # Connected screens and customers, from the presence counters
+            'presence': get_presence(tenant_id),
             'dateRange': date_range,
             'generatedAt': now.isoformat()
         }
@@ -174,6 +117,15 @@ def get_dashboard_handler(event, context):
         return error_response(f'Failed to get dashboard: {str(e)}', 500)
 
 
+def _percentile_fields(summary, suffix: str) -> dict:
+    """p50/p90/p99 fields (rounded minutes) of a sketch summary"""
+    summary = summary or {}
+    return {
+        f'{name}{suffix}': round(summary[name], 2) if summary.get(name) is not None else None
+        for name in ('p50', 'p90', 'p99')
+    }
+
+
 def get_workflow_stats_handler(event, context):
     """Get workflow statistics for orders"""
     try:
@@ -183,101 +135,74 @@ def get_workflow_stats_handler(event, context):
         if not tenant_id:
             return error_response('Tenant ID is required')
 
-        table = get_orders_table()
-
-        # Get completed orders to analyze workflow
-        orders = query_items(
-            table,
-            Key('PK').eq(f'TENANT#{tenant_id}') & Key(
-                'SK').begins_with('ORDER#')
-        )
+        query_params = event.get('queryStringParameters') or {}
+        try:
+            days = int(query_params.get('days', 30))
+        except ValueError:
+            return error_response('days must be an integer')
+        if days < 1:
+            return error_response('days must be at least 1')
 
-        completed_orders = [
-            o for o in orders
-            if o.get('status') == OrderStatus.COMPLETED.value
+        now = datetime.utcnow()
+        start_date = now - timedelta(days=days)
+
+        # Step timings come from the daily step duration sketches of the
+        # window, merged; no order is read
+        percentiles = get_step_percentiles(tenant_id, start_date, now)
+
+        step_averages = [
+            {
+                'step': step_name,
+                'averageTime': round(summary['average'], 2),
+                'minTime': round(summary['min'], 2) if summary['min'] is not None else None,
+                'maxTime': round(summary['max'], 2) if summary['max'] is not None else None,
+                'totalOrders': summary['count'],
+                **_percentile_fields(summary, 'Time')
+            }
+            for step_name, summary in percentiles['steps'].items()
         ]
 
-        # Analyze workflow steps timing
-        step_times = defaultdict(list)
-        staff_performance = defaultdict(
-            lambda: {'ordersHandled': 0, 'totalTime': 0})
-
-        for order in completed_orders:
-            workflow = order.get('workflow', {})
-            steps = workflow.get('steps', [])
-
-            for step in steps:
-                step_name = step.get('step', '')
-                start_time = step.get('startTime', '')
-                end_time = step.get('endTime', '')
-                staff_id = step.get('staffId', '')
-                staff_name = step.get('staffName', '')
-
-                if start_time and end_time:
-                    try:
-                        start = datetime.fromisoformat(
-                            start_time.replace('Z', '+00:00'))
-                        end = datetime.fromisoformat(
-                            end_time.replace('Z', '+00:00'))
-                        duration = (end - start).total_seconds() / \
-                            60  # in minutes
-                        step_times[step_name].append(duration)
-
-                        if staff_id:
-                            staff_performance[staff_id]['ordersHandled'] += 1
-                            staff_performance[staff_id]['totalTime'] += duration
-                            staff_performance[staff_id]['name'] = staff_name
-                    except:
-                        pass
-
-        # Calculate averages for each step
-        step_averages = []
-        for step_name, times in step_times.items():
-            if times:
-                step_averages.append({
-                    'step': step_name,
-                    'averageTime': round(sum(times) / len(times), 2),
-                    'minTime': round(min(times), 2),
-                    'maxTime': round(max(times), 2),
-                    'totalOrders': len(times)
-                })
-
         # Staff performance metrics
-        staff_metrics = []
-        for staff_id, data in staff_performance.items():
-            if data['ordersHandled'] > 0:
-                staff_metrics.append({
-                    'staffId': staff_id,
-                    'staffName': data['name'],
-                    'ordersHandled': data['ordersHandled'],
-                    'averageTime': round(data['totalTime'] / data['ordersHandled'], 2)
-                })
+        staff_metrics = [
+            {
+                'staffId': staff_id,
+                'staffName': summary['staffName'],
+                'ordersHandled': summary['count'],
+                'averageTime': round(summary['average'], 2),
+                **_percentile_fields(summary, 'Time')
+            }
+            for staff_id, summary in percentiles['staff'].items()
+            if summary['count'] > 0
+        ]
 
         # Sort by orders handled
         staff_metrics.sort(key=lambda x: x['ordersHandled'], reverse=True)
 
-        # Current queue status
-        pending_orders = [o for o in orders if o.get(
-            'status') == OrderStatus.PENDING.value]
-        cooking_orders = [o for o in orders if o.get(
-            'status') == OrderStatus.COOKING.value]
-        packing_orders = [o for o in orders if o.get(
-            'status') == OrderStatus.PACKING.value]
-        delivery_orders = [o for o in orders if o.get(
-            'status') == OrderStatus.DELIVERY.value]
+        # Queue counts from the sparse index of active orders
+        queue = defaultdict(int)
+        for order in query_all_items(
+            get_orders_table(),
+            Key('ActivePK').eq(f'TENANT#{tenant_id}'),
+            index_name='ActiveIndex'
+        ):
+            queue[order.get('status')] += 1
+
+        totals = get_dashboard_totals(tenant_id, start_date, now)
 
         workflow_stats = {
             'stepAnalysis': step_averages,
             'staffPerformance': staff_metrics[:10],  # Top 10
             'currentQueue': {
-                'pending': len(pending_orders),
-                'cooking': len(cooking_orders),
-                'packing': len(packing_orders),
-                'delivery': len(delivery_orders)
+                'pending': queue[OrderStatus.PENDING.value],
+                'cooking': queue[OrderStatus.COOKING.value],
+                'packing': queue[OrderStatus.PACKING.value],
+                'delivery': queue[OrderStatus.DELIVERY.value]
             },
-            'totalCompleted': len(completed_orders),
+            # Completed orders created in the window
+            'totalCompleted': int(totals['statusCounts'].get(OrderStatus.COMPLETED.value, 0)),
+            'percentileWindowDays': days,
             'workflowSteps': WORKFLOW_STEPS,
-            'generatedAt': datetime.utcnow().isoformat()
+            'generatedAt': now.isoformat()
         }
 
         return success_response(workflow_stats)
@@ -285,3 +210,28 @@ def get_workflow_stats_handler(event, context):
     except Exception as e:
         print(f"Get workflow stats error: {str(e)}")
         return error_response(f'Failed to get workflow stats: {str(e)}', 500)
+
+
+def aggregate_order_events_handler(event, context):
+    """Apply order events from EventBridge to the dashboard aggregates"""
+    detail_type = event.get('detail-type', '')
+    detail = event.get('detail', {})
+    tenant_id = detail.get('tenantId')
+    order = detail.get('order') or {}
+    # OrderStatusChanged nests the order next to oldStatus/newStatus
+    if isinstance(order.get('order'), dict):
+        order = order['order']
+
+    if not tenant_id or not order.get('orderId'):
+        print(f"Aggregates: skipping {detail_type} event without tenantId/order")
+        return {'statusCode': 400}
+
+    try:
+        applied = apply_order_event(tenant_id, detail_type, order)
+        if detail_type == 'OrderCreated':
+            record_customer(tenant_id, order)
+        return {'statusCode': 200, 'applied': applied}
+    except Exception as e:
+        print(f"Aggregate order event error: {str(e)}")
+        # Re-raise so the asynchronous invocation is retried
+        raise
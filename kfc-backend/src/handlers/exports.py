@@ -0,0 +1,92 @@
+"""
+Order export handlers (NDJSON/CSV dumps in the assets bucket)
+"""
+import json
+
+from src.utils.response import (
+    success_response, error_response, accepted_response, not_found_response
+)
+from src.services.order_export import (
+    normalize_export_request, create_order_export, get_order_export,
+    run_order_export, fail_order_export, order_export_view,
+    ORDER_EXPORT_MAX_ATTEMPTS
+)
+
+
+def create_order_export_handler(event, context):
+    """Queue an export of the tenant's orders"""
+    try:
+        path_params = event.get('pathParameters', {}) or {}
+        tenant_id = path_params.get('tenantId')
+
+        if not tenant_id:
+            return error_response('Tenant ID is required')
+
+        body = json.loads(event.get('body', '{}') or '{}')
+        try:
+            options = normalize_export_request(body)
+        except ValueError as e:
+            return error_response(f'Invalid export request: {str(e)}')
+
+        export = create_order_export(tenant_id, options)
+
+        return accepted_response(
+            order_export_view(export),
+            message='Order export queued',
+            headers={'Location': f'/tenants/{tenant_id}/exports/{export["exportId"]}'}
+        )
+
+    except Exception as e:
+        print(f"Create order export error: {str(e)}")
+        return error_response(f'Failed to create export: {str(e)}', 500)
+
+
+def get_order_export_handler(event, context):
+    """Get the progress of an export and, once completed, its download URL"""
+    try:
+        path_params = event.get('pathParameters', {}) or {}
+        tenant_id = path_params.get('tenantId')
+        export_id = path_params.get('exportId')
+
+        if not tenant_id or not export_id:
+            return error_response('Tenant ID and export ID are required')
+
+        export = get_order_export(tenant_id, export_id)
+        if not export:
+            return not_found_response('Export not found')
+
+        return success_response(order_export_view(export))
+
+    except Exception as e:
+        print(f"Get order export error: {str(e)}")
+        return error_response(f'Failed to get export: {str(e)}', 500)
+
+
+def process_order_exports_handler(event, context):
+    """Run order exports from the exports queue"""
+    for record in event.get('Records', []):
+        body = json.loads(record.get('body', '{}'))
+        tenant_id = body.get('tenantId')
+        export_id = body.get('exportId')
+
+        if not tenant_id or not export_id:
+            print(f"Order exports: skipping malformed message: {body}")
+            continue
+
+        try:
+            status = run_order_export(
+                tenant_id, export_id, context.get_remaining_time_in_millis
+            )
+            print(f"Order export {export_id}: {status}")
+        except Exception as e:
+            print(f"Order export {export_id} error: {str(e)}")
+            attempts = int(record.get('attributes', {}).get('ApproximateReceiveCount', 1))
+            if attempts < ORDER_EXPORT_MAX_ATTEMPTS:
+                # Redelivered after the visibility timeout, resuming from
+                # the last checkpoint
+                raise
+            export = get_order_export(tenant_id, export_id)
+            if export:
+                fail_order_export(tenant_id, export, str(e))
+
+    return {'statusCode': 200}
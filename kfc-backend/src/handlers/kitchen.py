@@ -0,0 +1,72 @@
+"""
+Kitchen capacity handlers
+"""
+import json
+
+from src.utils.response import success_response, error_response
+from src.utils.dynamodb import get_tenants_table, scan_items
+from src.services.admission import get_kitchen_load, set_kitchen_capacity, reconcile_kitchen_load
+
+
+def get_kitchen_capacity_handler(event, context):
+    """Get current load and capacity of a tenant kitchen"""
+    try:
+        path_params = event.get('pathParameters', {}) or {}
+        tenant_id = path_params.get('tenantId')
+
+        if not tenant_id:
+            return error_response('Tenant ID is required')
+
+        query_params = event.get('queryStringParameters') or {}
+        location_id = query_params.get('locationId')
+
+        return success_response(get_kitchen_load(tenant_id, location_id))
+
+    except Exception as e:
+        print(f"Get kitchen capacity error: {str(e)}")
+        return error_response(f'Failed to get kitchen capacity: {str(e)}', 500)
+
+
+def update_kitchen_capacity_handler(event, context):
+    """Configure capacity and queue limit of a tenant kitchen"""
+    try:
+        path_params = event.get('pathParameters', {}) or {}
+        tenant_id = path_params.get('tenantId')
+
+        if not tenant_id:
+            return error_response('Tenant ID is required')
+
+        body = json.loads(event.get('body', '{}'))
+
+        try:
+            capacity = int(body['capacity'])
+            queue_limit = int(body['queueLimit']) if 'queueLimit' in body else None
+        except (KeyError, TypeError, ValueError):
+            return error_response('capacity must be a number')
+
+        if capacity < 1 or (queue_limit is not None and queue_limit < 0):
+            return error_response('capacity must be at least 1 and queueLimit not negative')
+
+        kitchen = set_kitchen_capacity(
+            tenant_id, body.get('locationId'), capacity, queue_limit)
+
+        return success_response(kitchen, 'Kitchen capacity updated')
+
+    except json.JSONDecodeError:
+        return error_response('Invalid JSON body')
+    except Exception as e:
+        print(f"Update kitchen capacity error: {str(e)}")
+        return error_response(f'Failed to update kitchen capacity: {str(e)}', 500)
+
+
+def reconcile_kitchens_handler(event, context):
+    """Scheduled recount of the kitchen slots held by each tenant's orders"""
+    reconciled = 0
+    for tenant in scan_items(get_tenants_table()):
+        try:
+            reconciled += len(reconcile_kitchen_load(tenant['tenantId']))
+        except Exception as e:
+            print(f"Kitchen reconcile error for {tenant['tenantId']}: {str(e)}")
+
+    print(f"Kitchen reconcile: {reconciled} counters corrected")
+    return {'reconciled': reconciled}
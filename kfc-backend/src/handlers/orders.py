@@ -7,12 +7,20 @@ from datetime import datetime
 from boto3.dynamodb.conditions import Key
 
 from src.utils.response import (
-    success_response, created_response, error_response, not_found_response
+    success_response, created_response, error_response, not_found_response,
+    not_modified_response, too_many_requests_response
 )
 from src.utils.dynamodb import get_orders_table, put_item, get_item, query_items
 from src.utils.websocket import broadcast_new_order
 from src.utils.events import publish_order_event, start_order_workflow
-from src.models.order_status import OrderStatus
+from src.models.order_status import OrderStatus, CANCELLABLE_STATUSES, get_previous_statuses
+from src.services.order_stats import record_order_created, get_daily_stats
+from src.services.order_transitions import (
+    transition_order_status, update_order_fields, active_index_keys,
+    OrderTransitionError
+)
+from src.services.order_versions import order_etag, check_not_modified
+from src.services.admission import admit_order, release_order, KitchenAtCapacityError
 
 
 def create_order_handler(event, context):
@@ -51,6 +59,15 @@ def create_order_handler(event, context):
         # Generate order number
         order_number = f"KFC-{datetime.utcnow().strftime('%Y%m%d')}-{order_id[:8].upper()}"
 
+        # Reserve a kitchen slot before writing the order
+        try:
+            admission = admit_order(tenant_id, body.get('locationId'))
+        except KitchenAtCapacityError as e:
+            return too_many_requests_response(
+                'Kitchen is at capacity, please retry later',
+                e.retry_after
+            )
+
         order = {
             'PK': f'TENANT#{tenant_id}',
             'SK': f'ORDER#{order_id}',
@@ -58,6 +75,7 @@ def create_order_handler(event, context):
             'GSI1SK': now,
             'GSI2PK': f'TENANT#{tenant_id}#CUSTOMER#{body["customerId"]}',
             'GSI2SK': now,
+            **active_index_keys(tenant_id, order_id, now),
             'orderId': order_id,
             'orderNumber': order_number,
             'tenantId': tenant_id,
@@ -88,12 +106,31 @@ def create_order_handler(event, context):
                 'steps': [],
                 'assignedStaff': {}
             },
-            'estimatedDeliveryTime': body.get('estimatedDeliveryTime', 45),  # 45 minutos por defecto
+            # 45 minutos por defecto, más la espera si la cocina está llena
+            'estimatedDeliveryTime': body.get('estimatedDeliveryTime', 45) + admission['extraWaitMinutes'],
+            'locationId': body.get('locationId'),
+            'kitchenId': admission['kitchenId'],
+            'admittedAt': admission['admittedAt'],
+            'admission': {
+                'queued': admission['queued'],
+                'queuePosition': admission['queuePosition'],
+                'extraWaitMinutes': admission['extraWaitMinutes']
+            },
+            'version': 1,
             'createdAt': now,
             'updatedAt': now
         }
 
-        put_item(table, order)
+        try:
+            put_item(table, order)
+        except Exception:
+            release_order(tenant_id, admission['kitchenId'])
+            raise
+
+        try:
+            record_order_created(tenant_id, order)
+        except Exception as stats_error:
+            print(f"Order statistics update error: {str(stats_error)}")
 
         # Broadcast new order to restaurant staff via WebSocket
         try:
@@ -192,6 +229,11 @@ def get_order_handler(event, context):
         if not tenant_id or not order_id:
             return error_response('Tenant ID and Order ID are required')
 
+        # Unchanged polls are answered from a projected version read
+        etag = check_not_modified(event, tenant_id, order_id)
+        if etag:
+            return not_modified_response(etag)
+
         table = get_orders_table()
 
         order = get_item(table, {
@@ -202,7 +244,7 @@ def get_order_handler(event, context):
         if not order:
             return not_found_response('Order not found')
 
-        return success_response(order)
+        return success_response(order, headers={'ETag': order_etag(order)})
 
     except Exception as e:
         print(f"Get order error: {str(e)}")
@@ -282,7 +324,8 @@ def update_order_status(
     new_status: str,
     staff_id: str = None,
     staff_name: str = None,
-    message: str = None
+    message: str = None,
+    expected_status=None
 ) -> dict:
     """
     Helper function to update order status
@@ -294,85 +337,22 @@ def update_order_status(
         staff_id: ID of staff making the change
         staff_name: Name of staff making the change
         message: Optional message
+        expected_status: Status the order must currently be in
+            (defaults to the legal predecessors of new_status)
 
     Returns:
         Updated order
     """
-    from src.utils.websocket import broadcast_order_update
-
-    table = get_orders_table()
-    now = datetime.utcnow().isoformat()
-
-    # Get current order
-    order = get_item(table, {
-        'PK': f'TENANT#{tenant_id}',
-        'SK': f'ORDER#{order_id}'
-    })
-
-    if not order:
-        raise ValueError('Order not found')
-
-    old_status = order.get('status')
-
-    # Add to status history
-    status_entry = {
-        'status': new_status,
-        'timestamp': now,
-        'message': message or f'Status changed to {new_status}'
-    }
-    if staff_id:
-        status_entry['staffId'] = staff_id
-        status_entry['staffName'] = staff_name
-
-    status_history = order.get('statusHistory', [])
-    status_history.append(status_entry)
-
-    # Update order
-    response = table.update_item(
-        Key={
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        },
-        UpdateExpression='''
-            SET #status = :newStatus,
-                GSI1PK = :gsi1pk,
-                GSI1SK = :gsi1sk,
-                statusHistory = :statusHistory,
-                updatedAt = :updatedAt
-        ''',
-        ExpressionAttributeNames={
-            '#status': 'status'
-        },
-        ExpressionAttributeValues={
-            ':newStatus': new_status,
-            ':gsi1pk': f'TENANT#{tenant_id}#STATUS#{new_status}',
-            ':gsi1sk': now,
-            ':statusHistory': status_history,
-            ':updatedAt': now
-        },
-        ReturnValues='ALL_NEW'
+    return transition_order_status(
+        tenant_id=tenant_id,
+        order_id=order_id,
+        new_status=new_status,
+        expected_status=expected_status,
+        staff_id=staff_id,
+        staff_name=staff_name,
+        message=message
     )
 
-    updated_order = response.get('Attributes', {})
-
-    # Broadcast update via WebSocket
-    try:
-        broadcast_order_update(tenant_id, order_id, new_status, updated_order)
-    except Exception as ws_error:
-        print(f"WebSocket broadcast error: {str(ws_error)}")
-
-    # Publish event to EventBridge
-    try:
-        publish_order_event('OrderStatusChanged', tenant_id, order_id, {
-            'order': updated_order,
-            'oldStatus': old_status,
-            'newStatus': new_status
-        })
-    except Exception as event_error:
-        print(f"EventBridge publish error: {str(event_error)}")
-
-    return updated_order
-
 
 def update_order_status_handler(event, context):
     """Update order status - used by ops frontend"""
@@ -395,6 +375,10 @@ def update_order_status_handler(event, context):
         if new_status not in valid_statuses:
             return error_response(f'Invalid status. Valid values: {", ".join(valid_statuses)}')
 
+        # PENDING is only set on creation; no transition leads to it
+        if not get_previous_statuses(new_status):
+            return error_response(f'Orders cannot be moved to {new_status}')
+
         updated_order = update_order_status(
             tenant_id=tenant_id,
             order_id=order_id,
@@ -406,6 +390,8 @@ def update_order_status_handler(event, context):
 
         return success_response(updated_order, 'Order status updated successfully')
 
+    except OrderTransitionError as te:
+        return error_response(str(te), 409)
     except ValueError as ve:
         return not_found_response(str(ve))
     except json.JSONDecodeError:
@@ -427,71 +413,43 @@ def cancel_order_handler(event, context):
 
         body = json.loads(event.get('body', '{}'))
 
-        table = get_orders_table()
-
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            return not_found_response('Order not found')
-
-        current_status = order.get('status')
-
-        # Only allow cancellation for certain statuses
-        cancellable_statuses = [
-            OrderStatus.PENDING.value,
-            OrderStatus.RECEIVED.value,
-            OrderStatus.COOKING.value
-        ]
-
-        if current_status not in cancellable_statuses:
-            return error_response(
-                f'Cannot cancel order in {current_status} status. '
-                f'Cancellation allowed only for: {", ".join(cancellable_statuses)}'
-            )
-
         reason = body.get('reason', 'No reason provided')
         cancelled_by = body.get('cancelledBy', 'system')
         refund_requested = body.get('refundRequested', True)
+        refund_status = 'PENDING' if refund_requested else 'NOT_APPLICABLE'
 
         now = datetime.utcnow().isoformat()
 
-        # Update order to cancelled
-        from src.utils.dynamodb import update_item
-
-        update_fields = {
-            'status': OrderStatus.CANCELLED.value,
-            'GSI1PK': f'TENANT#{tenant_id}#STATUS#CANCELLED',
-            'GSI1SK': now,
-            'cancelledAt': now,
-            'cancellationReason': reason,
-            'cancelledBy': cancelled_by,
-            'refundRequested': refund_requested,
-            'refundStatus': 'PENDING' if refund_requested else 'NOT_APPLICABLE',
-            'updatedAt': now
-        }
-
-        # Add to status history
-        status_history = order.get('statusHistory', [])
-        status_history.append({
-            'status': OrderStatus.CANCELLED.value,
-            'timestamp': now,
-            'message': f'Order cancelled: {reason}',
-            'cancelledBy': cancelled_by
-        })
-        update_fields['statusHistory'] = status_history
-
-        update_item(
-            table,
-            {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
-            update_fields
-        )
+        # Only allow cancellation for certain statuses, asserted by the update
+        try:
+            updated_order = transition_order_status(
+                tenant_id=tenant_id,
+                order_id=order_id,
+                new_status=OrderStatus.CANCELLED.value,
+                expected_status=CANCELLABLE_STATUSES,
+                message=f'Order cancelled: {reason}',
+                history_entry={'cancelledBy': cancelled_by},
+                extra_updates={
+                    'cancelledAt': now,
+                    'cancellationReason': reason,
+                    'cancelledBy': cancelled_by,
+                    'refundRequested': refund_requested,
+                    'refundStatus': refund_status
+                },
+                broadcast=False
+            )
+        except ValueError:
+            return not_found_response('Order not found')
+        except OrderTransitionError as te:
+            return error_response(
+                f'Cannot cancel order in {te.current_status} status. '
+                f'Cancellation allowed only for: {", ".join(CANCELLABLE_STATUSES)}'
+            )
 
         # Publish cancellation event
         try:
             publish_order_event('OrderCancelled', tenant_id, order_id, {
+                **updated_order,
                 'orderId': order_id,
                 'reason': reason,
                 'cancelledBy': cancelled_by,
@@ -502,12 +460,9 @@ def cancel_order_handler(event, context):
 
         # Notify via WebSocket
         try:
-            from src.utils.websocket import broadcast_order_update
-            broadcast_order_update(tenant_id, order_id, OrderStatus.CANCELLED.value, {
-                'orderId': order_id,
-                'status': OrderStatus.CANCELLED.value,
-                'cancellationReason': reason
-            })
+            from src.services.broadcast_coalescing import coalesce_order_update
+            coalesce_order_update(
+                tenant_id, order_id, OrderStatus.CANCELLED.value, updated_order)
         except Exception as ws_error:
             print(f"WebSocket broadcast error: {str(ws_error)}")
 
@@ -515,7 +470,7 @@ def cancel_order_handler(event, context):
             'orderId': order_id,
             'status': OrderStatus.CANCELLED.value,
             'cancellationReason': reason,
-            'refundStatus': update_fields['refundStatus'],
+            'refundStatus': refund_status,
             'message': 'Order cancelled successfully'
         })
 
@@ -549,35 +504,17 @@ def assign_staff_handler(event, context):
         if role not in valid_roles:
             return error_response(f'Invalid role. Valid: {", ".join(valid_roles)}')
 
-        table = get_orders_table()
-
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            return not_found_response('Order not found')
-
         now = datetime.utcnow().isoformat()
 
         # Update workflow assignments
-        workflow = order.get('workflow', {'assignedStaff': {}, 'steps': []})
-        workflow['assignedStaff'][role] = {
-            'staffId': staff_id,
-            'staffName': staff_name,
-            'assignedAt': now
-        }
-
-        from src.utils.dynamodb import update_item
-        update_item(
-            table,
-            {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
-            {
-                'workflow': workflow,
-                'updatedAt': now
-            }
-        )
+        update_order_fields(tenant_id, order_id, {
+            f'workflow.assignedStaff.{role}': {
+                'staffId': staff_id,
+                'staffName': staff_name,
+                'assignedAt': now
+            },
+            'updatedAt': now
+        })
 
         return success_response({
             'orderId': order_id,
@@ -589,6 +526,8 @@ def assign_staff_handler(event, context):
 
     except json.JSONDecodeError:
         return error_response('Invalid JSON body')
+    except ValueError as ve:
+        return not_found_response(str(ve))
     except Exception as e:
         print(f"Assign staff error: {str(e)}")
         return error_response(f'Failed to assign staff: {str(e)}', 500)
@@ -605,24 +544,14 @@ def get_active_orders_handler(event, context):
 
         table = get_orders_table()
 
-        # Get orders for this tenant
-        orders = query_items(
+        # Only active orders carry ActivePK, so the sparse index holds
+        # just the live orders (oldest first, as the kitchen works them)
+        active_orders = query_items(
             table,
-            Key('PK').eq(f'TENANT#{tenant_id}') & Key(
-                'SK').begins_with('ORDER#')
+            Key('ActivePK').eq(f'TENANT#{tenant_id}'),
+            index_name='ActiveIndex'
         )
 
-        # Filter to active orders
-        completed_statuses = [
-            OrderStatus.COMPLETED.value,
-            OrderStatus.CANCELLED.value,
-            OrderStatus.DELIVERED.value
-        ]
-
-        active_orders = [
-            o for o in orders if o.get('status') not in completed_statuses
-        ]
-
         # Group by status
         by_status = {}
         for order in active_orders:
@@ -643,7 +572,7 @@ def get_active_orders_handler(event, context):
 
 
 def get_order_statistics_handler(event, context):
-    """Get order statistics for today"""
+    """Get order statistics for today (or ?date=YYYY-MM-DD)"""
     try:
         path_params = event.get('pathParameters', {}) or {}
         tenant_id = path_params.get('tenantId')
@@ -651,57 +580,11 @@ def get_order_statistics_handler(event, context):
         if not tenant_id:
             return error_response('Tenant ID is required')
 
-        table = get_orders_table()
-
-        # Get all orders
-        orders = query_items(
-            table,
-            Key('PK').eq(f'TENANT#{tenant_id}') & Key(
-                'SK').begins_with('ORDER#')
-        )
-
-        # Filter for today
-        from datetime import date
-        today = date.today().isoformat()
-        today_orders = [
-            o for o in orders
-            if o.get('createdAt', '').startswith(today)
-        ]
-
-        # Calculate statistics
-        total_revenue = sum(o.get('total', 0) for o in today_orders if o.get(
-            'status') != OrderStatus.CANCELLED.value)
-        total_orders = len(today_orders)
-        cancelled = len([o for o in today_orders if o.get(
-            'status') == OrderStatus.CANCELLED.value])
-        completed = len([o for o in today_orders if o.get('status') in [
-                        OrderStatus.COMPLETED.value, OrderStatus.DELIVERED.value]])
-        pending = len([o for o in today_orders if o.get(
-            'status') == OrderStatus.PENDING.value])
-        in_progress = total_orders - completed - cancelled - pending
-
-        # Calculate average time for completed orders
-        completion_times = []
-        for order in today_orders:
-            if order.get('status') in [OrderStatus.COMPLETED.value, OrderStatus.DELIVERED.value]:
-                workflow = order.get('workflow', {})
-                if workflow.get('totalTimeMinutes'):
-                    completion_times.append(workflow['totalTimeMinutes'])
-
-        avg_time = sum(completion_times) / \
-            len(completion_times) if completion_times else 0
+        query_params = event.get('queryStringParameters') or {}
+        day = query_params.get('date') or datetime.utcnow().date().isoformat()
 
-        return success_response({
-            'date': today,
-            'totalOrders': total_orders,
-            'totalRevenue': round(total_revenue, 2),
-            'completedOrders': completed,
-            'pendingOrders': pending,
-            'inProgressOrders': in_progress,
-            'cancelledOrders': cancelled,
-            'averageCompletionTime': round(avg_time, 1),
-            'completionRate': round(completed / total_orders * 100, 1) if total_orders > 0 else 0
-        })
+        # Counters are maintained on every order write
+        return success_response(get_daily_stats(tenant_id, day))
 
     except Exception as e:
         print(f"Get order statistics error: {str(e)}")
@@ -5,8 +5,8 @@ Simplified handlers for: RECEIVED -> COOKING -> PACKING -> DELIVERY -> COMPLETED
 import json
 from datetime import datetime
 
-from src.utils.dynamodb import get_orders_table, get_item, update_item, get_menu_table
-from src.utils.websocket import broadcast_order_update
+from src.utils.dynamodb import get_orders_table, get_item, get_menu_table
+from src.services.order_transitions import transition_order_status, OrderTransitionError
 from src.models.order_status import OrderStatus
 
 
@@ -110,42 +110,16 @@ def sfn_receive_order_handler(event, context):
         if not order_id or not tenant_id:
             raise Exception('Missing orderId or tenantId')
 
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            raise Exception(f'Order {order_id} not found')
-
         now = datetime.utcnow().isoformat()
 
         # Update order status to RECEIVED
-        update_item(
-            table,
-            {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
-            'SET #status = :status, updatedAt = :now',
-            {
-                ':status': OrderStatus.RECEIVED.value,
-                ':now': now
-            },
-            {
-                '#status': 'status'
-            }
-        )
-
-        broadcast_order_update(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            status=OrderStatus.RECEIVED.value,
-            order_data=order
-        )
+        status = _advance_order(
+            'ReceiveOrder', tenant_id, order_id, OrderStatus.RECEIVED.value)
 
         return {
             'orderId': order_id,
             'tenantId': tenant_id,
-            'status': OrderStatus.RECEIVED.value,
+            'status': status,
             'receivedAt': now
         }
 
@@ -169,50 +143,16 @@ def sfn_cook_order_handler(event, context):
             print(f"SFN Cooking ERROR: {error_msg}")
             raise Exception(error_msg)
 
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            error_msg = f'Order {order_id} not found for tenant {tenant_id}'
-            print(f"SFN Cooking ERROR: {error_msg}")
-            raise Exception(error_msg)
-
-        print(f"SFN Cooking - Found order, current status: {order.get('status')}")
-
         now = datetime.utcnow().isoformat()
 
         # Update order status to COOKING
-        update_item(
-            table,
-            {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
-            'SET #status = :status, updatedAt = :now',
-            {
-                ':status': OrderStatus.COOKING.value,
-                ':now': now
-            },
-            {
-                '#status': 'status'
-            }
-        )
-
-        print(f"SFN Cooking - Updated order to COOKING status")
-
-        broadcast_order_update(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            status=OrderStatus.COOKING.value,
-            order_data=order
-        )
-
-        print(f"SFN Cooking - Broadcasted update")
+        status = _advance_order(
+            'Cooking', tenant_id, order_id, OrderStatus.COOKING.value)
 
         result = {
             'orderId': order_id,
             'tenantId': tenant_id,
-            'status': OrderStatus.COOKING.value,
+            'status': status,
             'cookingStartedAt': now
         }
         
@@ -240,50 +180,16 @@ def sfn_pack_order_handler(event, context):
             print(f"SFN Packing ERROR: {error_msg}")
             raise Exception(error_msg)
 
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            error_msg = f'Order {order_id} not found for tenant {tenant_id}'
-            print(f"SFN Packing ERROR: {error_msg}")
-            raise Exception(error_msg)
-
-        print(f"SFN Packing - Found order, current status: {order.get('status')}")
-
         now = datetime.utcnow().isoformat()
 
         # Update order status to PACKING
-        update_item(
-            table,
-            {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
-            'SET #status = :status, updatedAt = :now',
-            {
-                ':status': OrderStatus.PACKING.value,
-                ':now': now
-            },
-            {
-                '#status': 'status'
-            }
-        )
-
-        print(f"SFN Packing - Updated order to PACKING status")
-
-        broadcast_order_update(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            status=OrderStatus.PACKING.value,
-            order_data=order
-        )
-
-        print(f"SFN Packing - Broadcasted update")
+        status = _advance_order(
+            'Packing', tenant_id, order_id, OrderStatus.PACKING.value)
 
         result = {
             'orderId': order_id,
             'tenantId': tenant_id,
-            'status': OrderStatus.PACKING.value,
+            'status': status,
             'packingStartedAt': now
         }
         
@@ -311,50 +217,16 @@ def sfn_deliver_order_handler(event, context):
             print(f"SFN Delivery ERROR: {error_msg}")
             raise Exception(error_msg)
 
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            error_msg = f'Order {order_id} not found for tenant {tenant_id}'
-            print(f"SFN Delivery ERROR: {error_msg}")
-            raise Exception(error_msg)
-
-        print(f"SFN Delivery - Found order, current status: {order.get('status')}")
-
         now = datetime.utcnow().isoformat()
 
         # Update order status to DELIVERY
-        update_item(
-            table,
-            {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
-            'SET #status = :status, updatedAt = :now',
-            {
-                ':status': OrderStatus.DELIVERY.value,
-                ':now': now
-            },
-            {
-                '#status': 'status'
-            }
-        )
-
-        print(f"SFN Delivery - Updated order to DELIVERY status")
-
-        broadcast_order_update(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            status=OrderStatus.DELIVERY.value,
-            order_data=order
-        )
-
-        print(f"SFN Delivery - Broadcasted update")
+        status = _advance_order(
+            'Delivery', tenant_id, order_id, OrderStatus.DELIVERY.value)
 
         result = {
             'orderId': order_id,
             'tenantId': tenant_id,
-            'status': OrderStatus.DELIVERY.value,
+            'status': status,
             'deliveryStartedAt': now
         }
         
@@ -382,50 +254,17 @@ def sfn_complete_order_handler(event, context):
             print(f"SFN CompleteOrder ERROR: {error_msg}")
             raise Exception(error_msg)
 
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            error_msg = f'Order {order_id} not found for tenant {tenant_id}'
-            print(f"SFN CompleteOrder ERROR: {error_msg}")
-            raise Exception(error_msg)
-
-        print(f"SFN CompleteOrder - Found order, current status: {order.get('status')}")
-
         now = datetime.utcnow().isoformat()
 
         # Update order status to COMPLETED
-        update_item(
-            table,
-            {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
-            'SET #status = :status, updatedAt = :now, completedAt = :now',
-            {
-                ':status': OrderStatus.COMPLETED.value,
-                ':now': now
-            },
-            {
-                '#status': 'status'
-            }
-        )
-
-        print(f"SFN CompleteOrder - Updated order to COMPLETED status")
-
-        broadcast_order_update(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            status=OrderStatus.COMPLETED.value,
-            order_data=order
-        )
-
-        print(f"SFN CompleteOrder - Broadcasted update")
+        status = _advance_order(
+            'CompleteOrder', tenant_id, order_id, OrderStatus.COMPLETED.value,
+            extra_updates={'completedAt': now})
 
         result = {
             'orderId': order_id,
             'tenantId': tenant_id,
-            'status': OrderStatus.COMPLETED.value,
+            'status': status,
             'completedAt': now
         }
         
@@ -438,3 +277,35 @@ def sfn_complete_order_handler(event, context):
         raise Exception(error_msg)
 
 
+def _advance_order(
+    label: str,
+    tenant_id: str,
+    order_id: str,
+    new_status: str,
+    extra_updates: dict = None
+) -> str:
+    """
+    Move an order forward from a Step Functions task
+
+    Staff may already have moved the order (or cancelled it) from the ops
+    front; in that case the conditional update fails and the task leaves
+    the order untouched instead of overwriting its status.
+
+    Returns:
+        The order status after the task
+    """
+    try:
+        transition_order_status(
+            tenant_id=tenant_id,
+            order_id=order_id,
+            new_status=new_status,
+            extra_updates=extra_updates
+        )
+    except ValueError:
+        raise Exception(f'Order {order_id} not found for tenant {tenant_id}')
+    except OrderTransitionError as te:
+        print(f"SFN {label} - Skipped {new_status}, current status: {te.current_status}")
+        return te.current_status
+
+    print(f"SFN {label} - Updated order to {new_status} status")
+    return new_status
@@ -3,9 +3,17 @@ WebSocket handlers for real-time communication
 """
 import json
 from datetime import datetime
+from botocore.exceptions import ClientError
 from src.utils.response import create_response
-from src.utils.websocket import save_connection, cleanup_connection, send_to_connection
+from src.utils.websocket import (
+    save_connection, cleanup_connection, send_to_connection, touch_connection,
+    sweep_stale_connections, deliver_shard, resume_connection
+)
+from src.services.broadcast_coalescing import flush_pending_update
+from src.services.websocket_rpc import is_rpc_request, handle_rpc_request
 from src.utils.dynamodb import get_connections_table
+from src.utils.websocket_routing import PAYLOAD_FULL, PAYLOAD_DELTA, connection_role
+from src.utils.connection_registry import bump_version
 
 
 def connect_handler(event, context):
@@ -16,7 +24,8 @@ def connect_handler(event, context):
     query_params = event.get('queryStringParameters') or {}
     tenant_id = query_params.get('tenantId', 'default')
     user_id = query_params.get('userId')
-    user_type = query_params.get('userType', 'customer')
+    # Operations screens connect with role=staff
+    user_type = query_params.get('userType') or query_params.get('role', 'customer')
 
     try:
         save_connection(connection_id, tenant_id, user_id, user_type)
@@ -53,12 +62,29 @@ def disconnect_handler(event, context):
 
 
 def default_handler(event, context):
-    """Handle default WebSocket route"""
+    """Handle default WebSocket route: RPC requests (see websocket_rpc), else echo"""
     connection_id = event['requestContext']['connectionId']
 
     try:
         body = json.loads(event.get('body', '{}'))
 
+        if is_rpc_request(body):
+            connection = get_connections_table().get_item(
+                Key={'connectionId': connection_id}
+            ).get('Item')
+            if not connection:
+                return {
+                    'statusCode': 410,
+                    'body': 'Unknown connection'
+                }
+
+            result = handle_rpc_request(connection, body)
+            print(f"RPC from {connection_id}: {result}")
+            return {
+                'statusCode': 200,
+                'body': 'RPC answered'
+            }
+
         # Echo the message back
         response_message = {
             'type': 'ECHO',
@@ -81,6 +107,106 @@ def default_handler(event, context):
         }
 
 
+def ping_handler(event, context):
+    """Heartbeat: keep the connection row alive and answer with a pong"""
+    connection_id = event['requestContext']['connectionId']
+
+    try:
+        if not touch_connection(connection_id):
+            return {
+                'statusCode': 410,
+                'body': 'Unknown connection'
+            }
+
+        send_to_connection(connection_id, {
+            'type': 'PONG',
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+        return {
+            'statusCode': 200,
+            'body': 'Pong'
+        }
+    except Exception as e:
+        print(f"Ping handler error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': f'Error: {str(e)}'
+        }
+
+
+def resume_handler(event, context):
+    """Replay the events a reconnected client missed since its last sequence number"""
+    connection_id = event['requestContext']['connectionId']
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+        last_seq = int(body.get('lastSeq', (body.get('data') or {}).get('lastSeq', 0)))
+
+        result = resume_connection(connection_id, last_seq)
+        print(f"Resume of {connection_id} from {last_seq}: {result}")
+
+        return {
+            'statusCode': 200,
+            'body': 'Resumed'
+        }
+    except (TypeError, ValueError) as e:
+        return {
+            'statusCode': 400,
+            'body': f'Error: {str(e)}'
+        }
+    except Exception as e:
+        print(f"Resume handler error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': f'Error: {str(e)}'
+        }
+
+
+def deliver_broadcast_shards_handler(event, context):
+    """Fan-out worker: deliver broadcast shards from the fan-out queue"""
+    for record in event.get('Records', []):
+        shard = json.loads(record.get('body', '{}'))
+
+        if not shard.get('payload') or not shard.get('connectionIds'):
+            print(f"Fan-out: skipping malformed shard from {shard.get('tenantId')}")
+            continue
+
+        # Failed posts are counted, not retried: a redelivered shard would
+        # repeat the message to the connections that already got it
+        result = deliver_shard(shard)
+        print(f"Fan-out shard for {shard.get('tenantId')}: "
+              f"{result['success_count']}/{result['targeted_connections']} sent")
+
+    return {'statusCode': 200}
+
+
+def sweep_connections_handler(event, context):
+    """Scheduled removal of dead connection rows"""
+    result = sweep_stale_connections()
+    print(f"Connection sweep: {result}")
+    return result
+
+
+def flush_coalesced_updates_handler(event, context):
+    """Broadcast the latest state of coalesced updates from the coalescing queue"""
+    for record in event.get('Records', []):
+        body = json.loads(record.get('body', '{}'))
+        tenant_id = body.get('tenantId')
+        kind = body.get('kind')
+
+        if not tenant_id or not kind:
+            print(f"Coalescing: skipping malformed message: {body}")
+            continue
+
+        result = flush_pending_update(tenant_id, kind, body.get('orderId'))
+        if result is not None:
+            print(f"Coalesced {kind} update flushed for {tenant_id}: "
+                  f"{result.get('success_count')}/{result.get('targeted_connections')} sent")
+
+    return {'statusCode': 200}
+
+
 def subscribe_handler(event, context):
     """Handle subscription to specific events"""
     connection_id = event['requestContext']['connectionId']
@@ -89,22 +215,62 @@ def subscribe_handler(event, context):
         body = json.loads(event.get('body', '{}'))
         subscription_type = body.get('subscriptionType', 'all')
         tenant_id = body.get('tenantId')
+        data = body.get('data') or {}
+        channels = body.get('channels') or data.get('channels') or []
+        order_ids = body.get('orderIds') or ([body['orderId']] if body.get('orderId') else [])
+
+        # Update connection with subscription info; the routing index
+        # (src/utils/websocket_routing.py) targets messages from it
+        update_expression = 'SET subscriptionType = :st, channels = :ch, updatedAt = :ua'
+        values = {
+            ':st': subscription_type,
+            ':ch': [str(c).lower() for c in channels],
+            ':ua': datetime.utcnow().isoformat()
+        }
+        if tenant_id:
+            update_expression += ', tenantId = :tid'
+            values[':tid'] = tenant_id
+        if body.get('payloadMode') in (PAYLOAD_FULL, PAYLOAD_DELTA):
+            update_expression += ', payloadMode = :pm'
+            values[':pm'] = body['payloadMode']
+        if order_ids:
+            update_expression += ' ADD orderIds :oids'
+            values[':oids'] = set(str(o) for o in order_ids)
 
-        # Update connection with subscription info
         table = get_connections_table()
-        table.update_item(
-            Key={'connectionId': connection_id},
-            UpdateExpression='SET subscriptionType = :st, updatedAt = :ua',
-            ExpressionAttributeValues={
-                ':st': subscription_type,
-                ':ua': datetime.utcnow().isoformat()
-            }
-        )
+        try:
+            old = table.update_item(
+                Key={'connectionId': connection_id},
+                UpdateExpression=update_expression,
+                ConditionExpression='attribute_exists(connectionId)',
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_OLD'
+            ).get('Attributes', {})
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return {
+                    'statusCode': 410,
+                    'body': 'Unknown connection'
+                }
+            raise
+
+        # Routing changed: warm registries must reload this tenant, and a
+        # connection moving tenants takes its presence count along
+        new_tenant_id = tenant_id or old.get('tenantId')
+        if old.get('tenantId') and old['tenantId'] != new_tenant_id:
+            role = connection_role(old)
+            bump_version(old['tenantId'], role, -1)
+            bump_version(new_tenant_id, role, 1)
+        elif new_tenant_id:
+            bump_version(new_tenant_id)
 
         # Send confirmation
         response_message = {
             'type': 'SUBSCRIPTION_CONFIRMED',
             'subscriptionType': subscription_type,
+            'channels': values[':ch'],
+            'orderIds': sorted(values.get(':oids', [])),
+            'payloadMode': values.get(':pm'),
             'timestamp': datetime.utcnow().isoformat()
         }
 
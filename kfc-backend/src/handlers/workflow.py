@@ -11,10 +11,18 @@ from src.utils.response import (
 from src.utils.dynamodb import get_orders_table, get_item
 from src.utils.events import start_order_workflow
 from src.utils.auth import get_user_from_event
-from src.handlers.orders import update_order_status
+from src.services.order_transitions import (
+    transition_order_status, update_order_fields,
+    OrderTransitionError, WorkflowStepChangedError
+)
 from src.models.order_status import OrderStatus
 
 
+# Attempts at a transition that closes a step, re-reading the order when
+# its steps changed between the read and the update
+CLOSE_STEP_ATTEMPTS = 3
+
+
 def start_workflow_handler(event, context):
     """Start the Step Functions workflow for an order"""
     try:
@@ -41,17 +49,10 @@ def start_workflow_handler(event, context):
 
         # Update order with workflow execution ARN
         now = datetime.utcnow().isoformat()
-        table.update_item(
-            Key={
-                'PK': f'TENANT#{tenant_id}',
-                'SK': f'ORDER#{order_id}'
-            },
-            UpdateExpression='SET workflow.executionArn = :arn, workflow.startedAt = :startedAt',
-            ExpressionAttributeValues={
-                ':arn': result.get('executionArn'),
-                ':startedAt': now
-            }
-        )
+        update_order_fields(tenant_id, order_id, {
+            'workflow.executionArn': result.get('executionArn'),
+            'workflow.startedAt': now
+        })
 
         return success_response({
             'orderId': order_id,
@@ -78,48 +79,34 @@ def take_order_handler(event, context):
         staff_id = body.get('staffId')
         staff_name = body.get('staffName', 'Staff')
 
-        # Get current order to validate status
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            return not_found_response('Order not found')
-
-        if order.get('status') != OrderStatus.PENDING.value:
-            return error_response(f'Order cannot be taken. Current status: {order.get("status")}')
-
-        # Update order status
-        updated_order = update_order_status(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            new_status=OrderStatus.RECEIVED.value,
-            staff_id=staff_id,
-            staff_name=staff_name,
-            message=f'Pedido recibido por {staff_name}'
-        )
-
-        # Update workflow info
         now = datetime.utcnow().isoformat()
-        table.update_item(
-            Key={
-                'PK': f'TENANT#{tenant_id}',
-                'SK': f'ORDER#{order_id}'
-            },
-            UpdateExpression='SET workflow.assignedStaff.receiver = :staff, workflow.steps = list_append(if_not_exists(workflow.steps, :empty), :step)',
-            ExpressionAttributeValues={
-                ':staff': {'staffId': staff_id, 'staffName': staff_name, 'timestamp': now},
-                ':step': [{
+
+        # Status is validated by the conditional update itself
+        try:
+            updated_order = transition_order_status(
+                tenant_id=tenant_id,
+                order_id=order_id,
+                new_status=OrderStatus.RECEIVED.value,
+                expected_status=OrderStatus.PENDING.value,
+                staff_id=staff_id,
+                staff_name=staff_name,
+                message=f'Pedido recibido por {staff_name}',
+                extra_updates={
+                    'workflow.assignedStaff.receiver': {
+                        'staffId': staff_id,
+                        'staffName': staff_name,
+                        'timestamp': now
+                    }
+                },
+                workflow_step={
                     'step': 'RECEIVED',
                     'staffId': staff_id,
                     'staffName': staff_name,
                     'startTime': now
-                }],
-                ':empty': []
-            }
-        )
+                }
+            )
+        except OrderTransitionError as te:
+            return error_response(f'Order cannot be taken. Current status: {te.current_status}')
 
         return success_response(updated_order, 'Order received successfully')
 
@@ -146,48 +133,34 @@ def start_cooking_handler(event, context):
         staff_id = body.get('staffId')
         staff_name = body.get('staffName', 'Cook')
 
-        # Get current order to validate status
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            return not_found_response('Order not found')
-
-        if order.get('status') != OrderStatus.RECEIVED.value:
-            return error_response(f'Order cannot start cooking. Current status: {order.get("status")}')
-
-        # Update order status
-        updated_order = update_order_status(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            new_status=OrderStatus.COOKING.value,
-            staff_id=staff_id,
-            staff_name=staff_name,
-            message=f'Cocinero {staff_name} iniciando preparación'
-        )
-
-        # Update workflow info
         now = datetime.utcnow().isoformat()
-        table.update_item(
-            Key={
-                'PK': f'TENANT#{tenant_id}',
-                'SK': f'ORDER#{order_id}'
-            },
-            UpdateExpression='SET workflow.assignedStaff.cook = :staff, workflow.steps = list_append(if_not_exists(workflow.steps, :empty), :step)',
-            ExpressionAttributeValues={
-                ':staff': {'staffId': staff_id, 'staffName': staff_name, 'timestamp': now},
-                ':step': [{
+
+        # Status is validated by the conditional update itself
+        try:
+            updated_order = transition_order_status(
+                tenant_id=tenant_id,
+                order_id=order_id,
+                new_status=OrderStatus.COOKING.value,
+                expected_status=OrderStatus.RECEIVED.value,
+                staff_id=staff_id,
+                staff_name=staff_name,
+                message=f'Cocinero {staff_name} iniciando preparación',
+                extra_updates={
+                    'workflow.assignedStaff.cook': {
+                        'staffId': staff_id,
+                        'staffName': staff_name,
+                        'timestamp': now
+                    }
+                },
+                workflow_step={
                     'step': 'COOKING',
                     'staffId': staff_id,
                     'staffName': staff_name,
                     'startTime': now
-                }],
-                ':empty': []
-            }
-        )
+                }
+            )
+        except OrderTransitionError as te:
+            return error_response(f'Order cannot start cooking. Current status: {te.current_status}')
 
         return success_response(updated_order, 'Cooking started')
 
@@ -214,46 +187,24 @@ def finish_cooking_handler(event, context):
         staff_id = body.get('staffId')
         staff_name = body.get('staffName', 'Cook')
 
-        # Get current order to validate status
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            return not_found_response('Order not found')
-
-        if order.get('status') != OrderStatus.COOKING.value:
-            return error_response(f'Order is not being cooked. Current status: {order.get("status")}')
-
-        # Update order status to PACKING (after cooking is done)
-        updated_order = update_order_status(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            new_status=OrderStatus.PACKING.value,
-            staff_id=staff_id,
-            staff_name=staff_name,
-            message=f'Comida lista por {staff_name}'
-        )
-
-        # Update workflow step end time
-        now = datetime.utcnow().isoformat()
-        workflow_steps = order.get('workflow', {}).get('steps', [])
-        for step in workflow_steps:
-            if step.get('step') == 'COOKING' and not step.get('endTime'):
-                step['endTime'] = now
-
-        table.update_item(
-            Key={
-                'PK': f'TENANT#{tenant_id}',
-                'SK': f'ORDER#{order_id}'
-            },
-            UpdateExpression='SET workflow.steps = :steps',
-            ExpressionAttributeValues={
-                ':steps': workflow_steps
-            }
-        )
+        # Update order status to PACKING (after cooking is done), closing
+        # the COOKING step in the same update
+        try:
+            updated_order = _transition_closing_step(
+                tenant_id,
+                order_id,
+                _get_order(tenant_id, order_id),
+                'COOKING',
+                new_status=OrderStatus.PACKING.value,
+                expected_status=OrderStatus.COOKING.value,
+                staff_id=staff_id,
+                staff_name=staff_name,
+                message=f'Comida lista por {staff_name}'
+            )
+        except OrderTransitionError as te:
+            return error_response(f'Order is not being cooked. Current status: {te.current_status}')
+        except WorkflowStepChangedError:
+            return error_response('Order changed while finishing cooking, please retry', 409)
 
         return success_response(updated_order, 'Cooking finished')
 
@@ -280,49 +231,35 @@ def pack_order_handler(event, context):
         staff_id = body.get('staffId')
         staff_name = body.get('staffName', 'Dispatcher')
 
-        # Get current order to validate status
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            return not_found_response('Order not found')
-
-        if order.get('status') != OrderStatus.PACKING.value:
-            return error_response(f'Order cannot be packed. Current status: {order.get("status")}')
-
-        # Update order status to DELIVERY
-        updated_order = update_order_status(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            new_status=OrderStatus.DELIVERY.value,
-            staff_id=staff_id,
-            staff_name=staff_name,
-            message=f'Pedido empacado por {staff_name}'
-        )
-
-        # Update workflow info
         now = datetime.utcnow().isoformat()
-        table.update_item(
-            Key={
-                'PK': f'TENANT#{tenant_id}',
-                'SK': f'ORDER#{order_id}'
-            },
-            UpdateExpression='SET workflow.assignedStaff.dispatcher = :staff, workflow.steps = list_append(if_not_exists(workflow.steps, :empty), :step)',
-            ExpressionAttributeValues={
-                ':staff': {'staffId': staff_id, 'staffName': staff_name, 'timestamp': now},
-                ':step': [{
+
+        # Status is validated by the conditional update itself
+        try:
+            updated_order = transition_order_status(
+                tenant_id=tenant_id,
+                order_id=order_id,
+                new_status=OrderStatus.DELIVERY.value,
+                expected_status=OrderStatus.PACKING.value,
+                staff_id=staff_id,
+                staff_name=staff_name,
+                message=f'Pedido empacado por {staff_name}',
+                extra_updates={
+                    'workflow.assignedStaff.dispatcher': {
+                        'staffId': staff_id,
+                        'staffName': staff_name,
+                        'timestamp': now
+                    }
+                },
+                workflow_step={
                     'step': 'PACKED',
                     'staffId': staff_id,
                     'staffName': staff_name,
                     'startTime': now,
                     'endTime': now
-                }],
-                ':empty': []
-            }
-        )
+                }
+            )
+        except OrderTransitionError as te:
+            return error_response(f'Order cannot be packed. Current status: {te.current_status}')
 
         return success_response(updated_order, 'Order packed successfully')
 
@@ -349,48 +286,34 @@ def start_delivery_handler(event, context):
         staff_id = body.get('staffId')
         staff_name = body.get('staffName', 'Delivery')
 
-        # Get current order to validate status
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            return not_found_response('Order not found')
-
-        if order.get('status') != OrderStatus.PACKING.value:
-            return error_response(f'Order cannot start delivery. Current status: {order.get("status")}')
-
-        # Update order status to DELIVERY
-        updated_order = update_order_status(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            new_status=OrderStatus.DELIVERY.value,
-            staff_id=staff_id,
-            staff_name=staff_name,
-            message=f'Repartidor {staff_name} en camino'
-        )
-
-        # Update workflow info
         now = datetime.utcnow().isoformat()
-        table.update_item(
-            Key={
-                'PK': f'TENANT#{tenant_id}',
-                'SK': f'ORDER#{order_id}'
-            },
-            UpdateExpression='SET workflow.assignedStaff.delivery = :staff, workflow.steps = list_append(if_not_exists(workflow.steps, :empty), :step)',
-            ExpressionAttributeValues={
-                ':staff': {'staffId': staff_id, 'staffName': staff_name, 'timestamp': now},
-                ':step': [{
+
+        # Status is validated by the conditional update itself
+        try:
+            updated_order = transition_order_status(
+                tenant_id=tenant_id,
+                order_id=order_id,
+                new_status=OrderStatus.DELIVERY.value,
+                expected_status=OrderStatus.PACKING.value,
+                staff_id=staff_id,
+                staff_name=staff_name,
+                message=f'Repartidor {staff_name} en camino',
+                extra_updates={
+                    'workflow.assignedStaff.delivery': {
+                        'staffId': staff_id,
+                        'staffName': staff_name,
+                        'timestamp': now
+                    }
+                },
+                workflow_step={
                     'step': 'DELIVERING',
                     'staffId': staff_id,
                     'staffName': staff_name,
                     'startTime': now
-                }],
-                ':empty': []
-            }
-        )
+                }
+            )
+        except OrderTransitionError as te:
+            return error_response(f'Order cannot start delivery. Current status: {te.current_status}')
 
         return success_response(updated_order, 'Delivery started')
 
@@ -419,35 +342,8 @@ def complete_delivery_handler(event, context):
         customer_signature = body.get('customerSignature', '')
         delivery_notes = body.get('deliveryNotes', '')
 
-        # Get current order to validate status
-        table = get_orders_table()
-        order = get_item(table, {
-            'PK': f'TENANT#{tenant_id}',
-            'SK': f'ORDER#{order_id}'
-        })
-
-        if not order:
-            return not_found_response('Order not found')
-
-        if order.get('status') != OrderStatus.DELIVERING.value:
-            return error_response(f'Order is not being delivered. Current status: {order.get("status")}')
-
-        # Update order status to COMPLETED
-        updated_order = update_order_status(
-            tenant_id=tenant_id,
-            order_id=order_id,
-            new_status=OrderStatus.COMPLETED.value,
-            staff_id=staff_id,
-            staff_name=staff_name,
-            message=f'Pedido entregado por {staff_name}'
-        )
-
-        # Update workflow info and finalize
         now = datetime.utcnow().isoformat()
-        workflow_steps = order.get('workflow', {}).get('steps', [])
-        for step in workflow_steps:
-            if step.get('step') == 'DELIVERING' and not step.get('endTime'):
-                step['endTime'] = now
+        order = _get_order(tenant_id, order_id)
 
         # Calculate total time
         created_at = order.get('createdAt', now)
@@ -460,30 +356,34 @@ def complete_delivery_handler(event, context):
         except:
             total_minutes = Decimal('0')
 
-        table.update_item(
-            Key={
-                'PK': f'TENANT#{tenant_id}',
-                'SK': f'ORDER#{order_id}'
-            },
-            UpdateExpression='''
-                SET workflow.steps = :steps,
-                    workflow.completedAt = :completedAt,
-                    workflow.totalTimeMinutes = :totalTime,
-                    deliveryConfirmation.signature = :signature,
-                    deliveryConfirmation.notes = :notes,
-                    deliveryConfirmation.timestamp = :timestamp,
-                    paymentStatus = :paymentStatus
-            ''',
-            ExpressionAttributeValues={
-                ':steps': workflow_steps,
-                ':completedAt': now,
-                ':totalTime': total_minutes,
-                ':signature': customer_signature,
-                ':notes': delivery_notes,
-                ':timestamp': now,
-                ':paymentStatus': 'COMPLETED'
-            }
-        )
+        # Update order status to COMPLETED, closing the DELIVERING step and
+        # finalizing workflow info in the same update
+        try:
+            updated_order = _transition_closing_step(
+                tenant_id,
+                order_id,
+                order,
+                'DELIVERING',
+                new_status=OrderStatus.COMPLETED.value,
+                expected_status=OrderStatus.DELIVERY.value,
+                staff_id=staff_id,
+                staff_name=staff_name,
+                message=f'Pedido entregado por {staff_name}',
+                extra_updates={
+                    'workflow.completedAt': now,
+                    'workflow.totalTimeMinutes': total_minutes,
+                    'deliveryConfirmation': {
+                        'signature': customer_signature,
+                        'notes': delivery_notes,
+                        'timestamp': now
+                    },
+                    'paymentStatus': 'COMPLETED'
+                }
+            )
+        except OrderTransitionError as te:
+            return error_response(f'Order is not being delivered. Current status: {te.current_status}')
+        except WorkflowStepChangedError:
+            return error_response('Order changed while completing delivery, please retry', 409)
 
         return success_response(updated_order, 'Order completed successfully')
 
@@ -494,3 +394,47 @@ def complete_delivery_handler(event, context):
     except Exception as e:
         print(f"Complete delivery error: {str(e)}")
         return error_response(f'Failed to complete delivery: {str(e)}', 500)
+
+
+def _get_order(tenant_id: str, order_id: str) -> dict:
+    """Read an order, raising ValueError if it does not exist"""
+    order = get_item(get_orders_table(), {
+        'PK': f'TENANT#{tenant_id}',
+        'SK': f'ORDER#{order_id}'
+    })
+    if not order:
+        raise ValueError('Order not found')
+    return order
+
+
+def _transition_closing_step(
+    tenant_id: str,
+    order_id: str,
+    order: dict,
+    step_name: str,
+    **transition
+) -> dict:
+    """
+    Transition an order and set the end time of its open step_name step in
+    the same conditional update
+
+    The step's position comes from the order as read; if the steps changed
+    before the update, the order is read again and the update retried.
+    """
+    for attempt in range(CLOSE_STEP_ATTEMPTS):
+        steps = order.get('workflow', {}).get('steps', [])
+        open_steps = [
+            index for index, step in enumerate(steps)
+            if step.get('step') == step_name and not step.get('endTime')
+        ]
+        try:
+            return transition_order_status(
+                tenant_id=tenant_id,
+                order_id=order_id,
+                close_step=(open_steps[-1], step_name) if open_steps else None,
+                **transition
+            )
+        except WorkflowStepChangedError:
+            if attempt == CLOSE_STEP_ATTEMPTS - 1:
+                raise
+            order = _get_order(tenant_id, order_id)
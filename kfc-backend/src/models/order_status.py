@@ -67,6 +67,33 @@ WORKFLOW_STEPS = [
 ]
 
 
+# Linear workflow order used to derive legal transitions
+STATUS_FLOW = [
+    OrderStatus.PENDING.value,
+    OrderStatus.RECEIVED.value,
+    OrderStatus.COOKING.value,
+    OrderStatus.PACKING.value,
+    OrderStatus.DELIVERY.value,
+    OrderStatus.COMPLETED.value
+]
+
+# Statuses in which an order is live in the kitchen/delivery pipeline
+ACTIVE_STATUSES = [
+    OrderStatus.PENDING.value,
+    OrderStatus.RECEIVED.value,
+    OrderStatus.COOKING.value,
+    OrderStatus.PACKING.value,
+    OrderStatus.DELIVERY.value
+]
+
+# Statuses from which an order may still be cancelled
+CANCELLABLE_STATUSES = [
+    OrderStatus.PENDING.value,
+    OrderStatus.RECEIVED.value,
+    OrderStatus.COOKING.value
+]
+
+
 def get_next_status(current_status: str) -> str:
     """
     Get the next status in the workflow
@@ -77,25 +104,35 @@ def get_next_status(current_status: str) -> str:
     Returns:
         Next status string
     """
-    status_flow = [
-        OrderStatus.PENDING.value,
-        OrderStatus.RECEIVED.value,
-        OrderStatus.COOKING.value,
-        OrderStatus.PACKING.value,
-        OrderStatus.DELIVERY.value,
-        OrderStatus.COMPLETED.value
-    ]
-
     try:
-        current_index = status_flow.index(current_status)
-        if current_index < len(status_flow) - 1:
-            return status_flow[current_index + 1]
+        current_index = STATUS_FLOW.index(current_status)
+        if current_index < len(STATUS_FLOW) - 1:
+            return STATUS_FLOW[current_index + 1]
     except ValueError:
         pass
 
     return current_status
 
 
+def get_previous_statuses(target_status: str) -> List[str]:
+    """
+    Get the statuses from which an order can legally move to target_status
+
+    Args:
+        target_status: The status being transitioned to
+
+    Returns:
+        List of valid source statuses (empty if none)
+    """
+    if target_status == OrderStatus.CANCELLED.value:
+        return list(CANCELLABLE_STATUSES)
+
+    return [
+        status for status in STATUS_FLOW
+        if status != target_status and get_next_status(status) == target_status
+    ]
+
+
 def get_allowed_roles_for_action(action: str) -> List[str]:
     """
     Get allowed roles for a specific action
@@ -0,0 +1,343 @@
+"""
+Kitchen-capacity admission control for new orders
+
+Each tenant kitchen (one per location) has a counter item in the orders
+table (SK = KITCHEN#<locationId>) tracking the orders currently in the
+kitchen, PENDING through PACKING. Admission is one conditional ADD on
+that counter against admissionLimit (capacity + queueLimit, stored
+because condition expressions cannot do arithmetic):
+
+- up to `capacity` in-flight orders are admitted normally,
+- the next `queueLimit` orders are admitted as queued with a quoted ETA,
+- beyond that the order is rejected and the client told when to retry.
+
+Queuing only pads the quoted ETA: a queued order's workflow starts right
+away like any other, and the kitchen works orders oldest first.
+
+An admitted order records its slot (kitchenId, admittedAt). The slot is
+released when the order leaves the kitchen statuses, or lapses after
+KITCHEN_SLOT_MAX_MINUTES for orders nobody advances (e.g. a failed
+workflow start). reconcile_kitchen_load recounts the slots held, so a
+missed release cannot keep a kitchen full.
+"""
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from src.utils.dynamodb import get_orders_table, get_item, query_all_items, decimal_to_float
+from src.utils.metrics import emit_metrics
+from src.models.order_status import OrderStatus
+
+
+DEFAULT_KITCHEN_ID = 'default'
+KITCHEN_CAPACITY = int(os.environ.get('KITCHEN_CAPACITY', 20))
+KITCHEN_QUEUE_LIMIT = int(os.environ.get('KITCHEN_QUEUE_LIMIT', 10))
+KITCHEN_PREP_MINUTES = int(os.environ.get('KITCHEN_PREP_MINUTES', 15))
+# An order still in the kitchen this long after admission no longer holds a slot
+KITCHEN_SLOT_MAX_MINUTES = int(os.environ.get('KITCHEN_SLOT_MAX_MINUTES', 240))
+# Counters touched this recently are not reconciled: ActiveIndex may not
+# show the orders behind them yet
+KITCHEN_RECONCILE_SETTLE_SECONDS = 60
+
+# Statuses in which an order occupies a kitchen slot
+KITCHEN_STATUSES = [
+    OrderStatus.PENDING.value,
+    OrderStatus.RECEIVED.value,
+    OrderStatus.COOKING.value,
+    OrderStatus.PACKING.value
+]
+
+
+class KitchenAtCapacityError(Exception):
+    """Raised when a kitchen cannot take (or queue) another order"""
+
+    def __init__(self, kitchen_id: str, retry_after: int):
+        self.kitchen_id = kitchen_id
+        self.retry_after = retry_after
+        super().__init__(
+            f'Kitchen {kitchen_id} is at capacity. Retry in {retry_after} seconds')
+
+
+def kitchen_key(tenant_id: str, kitchen_id: str) -> Dict[str, str]:
+    """Primary key of a kitchen's in-flight counter item"""
+    return {
+        'PK': f'TENANT#{tenant_id}',
+        'SK': f'KITCHEN#{kitchen_id}'
+    }
+
+
+def quote_wait_minutes(position: int, capacity: int) -> int:
+    """Extra minutes a queued order waits before a kitchen slot frees up"""
+    if position <= 0:
+        return 0
+    return math.ceil(position / max(capacity, 1)) * KITCHEN_PREP_MINUTES
+
+
+def retry_after_seconds(capacity: int) -> int:
+    """Expected seconds until a kitchen slot frees up"""
+    return max(30, int(KITCHEN_PREP_MINUTES * 60 / max(capacity, 1)))
+
+
+def admit_order(tenant_id: str, kitchen_id: str = None) -> Dict[str, Any]:
+    """
+    Reserve a kitchen slot for a new order
+
+    Args:
+        tenant_id: The tenant ID
+        kitchen_id: The location whose kitchen prepares the order
+
+    Returns:
+        Admission info: kitchenId, admittedAt, inFlight, capacity, queued,
+        queuePosition and extraWaitMinutes
+
+    Raises:
+        KitchenAtCapacityError: If both capacity and queue are full
+    """
+    kitchen_id = kitchen_id or DEFAULT_KITCHEN_ID
+    dimensions = {'TenantId': tenant_id, 'KitchenId': kitchen_id}
+    table = get_orders_table()
+
+    try:
+        response = table.update_item(
+            Key=kitchen_key(tenant_id, kitchen_id),
+            UpdateExpression='''
+                SET #capacity = if_not_exists(#capacity, :capacity),
+                    queueLimit = if_not_exists(queueLimit, :queueLimit),
+                    admissionLimit = if_not_exists(admissionLimit, :admissionLimit),
+                    updatedAt = :now
+                ADD inFlight :one
+            ''',
+            ConditionExpression=(
+                'attribute_not_exists(inFlight) OR inFlight < admissionLimit'
+            ),
+            ExpressionAttributeNames={'#capacity': 'capacity'},
+            ExpressionAttributeValues={
+                ':capacity': KITCHEN_CAPACITY,
+                ':queueLimit': KITCHEN_QUEUE_LIMIT,
+                ':admissionLimit': KITCHEN_CAPACITY + KITCHEN_QUEUE_LIMIT,
+                ':now': datetime.utcnow().isoformat(),
+                ':one': 1
+            },
+            ReturnValues='ALL_NEW',
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+        current = e.response.get('Item', {})
+        capacity = int(current.get('capacity', {}).get('N', KITCHEN_CAPACITY))
+        emit_metrics({'OrdersRejected': 1}, dimensions)
+        raise KitchenAtCapacityError(kitchen_id, retry_after_seconds(capacity))
+
+    kitchen = decimal_to_float(response.get('Attributes', {}))
+    in_flight = int(kitchen.get('inFlight', 1))
+    capacity = int(kitchen.get('capacity', KITCHEN_CAPACITY))
+    position = max(0, in_flight - capacity)
+
+    emit_metrics({
+        'OrdersAdmitted': 1,
+        'OrdersQueued': 1 if position else 0,
+        'KitchenInFlight': in_flight
+    }, dimensions)
+
+    return {
+        'kitchenId': kitchen_id,
+        'admittedAt': datetime.utcnow().isoformat(),
+        'inFlight': in_flight,
+        'capacity': capacity,
+        'queued': position > 0,
+        'queuePosition': position,
+        'extraWaitMinutes': quote_wait_minutes(position, capacity)
+    }
+
+
+def release_order(tenant_id: str, kitchen_id: str) -> None:
+    """
+    Free the kitchen slot held by an order
+
+    Args:
+        tenant_id: The tenant ID
+        kitchen_id: The kitchen the order was admitted to
+    """
+    try:
+        get_orders_table().update_item(
+            Key=kitchen_key(tenant_id, kitchen_id),
+            UpdateExpression='ADD inFlight :minusOne SET updatedAt = :now',
+            ConditionExpression='inFlight > :zero',
+            ExpressionAttributeValues={
+                ':minusOne': -1,
+                ':zero': 0,
+                ':now': datetime.utcnow().isoformat()
+            }
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+
+
+def slot_cutoff(now: Optional[datetime] = None) -> str:
+    """Admission time (ISO) before which a slot has lapsed"""
+    return ((now or datetime.utcnow()) - timedelta(minutes=KITCHEN_SLOT_MAX_MINUTES)).isoformat()
+
+
+def holds_kitchen_slot(order: Dict[str, Any], cutoff: Optional[str] = None) -> bool:
+    """
+    Whether an order (in a kitchen status) still holds its kitchen slot
+
+    Orders written before admittedAt existed fall back to createdAt.
+    """
+    admitted_at = order.get('admittedAt') or order.get('createdAt') or ''
+    return bool(order.get('kitchenId')) and admitted_at >= (cutoff or slot_cutoff())
+
+
+def record_kitchen_transition(tenant_id: str, order: Dict[str, Any]) -> None:
+    """
+    Release the order's kitchen slot when it leaves the kitchen
+
+    A lapsed slot is not released again: the recount already dropped it.
+
+    Args:
+        tenant_id: The tenant ID
+        order: The updated order (including previousStatus)
+    """
+    if not holds_kitchen_slot(order):
+        return
+
+    if order.get('previousStatus') in KITCHEN_STATUSES \
+            and order.get('status') not in KITCHEN_STATUSES:
+        release_order(tenant_id, order['kitchenId'])
+
+
+def reconcile_kitchen_load(tenant_id: str, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Reset the in-flight counters of a tenant's kitchens to the slots held
+
+    Slots are counted from the orders in kitchen statuses (ActiveIndex).
+    A counter that admitted or released an order in the last
+    KITCHEN_RECONCILE_SETTLE_SECONDS is left alone; the next run picks it up.
+
+    Args:
+        tenant_id: The tenant ID
+        now: Current time (UTC)
+
+    Returns:
+        In-flight count written per kitchen ID
+    """
+    now = now or datetime.utcnow()
+    settled = (now - timedelta(seconds=KITCHEN_RECONCILE_SETTLE_SECONDS)).isoformat()
+    cutoff = slot_cutoff(now)
+    table = get_orders_table()
+
+    held: Dict[str, int] = {}
+    for order in query_all_items(
+        table,
+        Key('ActivePK').eq(f'TENANT#{tenant_id}'),
+        index_name='ActiveIndex'
+    ):
+        if order.get('status') in KITCHEN_STATUSES and holds_kitchen_slot(order, cutoff):
+            held[order['kitchenId']] = held.get(order['kitchenId'], 0) + 1
+
+    kitchens: Iterable[Dict[str, Any]] = query_all_items(
+        table,
+        Key('PK').eq(f'TENANT#{tenant_id}') & Key('SK').begins_with('KITCHEN#')
+    )
+    written = {}
+    for kitchen in kitchens:
+        kitchen_id = kitchen['SK'][len('KITCHEN#'):]
+        in_flight = held.get(kitchen_id, 0)
+        if int(kitchen.get('inFlight', 0)) == in_flight:
+            continue
+        try:
+            table.update_item(
+                Key=kitchen_key(tenant_id, kitchen_id),
+                UpdateExpression='SET inFlight = :inFlight',
+                ConditionExpression='updatedAt < :settled',
+                ExpressionAttributeValues={':inFlight': in_flight, ':settled': settled}
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            continue
+        previous = int(kitchen.get('inFlight', 0))
+        print(f"Kitchen {tenant_id}/{kitchen_id}: inFlight {previous} -> {in_flight}")
+        emit_metrics({'KitchenSlotsReconciled': previous - in_flight},
+                     {'TenantId': tenant_id, 'KitchenId': kitchen_id})
+        written[kitchen_id] = in_flight
+    return written
+
+
+def get_kitchen_load(tenant_id: str, kitchen_id: str = None) -> Dict[str, Any]:
+    """
+    Current load and configuration of a kitchen
+
+    Args:
+        tenant_id: The tenant ID
+        kitchen_id: The location ID (defaults to the tenant's default kitchen)
+
+    Returns:
+        Kitchen load summary
+    """
+    kitchen_id = kitchen_id or DEFAULT_KITCHEN_ID
+    kitchen = get_item(get_orders_table(), kitchen_key(tenant_id, kitchen_id)) or {}
+
+    in_flight = int(kitchen.get('inFlight', 0))
+    capacity = int(kitchen.get('capacity', KITCHEN_CAPACITY))
+    queue_limit = int(kitchen.get('queueLimit', KITCHEN_QUEUE_LIMIT))
+    queued = max(0, in_flight - capacity)
+
+    return {
+        'kitchenId': kitchen_id,
+        'inFlight': in_flight,
+        'capacity': capacity,
+        'queueLimit': queue_limit,
+        'queued': queued,
+        'available': max(0, capacity - in_flight),
+        'extraWaitMinutes': quote_wait_minutes(queued + 1, capacity) if in_flight >= capacity else 0
+    }
+
+
+def set_kitchen_capacity(
+    tenant_id: str,
+    kitchen_id: str,
+    capacity: int,
+    queue_limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Configure a kitchen's capacity and queue limit
+
+    Args:
+        tenant_id: The tenant ID
+        kitchen_id: The location ID
+        capacity: Orders the kitchen works on at once
+        queue_limit: Orders accepted as queued beyond capacity
+
+    Returns:
+        Updated kitchen load summary
+    """
+    kitchen_id = kitchen_id or DEFAULT_KITCHEN_ID
+    if queue_limit is None:
+        queue_limit = KITCHEN_QUEUE_LIMIT
+
+    get_orders_table().update_item(
+        Key=kitchen_key(tenant_id, kitchen_id),
+        UpdateExpression='''
+            SET #capacity = :capacity,
+                queueLimit = :queueLimit,
+                admissionLimit = :admissionLimit,
+                inFlight = if_not_exists(inFlight, :zero),
+                updatedAt = :now
+        ''',
+        ExpressionAttributeNames={'#capacity': 'capacity'},
+        ExpressionAttributeValues={
+            ':capacity': capacity,
+            ':queueLimit': queue_limit,
+            ':admissionLimit': capacity + queue_limit,
+            ':zero': 0,
+            ':now': datetime.utcnow().isoformat()
+        }
+    )
+    return get_kitchen_load(tenant_id, kitchen_id)
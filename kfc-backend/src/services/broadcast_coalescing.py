@@ -0,0 +1,207 @@
+"""
+Coalescing of bursty WebSocket updates
+
+An order that moves through several states in a row (take, cook and
+cooked clicked back to back, or a bulk transition) used to trigger one
+broadcast per step. Updates are instead buffered per (tenant, order) in a
+pending item of the orders table (SK = WSPENDING#ORDER#<orderId>) that
+always holds the latest state. The first update of a window schedules a
+delayed flush message; later updates only overwrite the buffered state,
+and the flush broadcasts whatever is latest. The version and status the
+first update started from are kept, so the flushed delta tells clients
+which version it applies to.
+
+Dashboard updates use the same buffer per tenant (SK = WSPENDING#DASHBOARD)
+with a fixed tick, so a tenant gets at most one dashboard broadcast per tick.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from src.utils.dynamodb import get_orders_table, decimal_to_float
+from src.utils.events import send_to_queue
+from src.utils.websocket import broadcast_order_update, broadcast_dashboard_update
+
+
+COALESCE_QUEUE_URL = os.environ.get('WEBSOCKET_COALESCE_QUEUE_URL')
+# SQS delays are whole seconds; 0 broadcasts every update immediately
+ORDER_UPDATE_WINDOW_SECONDS = int(os.environ.get('WEBSOCKET_COALESCE_SECONDS', 1))
+DASHBOARD_TICK_SECONDS = int(os.environ.get('WEBSOCKET_DASHBOARD_TICK_SECONDS', 5))
+
+PENDING_PREFIX = 'WSPENDING#'
+KIND_ORDER = 'ORDER'
+KIND_DASHBOARD = 'DASHBOARD'
+
+# A flush still pending after its delay plus this grace was lost; reschedule
+FLUSH_GRACE_SECONDS = 30
+PENDING_TTL_SECONDS = 3600
+
+
+def pending_key(tenant_id: str, kind: str, order_id: str = None) -> Dict[str, str]:
+    """Primary key of a buffered update"""
+    suffix = f'{kind}#{order_id}' if order_id else kind
+    return {'PK': f'TENANT#{tenant_id}', 'SK': f'{PENDING_PREFIX}{suffix}'}
+
+
+def _buffer(
+    tenant_id: str,
+    kind: str,
+    order_id: Optional[str],
+    message: Dict[str, Any],
+    version: int,
+    window: int,
+    first: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    Store the latest state of an update and schedule its flush
+
+    Args:
+        first: Attributes kept from the first update of the window
+
+    Returns:
+        False if a newer version is already buffered
+    """
+    now = int(time.time())
+    key = pending_key(tenant_id, kind, order_id)
+    expression = (
+        'SET #message = :message, #version = :version, expiresAt = :expires_at, '
+        'scheduledAt = if_not_exists(scheduledAt, :now)'
+    )
+    names = {'#message': 'message', '#version': 'version'}
+    values = {
+        ':message': json.dumps(decimal_to_float(message), default=str),
+        ':version': version,
+        ':expires_at': now + PENDING_TTL_SECONDS,
+        ':now': now
+    }
+    for index, (attribute, value) in enumerate((first or {}).items()):
+        if value is None:
+            continue
+        expression += f', #f{index} = if_not_exists(#f{index}, :f{index})'
+        names[f'#f{index}'] = attribute
+        values[f':f{index}'] = value
+    try:
+        old = get_orders_table().update_item(
+            Key=key,
+            UpdateExpression=expression,
+            ConditionExpression='attribute_not_exists(#version) OR #version <= :version',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_OLD'
+        ).get('Attributes', {})
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+    scheduled_at = old.get('scheduledAt')
+    if scheduled_at is not None and int(scheduled_at) >= now - window - FLUSH_GRACE_SECONDS:
+        # A flush is already on its way and will pick up this state
+        return True
+
+    send_to_queue(COALESCE_QUEUE_URL, {
+        'tenantId': tenant_id,
+        'kind': kind,
+        'orderId': order_id
+    }, delay_seconds=window)
+    return True
+
+
+def coalesce_order_update(
+    tenant_id: str,
+    order_id: str,
+    status: str,
+    order: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Broadcast an order update, coalesced with the order's other updates
+    of the same window
+
+    Without a queue or with a zero window the update is broadcast
+    immediately.
+
+    Returns:
+        The broadcast result when sent immediately, None when buffered
+    """
+    if not COALESCE_QUEUE_URL or ORDER_UPDATE_WINDOW_SECONDS <= 0:
+        return broadcast_order_update(tenant_id, order_id, status, order)
+
+    version = int(order.get('version', 0) or 0)
+    try:
+        _buffer(
+            tenant_id,
+            KIND_ORDER,
+            order_id,
+            {'status': status, 'order': order},
+            version,
+            ORDER_UPDATE_WINDOW_SECONDS,
+            # Every write bumps the version by one
+            first={'fromVersion': version - 1, 'fromStatus': order.get('previousStatus')}
+        )
+    except Exception as e:
+        print(f"Coalescing unavailable for order {order_id}, broadcasting: {str(e)}")
+        return broadcast_order_update(tenant_id, order_id, status, order)
+    return None
+
+
+def coalesce_dashboard_update(tenant_id: str, dashboard_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Broadcast a dashboard update at most once per DASHBOARD_TICK_SECONDS
+
+    Returns:
+        The broadcast result when sent immediately, None when buffered
+    """
+    if not COALESCE_QUEUE_URL or DASHBOARD_TICK_SECONDS <= 0:
+        return broadcast_dashboard_update(tenant_id, dashboard_data)
+
+    try:
+        _buffer(
+            tenant_id,
+            KIND_DASHBOARD,
+            None,
+            dashboard_data,
+            time.time_ns(),
+            DASHBOARD_TICK_SECONDS
+        )
+    except Exception as e:
+        print(f"Coalescing unavailable for dashboard of {tenant_id}, broadcasting: {str(e)}")
+        return broadcast_dashboard_update(tenant_id, dashboard_data)
+    return None
+
+
+def flush_pending_update(tenant_id: str, kind: str, order_id: str = None) -> Optional[Dict[str, Any]]:
+    """
+    Broadcast and clear a buffered update
+
+    The pending item is deleted and read in one call, so an update
+    buffered after it starts a new window instead of being lost.
+
+    Returns:
+        The broadcast result, None if nothing was pending
+    """
+    pending = get_orders_table().delete_item(
+        Key=pending_key(tenant_id, kind, order_id),
+        ReturnValues='ALL_OLD'
+    ).get('Attributes')
+    if not pending:
+        return None
+
+    message = json.loads(pending['message'])
+    if kind == KIND_ORDER:
+        from_version = pending.get('fromVersion')
+        return broadcast_order_update(
+            tenant_id,
+            order_id,
+            message['status'],
+            message['order'],
+            from_version=int(from_version) if from_version is not None else None,
+            from_status=pending.get('fromStatus')
+        )
+    if kind == KIND_DASHBOARD:
+        return broadcast_dashboard_update(tenant_id, message)
+
+    print(f"Coalescing: unknown pending kind {kind}")
+    return None
@@ -0,0 +1,401 @@
+"""
+NumPy-vectorized analytics for large report windows
+
+The order window is loaded once into columnar arrays (epoch timestamps,
+totals, dictionary-encoded status and item codes, flattened item lines and
+workflow steps). Filters become boolean masks and group-bys become
+`bincount` over the encoded columns, so the per-order Python work is only
+the load itself.
+
+ColumnarAggregator exposes the same result attributes as
+order_analytics.OrderAggregator for the metric groups it supports, so the
+report handlers can use either engine.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from src.models.order_status import OrderStatus
+from src.services.order_analytics import parse_timestamp, period_key
+
+
+HAS_NUMPY = np is not None
+
+# Metric groups the columnar engine computes
+COLUMNAR_METRICS = frozenset(
+    ('totals', 'status', 'periods', 'hours', 'items', 'steps', 'fulfillment'))
+
+SECONDS_PER_DAY = 86400
+EPOCH = datetime(1970, 1, 1)
+
+
+class _Encoder:
+    """Dictionary encoder assigning codes in order of first appearance"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def _epoch_seconds(values: List[str]) -> 'np.ndarray':
+    """
+    Vectorized ISO timestamp parse into epoch seconds
+
+    Missing values become NaN; if any value cannot be parsed by NumPy the
+    column is parsed one value at a time instead.
+    """
+    try:
+        stamps = np.array(
+            [value.rstrip('Z') if value else 'NaT' for value in values],
+            dtype='datetime64[us]'
+        )
+        seconds = stamps.astype('int64') / 1e6
+        seconds[np.isnat(stamps)] = np.nan
+        return seconds
+    except ValueError:
+        parsed = [parse_timestamp(value) for value in values]
+        return np.array([
+            (value - EPOCH).total_seconds() if value else np.nan for value in parsed
+        ], dtype=np.float64)
+
+
+class OrderColumns:
+    """An order window loaded into columnar arrays"""
+
+    def __init__(
+        self,
+        orders: Iterable[Dict[str, Any]],
+        item_key: str = 'name',
+        metrics: Iterable[str] = COLUMNAR_METRICS,
+        include_statuses: Optional[Iterable[str]] = None,
+        exclude_statuses: Optional[Iterable[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ):
+        """
+        Args:
+            orders: Order items
+            item_key: Item attribute items are encoded by: name or itemId
+            metrics: Metric groups the columns are loaded for; columns no
+                metric needs are left empty
+            include_statuses: Only load orders in these statuses
+            exclude_statuses: Skip orders in these statuses
+            start, end: Skip orders created outside this window, so memory
+                follows the window rather than the input (to the second;
+                mask applies the exact bounds)
+        """
+        metrics = set(metrics)
+        load_items = 'items' in metrics
+        load_item_count = bool(metrics & {'totals', 'periods'})
+        load_steps = 'steps' in metrics
+        include = set(include_statuses) if include_statuses else None
+        exclude = set(exclude_statuses) if exclude_statuses else set()
+
+        statuses = _Encoder()
+        items = _Encoder()
+        steps = _Encoder()
+        staff = _Encoder()
+        self.item_names = {}
+        self.staff_names = {}
+
+        created_at, totals, status_codes, item_counts, total_times = [], [], [], [], []
+        line_order, line_item, line_qty, line_revenue = [], [], [], []
+        step_order, step_code, step_staff, step_start, step_end = [], [], [], [], []
+        completed = OrderStatus.COMPLETED.value
+        by_id = item_key == 'itemId'
+        # ISO timestamps order as strings; compared to the second
+        first = start.isoformat()[:19] if start else ''
+        last = end.isoformat()[:19] if end else '~'
+
+        for order in orders:
+            value = order.get('createdAt', '')
+            status = order.get('status', 'UNKNOWN')
+            if not value or (include is not None and status not in include) or status in exclude:
+                continue
+            if not first <= value[:19] <= last:
+                continue
+
+            index = len(created_at)
+            created_at.append(value)
+            totals.append(order.get('total', 0))
+            status_codes.append(statuses.encode(status))
+            order_items = order.get('items', [])
+
+            if load_item_count:
+                item_counts.append(sum(item.get('quantity', 1) for item in order_items))
+
+            if load_items:
+                for item in order_items:
+                    name = item.get('name', 'Unknown')
+                    quantity = item.get('quantity', 1)
+                    code = items.encode(
+                        item.get('itemId', item.get('name', 'unknown')) if by_id else name)
+                    self.item_names[code] = name
+                    line_order.append(index)
+                    line_item.append(code)
+                    line_qty.append(quantity)
+                    line_revenue.append(item.get('price', 0) * quantity)
+
+            workflow = order.get('workflow', {}) or {}
+            total_times.append(workflow.get('totalTimeMinutes', 0) or 0)
+
+            if load_steps and status == completed:
+                for step in workflow.get('steps', []):
+                    staff_id = step.get('staffId')
+                    staff_code = -1
+                    if staff_id:
+                        staff_code = staff.encode(staff_id)
+                        self.staff_names[staff_code] = step.get('staffName', 'Unknown')
+                    step_order.append(index)
+                    step_code.append(steps.encode(step.get('step', '')))
+                    step_staff.append(staff_code)
+                    step_start.append(step.get('startTime'))
+                    step_end.append(step.get('endTime'))
+
+        self.statuses = statuses
+        self.items = items
+        self.steps = steps
+        self.staff = staff
+
+        self.created_at = created_at
+        self.epoch = _epoch_seconds(created_at)
+        self.total = np.array(totals, dtype=np.float64)
+        self.status = np.array(status_codes, dtype=np.int32)
+        self.item_count = np.array(item_counts, dtype=np.float64)
+        self.total_time = np.array(total_times, dtype=np.float64)
+
+        self.line_order = np.array(line_order, dtype=np.int64)
+        self.line_item = np.array(line_item, dtype=np.int64)
+        self.line_qty = np.array(line_qty, dtype=np.float64)
+        self.line_revenue = np.array(line_revenue, dtype=np.float64)
+
+        self.step_order = np.array(step_order, dtype=np.int64)
+        self.step_code = np.array(step_code, dtype=np.int64)
+        self.step_staff = np.array(step_staff, dtype=np.int64)
+        self.step_minutes = (_epoch_seconds(step_end) - _epoch_seconds(step_start)) / 60
+
+    def __len__(self) -> int:
+        return len(self.created_at)
+
+    def mask(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        include_statuses: Optional[Iterable[str]] = None,
+        exclude_statuses: Optional[Iterable[str]] = None
+    ) -> 'np.ndarray':
+        """Boolean mask of the orders matching the filters"""
+        selected = ~np.isnan(self.epoch)
+        if start:
+            selected &= self.epoch >= (start - EPOCH).total_seconds()
+        if end:
+            selected &= self.epoch <= (end - EPOCH).total_seconds()
+        if include_statuses is not None:
+            codes = [self.statuses.codes[s] for s in include_statuses if s in self.statuses.codes]
+            selected &= np.isin(self.status, codes)
+        if exclude_statuses:
+            codes = [self.statuses.codes[s] for s in exclude_statuses if s in self.statuses.codes]
+            selected &= ~np.isin(self.status, codes)
+        return selected
+
+
+class ColumnarAggregator:
+    """Vectorized counterpart of OrderAggregator over an OrderColumns window"""
+
+    def __init__(
+        self,
+        metrics: Iterable[str],
+        group_by: str = 'day',
+        item_key: str = 'name'
+    ):
+        self.metrics = set(metrics)
+        unsupported = self.metrics - COLUMNAR_METRICS
+        if unsupported:
+            raise ValueError(f'Unsupported columnar metrics: {", ".join(sorted(unsupported))}')
+        self.group_by = group_by
+        self.item_key = item_key
+
+        self.orders = 0
+        self.revenue = 0.0
+        self.item_count = 0
+        self.status_counts = {}
+        self.periods = {}
+        self.hours = {}
+        self.item_sales = {}
+        self.step_durations = {}
+        self.staff = {}
+        self.fulfillment_times = []
+        self._item_order = None
+        self._step_summary = {}
+
+    def consume(
+        self,
+        orders: Iterable[Dict[str, Any]],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        include_statuses: Optional[Iterable[str]] = None,
+        exclude_statuses: Optional[Iterable[str]] = None
+    ) -> 'ColumnarAggregator':
+        """Load orders into columns and compute the requested metrics"""
+        columns = orders if isinstance(orders, OrderColumns) else OrderColumns(
+            orders, self.item_key, self.metrics, include_statuses, exclude_statuses, start, end)
+        selected = columns.mask(start, end, include_statuses, exclude_statuses)
+        self._compute(columns, selected)
+        return self
+
+    def _compute(self, columns: OrderColumns, selected: 'np.ndarray') -> None:
+        metrics = self.metrics
+        totals = columns.total[selected]
+        epoch = columns.epoch[selected]
+
+        if 'totals' in metrics:
+            self.orders = int(selected.sum())
+            self.revenue = float(totals.sum())
+            self.item_count = float(columns.item_count[selected].sum())
+
+        if 'status' in metrics:
+            counts = np.bincount(columns.status[selected], minlength=len(columns.statuses.values))
+            self.status_counts = {
+                columns.statuses.values[code]: int(count)
+                for code, count in enumerate(counts) if count
+            }
+
+        if 'periods' in metrics and len(epoch):
+            days = (epoch // SECONDS_PER_DAY).astype(np.int64)
+            unique_days, day_index = np.unique(days, return_inverse=True)
+            # Map the (few) distinct days to their period keys in Python
+            keys = [
+                period_key(EPOCH + timedelta(days=int(day)), self.group_by)
+                for day in unique_days
+            ]
+            period_values, key_index = np.unique(np.array(keys), return_inverse=True)
+            period_index = key_index[day_index]
+            size = len(period_values)
+            revenue = np.bincount(period_index, weights=totals, minlength=size)
+            orders = np.bincount(period_index, minlength=size)
+            items = np.bincount(
+                period_index, weights=columns.item_count[selected], minlength=size)
+            self.periods = {
+                str(key): {
+                    'revenue': float(revenue[i]),
+                    'orders': int(orders[i]),
+                    'items': float(items[i])
+                }
+                for i, key in enumerate(period_values)
+            }
+
+        if 'hours' in metrics and len(epoch):
+            hour_index = ((epoch // 3600) % 24).astype(np.int64)
+            revenue = np.bincount(hour_index, weights=totals, minlength=24)
+            orders = np.bincount(hour_index, minlength=24)
+            self.hours = {
+                f'{hour:02d}:00': {'revenue': float(revenue[hour]), 'orders': int(orders[hour])}
+                for hour in range(24) if orders[hour]
+            }
+
+        if 'items' in metrics:
+            lines = selected[columns.line_order]
+            size = len(columns.items.values)
+            quantity = np.bincount(
+                columns.line_item[lines], weights=columns.line_qty[lines], minlength=size)
+            revenue = np.bincount(
+                columns.line_item[lines], weights=columns.line_revenue[lines], minlength=size)
+            sold = np.flatnonzero(np.bincount(columns.line_item[lines], minlength=size))
+            self.item_sales = {
+                columns.items.values[code]: {
+                    'quantity': float(quantity[code]),
+                    'revenue': float(revenue[code]),
+                    'name': columns.item_names[code]
+                }
+                for code in sold
+            }
+            # Stable sort keeps first-appearance order among ties
+            self._item_order = [
+                columns.items.values[code]
+                for code in sold[np.argsort(-quantity[sold], kind='stable')]
+            ]
+
+        if 'steps' in metrics:
+            self._compute_steps(columns, selected)
+
+        if 'fulfillment' in metrics:
+            completed = columns.statuses.codes.get(OrderStatus.COMPLETED.value, -1)
+            times = columns.total_time[selected & (columns.status == completed)]
+            self.fulfillment_times = times[times > 0].tolist()
+
+    def _compute_steps(self, columns: OrderColumns, selected: 'np.ndarray') -> None:
+        rows = selected[columns.step_order]
+        step_code = columns.step_code[rows]
+        staff_code = columns.step_staff[rows]
+        minutes = columns.step_minutes[rows]
+        timed = ~np.isnan(minutes)
+        size = len(columns.steps.values)
+
+        timed_codes = step_code[timed]
+        timed_minutes = minutes[timed]
+        counts = np.bincount(timed_codes, minlength=size)
+        sums = np.bincount(timed_codes, weights=timed_minutes, minlength=size)
+        mins = np.full(size, np.inf)
+        maxs = np.full(size, -np.inf)
+        np.minimum.at(mins, timed_codes, timed_minutes)
+        np.maximum.at(maxs, timed_codes, timed_minutes)
+
+        self._step_summary = {
+            columns.steps.values[code]: {
+                'average': float(sums[code] / counts[code]),
+                'min': float(mins[code]),
+                'max': float(maxs[code]),
+                'count': int(counts[code])
+            }
+            for code in range(size) if counts[code]
+        }
+
+        has_staff = staff_code >= 0
+        staff_size = len(columns.staff.values)
+        handled = np.bincount(staff_code[has_staff], minlength=staff_size)
+        timed_staff = has_staff & timed
+        timed_steps = np.bincount(staff_code[timed_staff], minlength=staff_size)
+        total_time = np.bincount(
+            staff_code[timed_staff], weights=minutes[timed_staff], minlength=staff_size)
+
+        # Distinct (staff, step) pairs give each member's roles
+        pairs = np.unique(staff_code[has_staff] * max(size, 1) + step_code[has_staff])
+        roles = {}
+        for pair in pairs:
+            roles.setdefault(int(pair // max(size, 1)), set()).add(
+                columns.steps.values[int(pair % max(size, 1))])
+
+        self.staff = {
+            columns.staff.values[code]: {
+                'name': columns.staff_names[code],
+                'stepsHandled': int(handled[code]),
+                'timedSteps': int(timed_steps[code]),
+                'totalTime': float(total_time[code]),
+                'roles': roles.get(code, set())
+            }
+            for code in range(staff_size) if handled[code]
+        }
+
+    def top_items(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best selling items by quantity"""
+        key_name = 'itemId' if self.item_key == 'itemId' else 'name'
+        return [
+            {**self.item_sales[key], key_name: key}
+            for key in (self._item_order or [])[:limit]
+        ]
+
+    def step_summary(self) -> Dict[str, Dict[str, float]]:
+        """Average/min/max duration in minutes per workflow step"""
+        return self._step_summary
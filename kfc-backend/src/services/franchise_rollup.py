@@ -0,0 +1,150 @@
+"""
+Franchise-wide rollup of the sales of many tenants
+
+Each tenant's figures come from its materialized hour/day buckets (see
+order_aggregates), read concurrently by a small worker pool, so a rollup
+costs a few bucket queries per tenant instead of a scan of every order.
+The per-tenant totals are then merged into franchise totals, tenant
+rankings and franchise-wide best sellers.
+"""
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.utils.dynamodb import get_tenants_table, scan_items
+from src.models.order_status import OrderStatus
+from src.services.order_aggregates import get_dashboard_totals
+
+
+ROLLUP_MAX_WORKERS = int(os.environ.get('FRANCHISE_ROLLUP_MAX_WORKERS', 8))
+ROLLUP_MAX_TENANTS = int(os.environ.get('FRANCHISE_ROLLUP_MAX_TENANTS', 200))
+
+
+def load_franchise_tenants(tenant_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Tenants to roll up
+
+    Args:
+        tenant_ids: Subset of tenant IDs (defaults to every active tenant)
+
+    Returns:
+        Tenant items, in the order of tenant_ids when given
+    """
+    tenants = scan_items(get_tenants_table())
+    if not tenant_ids:
+        return [t for t in tenants if t.get('status') == 'ACTIVE']
+
+    by_id = {t['tenantId']: t for t in tenants}
+    return [by_id.get(tenant_id, {'tenantId': tenant_id}) for tenant_id in tenant_ids]
+
+
+def tenant_summary(tenant: Dict[str, Any], start: datetime, end: datetime) -> Dict[str, Any]:
+    """Sales summary of one tenant from its buckets"""
+    totals = get_dashboard_totals(tenant['tenantId'], start, end)
+    orders = int(totals['orders'])
+    revenue = totals['revenue']
+    status_counts = totals['statusCounts']
+
+    return {
+        'tenantId': tenant['tenantId'],
+        'name': tenant.get('name', 'Unknown'),
+        'totalOrders': orders,
+        'totalRevenue': round(revenue, 2),
+        'averageOrderValue': round(revenue / orders, 2) if orders > 0 else 0,
+        'completedOrders': status_counts.get(OrderStatus.COMPLETED.value, 0),
+        'cancelledOrders': status_counts.get(OrderStatus.CANCELLED.value, 0),
+        'averagePrepTime': round(
+            totals['prepMinutesSum'] / totals['prepCount'], 1) if totals['prepCount'] else 0,
+        # Item IDs are per tenant menu; best sellers are merged by name
+        '_items': totals['items'],
+        '_prepMinutesSum': totals['prepMinutesSum'],
+        '_prepCount': totals['prepCount']
+    }
+
+
+def _rank(summaries: List[Dict[str, Any]], field: str) -> List[Dict[str, Any]]:
+    ranked = sorted(summaries, key=lambda s: s[field], reverse=True)
+    return [
+        {'rank': index + 1, 'tenantId': s['tenantId'], 'name': s['name'], field: s[field]}
+        for index, s in enumerate(ranked)
+    ]
+
+
+def build_franchise_rollup(
+    tenants: List[Dict[str, Any]],
+    start: datetime,
+    end: datetime
+) -> Dict[str, Any]:
+    """
+    Merge the sales of several tenants into one franchise view
+
+    Args:
+        tenants: Tenant items (see load_franchise_tenants)
+        start: Start of the range (UTC)
+        end: End of the range (UTC)
+
+    Returns:
+        Franchise summary, per-tenant summaries, tenant rankings, top
+        items and the tenants whose figures could not be read
+    """
+    summaries = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, min(ROLLUP_MAX_WORKERS, len(tenants)))) as pool:
+        futures = [(tenant, pool.submit(tenant_summary, tenant, start, end)) for tenant in tenants]
+        for tenant, future in futures:
+            try:
+                summaries.append(future.result())
+            except Exception as e:
+                print(f"Franchise rollup: tenant {tenant['tenantId']} failed: {str(e)}")
+                failed.append({'tenantId': tenant['tenantId'], 'error': str(e)})
+
+    total_orders = sum(s['totalOrders'] for s in summaries)
+    total_revenue = sum(s['totalRevenue'] for s in summaries)
+    prep_minutes = sum(s['_prepMinutesSum'] for s in summaries)
+    prep_count = sum(s['_prepCount'] for s in summaries)
+
+    items = defaultdict(lambda: {'quantity': 0, 'revenue': 0.0, 'tenants': 0})
+    for summary in summaries:
+        for item in summary['_items'].values():
+            merged = items[item['name']]
+            merged['quantity'] += item['quantity']
+            merged['revenue'] += item['revenue']
+            merged['tenants'] += 1
+
+    top_items = sorted(
+        [
+            {'name': name, **item, 'revenue': round(item['revenue'], 2)}
+            for name, item in items.items()
+        ],
+        key=lambda x: x['quantity'],
+        reverse=True
+    )[:10]
+
+    tenant_summaries = [
+        {k: v for k, v in s.items() if not k.startswith('_')}
+        for s in summaries
+    ]
+
+    return {
+        'period': {'startDate': start.isoformat(), 'endDate': end.isoformat()},
+        'summary': {
+            'tenants': len(summaries),
+            'totalOrders': total_orders,
+            'totalRevenue': round(total_revenue, 2),
+            'averageOrderValue': round(total_revenue / total_orders, 2) if total_orders > 0 else 0,
+            'completedOrders': sum(s['completedOrders'] for s in summaries),
+            'cancelledOrders': sum(s['cancelledOrders'] for s in summaries),
+            'averagePrepTime': round(prep_minutes / prep_count, 1) if prep_count else 0
+        },
+        'tenants': sorted(tenant_summaries, key=lambda s: s['totalRevenue'], reverse=True),
+        'rankings': {
+            'byRevenue': _rank(tenant_summaries, 'totalRevenue'),
+            'byOrders': _rank(tenant_summaries, 'totalOrders'),
+            'byAverageOrderValue': _rank(tenant_summaries, 'averageOrderValue')
+        },
+        'topItems': top_items,
+        'failedTenants': failed,
+        'generatedAt': datetime.utcnow().isoformat()
+    }
@@ -0,0 +1,101 @@
+"""
+HyperLogLog distinct counter
+
+Values are hashed to 64 bits: the first p bits pick one of m = 2^p
+registers, which keeps the longest run of leading zeros (plus one) seen in
+the remaining bits. Two sketches merge by taking the register-wise
+maximum, and the count has a relative standard error of 1.04 / sqrt(m)
+(1.6% with the default p = 12) in constant space.
+
+Registers are stored as attributes r<index>; only non-zero registers are
+kept, and a register only ever grows, so an update is a conditional SET.
+"""
+import hashlib
+import math
+from typing import Any, Dict, Iterable, Tuple
+
+
+DEFAULT_PRECISION = 12
+REGISTER_PREFIX = 'r'
+
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch"""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers: Dict[int, int] = {}
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of count()"""
+        return 1.04 / math.sqrt(self.m)
+
+    def register_for(self, value: Any) -> Tuple[int, int]:
+        """Register index and rank a value updates"""
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = hashed & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        return index, rank
+
+    def add(self, value: Any) -> 'HyperLogLog':
+        """Count a value"""
+        index, rank = self.register_for(value)
+        if rank > self.registers.get(index, 0):
+            self.registers[index] = rank
+        return self
+
+    def update(self, values: Iterable[Any]) -> 'HyperLogLog':
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Union with another sketch of the same precision"""
+        for index, rank in other.registers.items():
+            if rank > self.registers.get(index, 0):
+                self.registers[index] = rank
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct values"""
+        m = self.m
+        zeros = m - len(self.registers)
+        harmonic = zeros + sum(2.0 ** -rank for rank in self.registers.values())
+        estimate = _alpha(m) * m * m / harmonic
+
+        # Small range correction: linear counting while registers are empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_registers(self) -> Dict[str, int]:
+        """Register attributes (r<index>) of the sketch"""
+        return {f'{REGISTER_PREFIX}{index}': rank for index, rank in self.registers.items()}
+
+    @classmethod
+    def from_registers(
+        cls,
+        attributes: Dict[str, Any],
+        precision: int = DEFAULT_PRECISION
+    ) -> 'HyperLogLog':
+        """Rebuild a sketch from stored register attributes"""
+        sketch = cls(precision)
+        for attribute, value in attributes.items():
+            if attribute.startswith(REGISTER_PREFIX) and attribute[1:].isdigit():
+                sketch.registers[int(attribute[1:])] = int(value)
+        return sketch
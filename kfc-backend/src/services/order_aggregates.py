@@ -0,0 +1,928 @@
+"""
+Materialized dashboard aggregates in hour and day buckets
+
+An order-event consumer keeps five kinds of aggregate items per tenant in
+the orders table:
+
+- hour buckets (SK = AGG#HOUR#<YYYY-MM-DDTHH>), including exact item
+  quantity and revenue counters, net of cancellations
+- day buckets (SK = AGG#DAY#<YYYY-MM-DD>), the roll-up of that day's
+  hours, which also carry per-hour-of-day counters for the charts
+- step duration sketches (SK = AGG#SKETCH#<YYYY-MM-DD>#STEP#<step> and
+  AGG#SKETCH#<YYYY-MM-DD>#STAFF#<staffId>), quantile sketches of the
+  workflow step durations of that day's completed orders
+- customer sketches (SK = AGG#CUSTOMERS#<YYYY-MM-DD>), HyperLogLog
+  registers of the customer IDs that ordered that day
+- top item sketches (SK = AGG#TOPITEMS#<YYYY-MM-DD>), Space-Saving
+  sketches of that day's item quantities and revenue, net of cancellations
+
+Orders are attributed to the bucket of their creation time. Each event
+is applied in one transaction together with a marker item keyed by the
+order version, so redelivered events are not counted twice. Step sketches
+that do not fit in that transaction follow in further ones, each with its
+own marker.
+"""
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from src.utils.dynamodb import (
+    get_orders_table, query_all_items, float_to_decimal
+)
+from src.utils.metrics import emit_metrics
+from src.models.order_status import OrderStatus
+from src.services.order_analytics import parse_order
+from src.services.quantile_sketch import QuantileSketch, EXTREMES
+from src.services.hyperloglog import HyperLogLog
+from src.services.space_saving import SpaceSaving
+
+
+HOUR_PREFIX = 'AGG#HOUR#'
+DAY_PREFIX = 'AGG#DAY#'
+APPLIED_PREFIX = 'AGG#APPLIED#'
+SKETCH_PREFIX = 'AGG#SKETCH#'
+CUSTOMERS_PREFIX = 'AGG#CUSTOMERS#'
+TOP_ITEMS_PREFIX = 'AGG#TOPITEMS#'
+
+# Windows up to this many days rank items from exact bucket counters
+TOP_ITEMS_EXACT_MAX_DAYS = int(os.environ.get('TOP_ITEMS_EXACT_MAX_DAYS', 1))
+
+# Concurrent events on the same day race on its top item sketch
+TOP_ITEMS_WRITE_ATTEMPTS = 5
+
+# DynamoDB transactions take at most 100 items
+MAX_TRANSACTION_ITEMS = 100
+
+# Markers only need to outlive event redelivery
+APPLIED_MARKER_TTL_SECONDS = 7 * 24 * 3600
+
+
+def hour_bucket_key(tenant_id: str, hour: str) -> Dict[str, str]:
+    """Primary key of an hour bucket (hour = YYYY-MM-DDTHH)"""
+    return {'PK': f'TENANT#{tenant_id}', 'SK': f'{HOUR_PREFIX}{hour}'}
+
+
+def day_bucket_key(tenant_id: str, day: str) -> Dict[str, str]:
+    """Primary key of a day bucket (day = YYYY-MM-DD)"""
+    return {'PK': f'TENANT#{tenant_id}', 'SK': f'{DAY_PREFIX}{day}'}
+
+
+def sketch_key(tenant_id: str, day: str, series: str) -> Dict[str, str]:
+    """Primary key of a step duration sketch (series = STEP#<step> or STAFF#<id>)"""
+    return {'PK': f'TENANT#{tenant_id}', 'SK': f'{SKETCH_PREFIX}{day}#{series}'}
+
+
+def customer_sketch_key(tenant_id: str, day: str) -> Dict[str, str]:
+    """Primary key of a day's customer sketch"""
+    return {'PK': f'TENANT#{tenant_id}', 'SK': f'{CUSTOMERS_PREFIX}{day}'}
+
+
+def top_items_key(tenant_id: str, day: str) -> Dict[str, str]:
+    """Primary key of a day's top item sketch"""
+    return {'PK': f'TENANT#{tenant_id}', 'SK': f'{TOP_ITEMS_PREFIX}{day}'}
+
+
+def _customer_id(order: Dict[str, Any]) -> str:
+    return order.get('customerId') or 'anonymous'
+
+
+def _prep_minutes(order: Dict[str, Any]) -> float:
+    """Workflow time of a completed order, 0 if unknown"""
+    return float(order.get('workflow', {}).get('totalTimeMinutes', 0) or 0)
+
+
+def created_counters(order: Dict[str, Any]) -> Tuple[Dict[str, float], Dict[str, str]]:
+    """
+    Bucket counter deltas for a newly created order
+
+    Returns:
+        Tuple of (counter deltas, item names to SET)
+    """
+    total = float(order.get('total', 0))
+    counters = defaultdict(float)
+    counters['orders'] = 1
+    counters['revenue'] = total
+    counters[f"status#{order.get('status', OrderStatus.PENDING.value)}"] += 1
+
+    names = {}
+    for item_id, name, quantity, revenue in item_lines(order):
+        counters[f'itemQty#{item_id}'] += quantity
+        counters[f'itemRevenue#{item_id}'] += revenue
+        names[f'itemName#{item_id}'] = name
+
+    return dict(counters), names
+
+
+def cancelled_item_counters(order: Dict[str, Any]) -> Dict[str, float]:
+    """Item counter deltas that take a cancelled order's lines back out"""
+    counters = defaultdict(float)
+    for item_id, _, quantity, revenue in item_lines(order):
+        counters[f'itemQty#{item_id}'] -= quantity
+        counters[f'itemRevenue#{item_id}'] -= revenue
+    return dict(counters)
+
+
+def item_lines(order: Dict[str, Any]) -> List[Tuple[str, str, float, float]]:
+    """(itemId, name, quantity, revenue) of each order line"""
+    lines = []
+    for item in order.get('items', []):
+        quantity = item.get('quantity', 1)
+        lines.append((
+            item.get('itemId', item.get('name', 'unknown')),
+            item.get('name', 'Unknown'),
+            quantity,
+            float(item.get('price', 0)) * quantity
+        ))
+    return lines
+
+
+def apply_top_items(
+    item: Dict[str, Any],
+    order: Dict[str, Any],
+    cancelled: bool = False
+) -> Dict[str, Any]:
+    """
+    Top item sketch attributes after counting (or cancelling) an order
+
+    Args:
+        item: Current sketch item attributes (empty for a new day)
+        order: The order
+        cancelled: Take the order's lines back out instead of adding them
+
+    Returns:
+        The sketch's new counter and name attributes
+    """
+    quantities = SpaceSaving.from_attributes(item, 'qty')
+    revenue = SpaceSaving.from_attributes(item, 'rev')
+    names = {k: v for k, v in item.items() if k.startswith('itemName#')}
+
+    for item_id, name, quantity, line_revenue in item_lines(order):
+        if cancelled:
+            quantities.remove(item_id, quantity)
+            revenue.remove(item_id, line_revenue)
+        else:
+            quantities.add(item_id, quantity)
+            revenue.add(item_id, line_revenue)
+            names[f'itemName#{item_id}'] = name
+
+    monitored = set(quantities.counters) | set(revenue.counters)
+    return {
+        **quantities.to_attributes('qty'),
+        **revenue.to_attributes('rev'),
+        **{k: v for k, v in names.items() if k[len('itemName#'):] in monitored}
+    }
+
+
+def status_change_counters(order: Dict[str, Any]) -> Dict[str, float]:
+    """Bucket counter deltas for an order that changed status"""
+    old_status = order.get('previousStatus')
+    new_status = order.get('status')
+    if not new_status or old_status == new_status:
+        return {}
+
+    counters = {f'status#{new_status}': 1}
+    if old_status:
+        counters[f'status#{old_status}'] = -1
+
+    # Item counters are net of cancellations, like the top item sketches
+    if new_status == OrderStatus.CANCELLED.value:
+        counters.update(cancelled_item_counters(order))
+
+    if new_status == OrderStatus.COMPLETED.value:
+        prep_minutes = _prep_minutes(order)
+        if prep_minutes > 0:
+            counters['prepMinutesSum'] = prep_minutes
+            counters['prepCount'] = 1
+
+    return counters
+
+
+def step_sketches(order: Dict[str, Any]) -> Dict[str, Tuple[QuantileSketch, Dict[str, str]]]:
+    """
+    Step duration sketches of a completed order
+
+    Returns:
+        Mapping of series (STEP#<step> or STAFF#<staffId>) to a tuple of
+        (sketch of the order's step durations, names to SET)
+    """
+    record = parse_order(order)
+    if record is None or order.get('status') != OrderStatus.COMPLETED.value:
+        return {}
+
+    sketches = {}
+    for step in record.steps:
+        if step.minutes is None:
+            continue
+        series = [(f'STEP#{step.step}', {})]
+        if step.staff_id:
+            series.append((f'STAFF#{step.staff_id}', {'staffName': step.staff_name}))
+        for name, names_to_set in series:
+            sketch, _ = sketches.setdefault(name, (QuantileSketch(), names_to_set))
+            sketch.add(step.minutes)
+
+    return sketches
+
+
+def hour_of_day_counters(order: Dict[str, Any], counters: Dict[str, float]) -> Dict[str, float]:
+    """Per-hour-of-day chart counters carried by day buckets"""
+    hour = order['createdAt'][11:13]
+    extra = {}
+    if counters.get('orders'):
+        extra[f'hourOrders#{hour}'] = counters['orders']
+    if counters.get('revenue'):
+        extra[f'hourRevenue#{hour}'] = counters['revenue']
+    return extra
+
+
+def _bucket_update(
+    key: Dict[str, str],
+    counters: Dict[str, float],
+    names_to_set: Dict[str, str],
+    now: str
+) -> Dict[str, Any]:
+    """Build an Update transaction item that ADDs counters to a bucket"""
+    names = {}
+    values = {':now': now}
+    add_clauses = []
+    set_clauses = ['updatedAt = :now']
+
+    for index, (attribute, delta) in enumerate(counters.items()):
+        names[f'#c{index}'] = attribute
+        values[f':c{index}'] = delta
+        add_clauses.append(f'#c{index} :c{index}')
+
+    for index, (attribute, value) in enumerate(names_to_set.items()):
+        names[f'#n{index}'] = attribute
+        values[f':n{index}'] = value
+        set_clauses.append(f'#n{index} = :n{index}')
+
+    return {
+        'Update': {
+            'TableName': get_orders_table().name,
+            'Key': key,
+            'UpdateExpression': 'ADD ' + ', '.join(add_clauses) + ' SET ' + ', '.join(set_clauses),
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': float_to_decimal(values)
+        }
+    }
+
+
+def apply_order_event(tenant_id: str, event_type: str, order: Dict[str, Any]) -> bool:
+    """
+    Apply an order event to its hour and day buckets
+
+    Args:
+        tenant_id: The tenant ID
+        event_type: OrderCreated, OrderStatusChanged or OrderCancelled
+        order: The order as of the event
+
+    Returns:
+        True if applied, False if ignored or already applied
+    """
+    created_at = order.get('createdAt')
+    order_id = order.get('orderId')
+    if not created_at or not order_id:
+        return False
+
+    names_to_set = {}
+    if event_type == 'OrderCreated':
+        counters, names_to_set = created_counters(order)
+    else:
+        counters = status_change_counters(order)
+
+    counters = {k: v for k, v in counters.items() if v}
+    if not counters:
+        return False
+
+    table = get_orders_table()
+    now = datetime.utcnow().isoformat()
+    version = int(order.get('version', 0) or 0)
+
+    sketches = {}
+    if event_type != 'OrderCreated' and counters.get(f'status#{OrderStatus.COMPLETED.value}', 0) > 0:
+        sketches = step_sketches(order)
+    sketch_updates = [
+        _bucket_update(
+            sketch_key(tenant_id, created_at[:10], series),
+            {k: v for k, v in sketch.to_counters().items() if k not in EXTREMES},
+            names_to_set_for_series,
+            now
+        )
+        for series, (sketch, names_to_set_for_series) in sketches.items()
+    ]
+    # The marker and both buckets take three items of the transaction
+    overflow = sketch_updates[MAX_TRANSACTION_ITEMS - 3:]
+    sketch_updates = sketch_updates[:MAX_TRANSACTION_ITEMS - 3]
+
+    counts_items = event_type == 'OrderCreated' or \
+        counters.get(f'status#{OrderStatus.CANCELLED.value}', 0) > 0
+
+    marker_sk = f'{APPLIED_PREFIX}{order_id}#{version}#{event_type}'
+    marker = _applied_marker(tenant_id, marker_sk)
+
+    bucket_updates = [
+        marker,
+        _bucket_update(
+            hour_bucket_key(tenant_id, created_at[:13]), counters, names_to_set, now),
+        _bucket_update(
+            day_bucket_key(tenant_id, created_at[:10]),
+            {**counters, **hour_of_day_counters(order, counters)},
+            names_to_set,
+            now
+        ),
+        *sketch_updates
+    ]
+
+    applied = False
+    for attempt in range(TOP_ITEMS_WRITE_ATTEMPTS):
+        top_items_put = [_top_items_put(tenant_id, order, event_type, now)] if counts_items else []
+        try:
+            table.meta.client.transact_write_items(
+                TransactItems=bucket_updates + top_items_put)
+            applied = True
+            break
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons', [])
+            if _already_applied(e):
+                print(f"Aggregates: event {event_type} v{version} for {order_id} already applied")
+                break
+            # Another event rewrote the top item sketch since it was read
+            sketch_conflict = top_items_put and len(reasons) == len(bucket_updates) + 1 \
+                and reasons[-1].get('Code') == 'ConditionalCheckFailed'
+            if not sketch_conflict or attempt == TOP_ITEMS_WRITE_ATTEMPTS - 1:
+                raise
+
+    # Also on redelivery: a previous attempt may have stopped between parts
+    if overflow:
+        _apply_sketch_overflow(tenant_id, marker_sk, overflow)
+
+    # Min and max cannot be ADDed; keeping the lower/higher value is
+    # idempotent, so they are written outside the transaction
+    for series, (sketch, _) in sketches.items():
+        _update_sketch_extremes(sketch_key(tenant_id, created_at[:10], series), sketch)
+
+    return applied
+
+
+def _update_sketch_extremes(key: Dict[str, str], sketch: QuantileSketch) -> None:
+    """Lower a stored sketch's min and raise its max to cover a sketch"""
+    for attribute, value, comparison in (('min', sketch.min, '>'), ('max', sketch.max, '<')):
+        if value is None:
+            continue
+        try:
+            get_orders_table().update_item(
+                Key=key,
+                UpdateExpression='SET #a = :v',
+                ConditionExpression=f'attribute_not_exists(#a) OR #a {comparison} :v',
+                ExpressionAttributeNames={'#a': attribute},
+                ExpressionAttributeValues=float_to_decimal({':v': value})
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+
+
+def _applied_marker(tenant_id: str, marker_sk: str) -> Dict[str, Any]:
+    """Put of a marker item that fails if the marker already exists"""
+    return {
+        'Put': {
+            'TableName': get_orders_table().name,
+            'Item': {
+                'PK': f'TENANT#{tenant_id}',
+                'SK': marker_sk,
+                'expiresAt': int(time.time()) + APPLIED_MARKER_TTL_SECONDS
+            },
+            'ConditionExpression': 'attribute_not_exists(PK)'
+        }
+    }
+
+
+def _already_applied(error: ClientError) -> bool:
+    """Whether a transaction was cancelled by its marker (first item)"""
+    reasons = error.response.get('CancellationReasons', [])
+    return bool(reasons) and reasons[0].get('Code') == 'ConditionalCheckFailed'
+
+
+def _apply_sketch_overflow(
+    tenant_id: str,
+    marker_sk: str,
+    updates: List[Dict[str, Any]]
+) -> None:
+    """
+    Apply step sketch updates that did not fit in an event's transaction
+
+    Each part is a transaction of its own, guarded by the event's marker
+    key plus the part number, so parts already applied are skipped.
+    """
+    client = get_orders_table().meta.client
+    size = MAX_TRANSACTION_ITEMS - 1
+    applied = 0
+    for part, start in enumerate(range(0, len(updates), size), 1):
+        part_updates = updates[start:start + size]
+        try:
+            client.transact_write_items(TransactItems=[
+                _applied_marker(tenant_id, f'{marker_sk}#{part}'),
+                *part_updates
+            ])
+            applied += len(part_updates)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException' \
+                    or not _already_applied(e):
+                raise
+
+    if applied:
+        print(f"Aggregates: {applied} step sketches of {marker_sk} applied in extra transactions")
+        emit_metrics({'AggregateSketchOverflow': applied}, {'TenantId': tenant_id})
+
+
+def _top_items_put(
+    tenant_id: str,
+    order: Dict[str, Any],
+    event_type: str,
+    now: str
+) -> Dict[str, Any]:
+    """
+    Build a Put transaction item for an order's day top item sketch
+
+    Space-Saving updates are not additive, so the sketch is read, updated
+    and written back on the condition that its revision has not moved.
+    """
+    table = get_orders_table()
+    key = top_items_key(tenant_id, order['createdAt'][:10])
+    current = table.get_item(Key=key, ConsistentRead=True).get('Item')
+
+    if current is None:
+        condition = {'ConditionExpression': 'attribute_not_exists(PK)'}
+    elif 'revision' in current:
+        condition = {
+            'ConditionExpression': 'revision = :revision',
+            'ExpressionAttributeValues': {':revision': current['revision']}
+        }
+    else:
+        condition = {'ConditionExpression': 'attribute_not_exists(revision)'}
+
+    attributes = apply_top_items(
+        current or {}, order, cancelled=event_type != 'OrderCreated')
+
+    return {
+        'Put': {
+            'TableName': table.name,
+            'Item': float_to_decimal({
+                **key,
+                **attributes,
+                'revision': int((current or {}).get('revision', 0)) + 1,
+                'updatedAt': now
+            }),
+            **condition
+        }
+    }
+
+
+def record_customer(tenant_id: str, order: Dict[str, Any]) -> bool:
+    """
+    Add a new order's customer to the customer sketch of its day
+
+    Registers only grow, so the update is a conditional SET of the one
+    register the customer maps to; redelivered events are no-ops.
+
+    Returns:
+        True if the register grew
+    """
+    created_at = order.get('createdAt')
+    if not created_at:
+        return False
+
+    index, rank = HyperLogLog().register_for(_customer_id(order))
+    try:
+        get_orders_table().update_item(
+            Key=customer_sketch_key(tenant_id, created_at[:10]),
+            UpdateExpression='SET #register = :rank, updatedAt = :now',
+            ConditionExpression='attribute_not_exists(#register) OR #register < :rank',
+            ExpressionAttributeNames={'#register': f'r{index}'},
+            ExpressionAttributeValues={
+                ':rank': rank,
+                ':now': datetime.utcnow().isoformat()
+            }
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+    return True
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        'orders': 0,
+        'revenue': 0.0,
+        'prepMinutesSum': 0.0,
+        'prepCount': 0,
+        'statusCounts': defaultdict(int),
+        'items': defaultdict(lambda: {'quantity': 0, 'revenue': 0.0, 'name': 'Unknown'}),
+        'ordersByHour': defaultdict(int),
+        'revenueByHour': defaultdict(float)
+    }
+
+
+def merge_buckets(buckets: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge hour and day buckets into dashboard totals
+
+    Args:
+        buckets: Bucket items as returned by read_buckets
+
+    Returns:
+        Totals with orders, revenue, prep time, status counts, items and
+        per-hour-of-day orders/revenue
+    """
+    totals = _empty_totals()
+
+    for bucket in buckets:
+        sk = bucket.get('SK', '')
+        is_hour = sk.startswith(HOUR_PREFIX)
+
+        for attribute, value in bucket.items():
+            if attribute in ('orders', 'revenue', 'prepMinutesSum', 'prepCount'):
+                totals[attribute] += value
+                continue
+
+            prefix, _, name = attribute.partition('#')
+            if prefix == 'status':
+                totals['statusCounts'][name] += int(value)
+            elif prefix == 'itemQty':
+                totals['items'][name]['quantity'] += value
+            elif prefix == 'itemRevenue':
+                totals['items'][name]['revenue'] += value
+            elif prefix == 'itemName':
+                totals['items'][name]['name'] = value
+            elif prefix == 'hourOrders' and not is_hour:
+                totals['ordersByHour'][f'{name}:00'] += int(value)
+            elif prefix == 'hourRevenue' and not is_hour:
+                totals['revenueByHour'][f'{name}:00'] += value
+
+        if is_hour:
+            hour = f'{sk[len(HOUR_PREFIX) + 11:]}:00'
+            totals['ordersByHour'][hour] += int(bucket.get('orders', 0))
+            totals['revenueByHour'][hour] += bucket.get('revenue', 0)
+
+    return totals
+
+
+def read_buckets(tenant_id: str, start: datetime, end: datetime = None) -> List[Dict[str, Any]]:
+    """
+    Read the buckets covering [start, end]
+
+    A partial first day is read from its hour buckets (at most 24 items);
+    every following day is read from its day bucket.
+
+    Args:
+        tenant_id: The tenant ID
+        start: Start of the range (UTC)
+        end: End of the range (UTC, defaults to now)
+
+    Returns:
+        Bucket items
+    """
+    end = end or datetime.utcnow()
+    table = get_orders_table()
+    pk = Key('PK').eq(f'TENANT#{tenant_id}')
+    buckets = []
+
+    first_full_day = start.date()
+    if start.time() != datetime.min.time():
+        day = start.strftime('%Y-%m-%d')
+        buckets.extend(query_all_items(
+            table,
+            pk & Key('SK').between(
+                f"{HOUR_PREFIX}{start.strftime('%Y-%m-%dT%H')}",
+                f'{HOUR_PREFIX}{day}T23'
+            )
+        ))
+        first_full_day = start.date() + timedelta(days=1)
+
+    if first_full_day <= end.date():
+        buckets.extend(query_all_items(
+            table,
+            pk & Key('SK').between(
+                f'{DAY_PREFIX}{first_full_day.isoformat()}',
+                f'{DAY_PREFIX}{end.date().isoformat()}'
+            )
+        ))
+
+    return buckets
+
+
+def compute_buckets(orders: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute hour and day bucket contents from order history
+
+    Args:
+        orders: Orders to aggregate
+
+    Returns:
+        Mapping of bucket SK to its attributes
+    """
+    buckets = defaultdict(lambda: defaultdict(float))
+    top_items = defaultdict(dict)
+
+    for order in orders:
+        created_at = order.get('createdAt', '')
+        if len(created_at) < 13:
+            continue
+
+        # Status counters reflect the order's current status
+        counters, names = created_counters(order)
+        if order.get('status') == OrderStatus.CANCELLED.value:
+            for attribute, delta in cancelled_item_counters(order).items():
+                counters[attribute] += delta
+        if order.get('status') == OrderStatus.COMPLETED.value and _prep_minutes(order) > 0:
+            counters['prepMinutesSum'] = _prep_minutes(order)
+            counters['prepCount'] = 1
+
+        hour_bucket = buckets[f'{HOUR_PREFIX}{created_at[:13]}']
+        day_bucket = buckets[f'{DAY_PREFIX}{created_at[:10]}']
+        for attribute, delta in counters.items():
+            hour_bucket[attribute] += delta
+            day_bucket[attribute] += delta
+        for attribute, delta in hour_of_day_counters(order, counters).items():
+            day_bucket[attribute] += delta
+        for attribute, name in names.items():
+            hour_bucket[attribute] = name
+            day_bucket[attribute] = name
+
+        if order.get('status') != OrderStatus.CANCELLED.value:
+            day = created_at[:10]
+            top_items[day] = apply_top_items(top_items[day], order)
+
+        customer_bucket = buckets[f'{CUSTOMERS_PREFIX}{created_at[:10]}']
+        index, rank = HyperLogLog().register_for(_customer_id(order))
+        customer_bucket[f'r{index}'] = max(customer_bucket[f'r{index}'], rank)
+
+        for series, (sketch, names_to_set) in step_sketches(order).items():
+            sketch_bucket = buckets[f'{SKETCH_PREFIX}{created_at[:10]}#{series}']
+            for attribute, delta in sketch.to_counters().items():
+                if attribute in EXTREMES:
+                    sketch_bucket[attribute] = EXTREMES[attribute](
+                        sketch_bucket.get(attribute, delta), delta)
+                else:
+                    sketch_bucket[attribute] += delta
+            sketch_bucket.update(names_to_set)
+
+    for day, attributes in top_items.items():
+        buckets[f'{TOP_ITEMS_PREFIX}{day}'].update(attributes)
+
+    return buckets
+
+
+def rebuild_aggregates(
+    tenant_id: str,
+    start_day: str = None,
+    end_day: str = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Recompute and overwrite a tenant's buckets from order history
+
+    Args:
+        tenant_id: The tenant ID
+        start_day: First day to rebuild (YYYY-MM-DD, inclusive)
+        end_day: Last day to rebuild (YYYY-MM-DD, inclusive)
+
+    Returns:
+        The rebuilt buckets by SK
+    """
+    table = get_orders_table()
+
+    orders = query_all_items(
+        table,
+        Key('PK').eq(f'TENANT#{tenant_id}') & Key('SK').begins_with('ORDER#')
+    )
+    buckets = compute_buckets(
+        o for o in orders
+        if (not start_day or o.get('createdAt', '')[:10] >= start_day)
+        and (not end_day or o.get('createdAt', '')[:10] <= end_day)
+    )
+
+    now = datetime.utcnow().isoformat()
+    with table.batch_writer() as batch:
+        for sk, attributes in buckets.items():
+            batch.put_item(Item=float_to_decimal({
+                'PK': f'TENANT#{tenant_id}',
+                'SK': sk,
+                **attributes,
+                'updatedAt': now,
+                'rebuiltAt': now
+            }))
+
+    return buckets
+
+
+def read_step_sketches(
+    tenant_id: str,
+    start_day: str,
+    end_day: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Merge the step duration sketches of a range of days
+
+    Args:
+        tenant_id: The tenant ID
+        start_day: First day (YYYY-MM-DD, inclusive)
+        end_day: Last day (YYYY-MM-DD, inclusive)
+
+    Returns:
+        Dict with 'steps' (step -> sketch) and 'staff' (staffId -> dict
+        with name and sketch)
+    """
+    items = query_all_items(
+        get_orders_table(),
+        Key('PK').eq(f'TENANT#{tenant_id}') & Key('SK').between(
+            f'{SKETCH_PREFIX}{start_day}#', f'{SKETCH_PREFIX}{end_day}#~'
+        )
+    )
+
+    steps = {}
+    staff = {}
+    for item in items:
+        kind, _, name = item['SK'][len(SKETCH_PREFIX) + 11:].partition('#')
+        sketch = QuantileSketch.from_counters(item)
+        if kind == 'STEP':
+            steps[name] = steps[name].merge(sketch) if name in steps else sketch
+        elif kind == 'STAFF':
+            entry = staff.setdefault(name, {'name': 'Unknown', 'sketch': QuantileSketch()})
+            entry['name'] = item.get('staffName', entry['name'])
+            entry['sketch'].merge(sketch)
+
+    return {'steps': steps, 'staff': staff}
+
+
+def get_step_percentiles(tenant_id: str, start: datetime, end: datetime = None) -> Dict[str, Any]:
+    """
+    Step duration statistics (minutes) per step and per staff member
+
+    Sketches are kept per day, so the range is widened to whole days.
+
+    Returns:
+        Dict with 'steps' (step -> summary) and 'staff' (staffId -> summary
+        with staffName); summaries hold count, average, min, max, p50, p90
+        and p99
+    """
+    end = end or datetime.utcnow()
+    sketches = read_step_sketches(
+        tenant_id, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+
+    return {
+        'steps': {step: sketch.summary() for step, sketch in sketches['steps'].items()},
+        'staff': {
+            staff_id: {'staffName': entry['name'], **entry['sketch'].summary()}
+            for staff_id, entry in sketches['staff'].items()
+        }
+    }
+
+
+def read_customer_sketch(tenant_id: str, start_day: str, end_day: str) -> HyperLogLog:
+    """
+    Union of the customer sketches of a range of days
+
+    Args:
+        tenant_id: The tenant ID
+        start_day: First day (YYYY-MM-DD, inclusive; empty for the first day
+            on record)
+        end_day: Last day (YYYY-MM-DD, inclusive)
+    """
+    sketch = HyperLogLog()
+    for item in query_all_items(
+        get_orders_table(),
+        Key('PK').eq(f'TENANT#{tenant_id}') & Key('SK').between(
+            f'{CUSTOMERS_PREFIX}{start_day}', f'{CUSTOMERS_PREFIX}{end_day}'
+        )
+    ):
+        sketch.merge(HyperLogLog.from_registers(item))
+    return sketch
+
+
+def get_unique_customers(tenant_id: str, start: datetime, end: datetime = None) -> Dict[str, Any]:
+    """
+    Estimated unique, new and returning customers of a range of days
+
+    New customers placed their first order in the range; returning
+    customers had ordered before it. Both come from unions of the daily
+    sketches: new = |before + range| - |before|.
+
+    Args:
+        tenant_id: The tenant ID
+        start: Start of the range (UTC, widened to whole days)
+        end: End of the range (UTC, defaults to now)
+
+    Returns:
+        Dict with uniqueCustomers, newCustomers, returningCustomers and
+        relativeStandardError
+    """
+    end = end or datetime.utcnow()
+    start_day = start.strftime('%Y-%m-%d')
+    before_day = (start - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    window = read_customer_sketch(tenant_id, start_day, end.strftime('%Y-%m-%d'))
+    history = read_customer_sketch(tenant_id, '', before_day)
+
+    unique = window.count()
+    before = history.count()
+    new = max(0, min(unique, history.merge(window).count() - before))
+
+    return {
+        'period': {'startDate': start_day, 'endDate': end.strftime('%Y-%m-%d')},
+        'uniqueCustomers': unique,
+        'newCustomers': new,
+        'returningCustomers': unique - new,
+        'relativeStandardError': round(window.relative_error, 4)
+    }
+
+
+def read_top_items(
+    tenant_id: str,
+    start_day: str,
+    end_day: str
+) -> Tuple[SpaceSaving, SpaceSaving, Dict[str, str]]:
+    """
+    Merge the top item sketches of a range of days
+
+    Returns:
+        Tuple of (quantity sketch, revenue sketch, itemId -> name)
+    """
+    quantities = SpaceSaving()
+    revenue = SpaceSaving()
+    names = {}
+    for item in query_all_items(
+        get_orders_table(),
+        Key('PK').eq(f'TENANT#{tenant_id}') & Key('SK').between(
+            f'{TOP_ITEMS_PREFIX}{start_day}', f'{TOP_ITEMS_PREFIX}{end_day}'
+        )
+    ):
+        quantities.merge(SpaceSaving.from_attributes(item, 'qty'))
+        revenue.merge(SpaceSaving.from_attributes(item, 'rev'))
+        for attribute, value in item.items():
+            if attribute.startswith('itemName#'):
+                names[attribute[len('itemName#'):]] = value
+    return quantities, revenue, names
+
+
+def get_top_items(
+    tenant_id: str,
+    start: datetime,
+    end: datetime = None,
+    limit: int = 10,
+    by: str = 'quantity'
+) -> List[Dict[str, Any]]:
+    """
+    Best selling items of a range of days from the top item sketches
+
+    Sketches are kept per day, so the range is widened to whole days.
+    Counts are upper bounds: quantityError/revenueError bound how far
+    each one may overestimate (0 when the day sketches were exact).
+
+    Args:
+        tenant_id: The tenant ID
+        start: Start of the range (UTC)
+        end: End of the range (UTC, defaults to now)
+        limit: Number of items
+        by: Rank by quantity or revenue
+
+    Returns:
+        Items with itemId, name, quantity, revenue and their errors
+    """
+    end = end or datetime.utcnow()
+    quantities, revenue, names = read_top_items(
+        tenant_id, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+
+    ranked = (revenue if by == 'revenue' else quantities).top(limit)
+    top_items = []
+    for item_id, _, _ in ranked:
+        quantity, quantity_error = quantities.estimate(item_id)
+        item_revenue, revenue_error = revenue.estimate(item_id)
+        top_items.append({
+            'itemId': item_id,
+            'name': names.get(item_id, 'Unknown'),
+            'quantity': int(quantity),
+            'revenue': round(item_revenue, 2),
+            'quantityError': int(quantity_error),
+            'revenueError': round(revenue_error, 2)
+        })
+    return top_items
+
+
+def use_exact_top_items(start: datetime, end: datetime = None) -> bool:
+    """Whether a window is small enough to rank items from exact counters"""
+    end = end or datetime.utcnow()
+    return end - start <= timedelta(days=TOP_ITEMS_EXACT_MAX_DAYS)
+
+
+def get_dashboard_totals(tenant_id: str, start: datetime, end: datetime = None) -> Dict[str, Any]:
+    """Read and merge the buckets covering a dashboard range"""
+    return merge_buckets(read_buckets(tenant_id, start, end))
@@ -0,0 +1,348 @@
+"""
+Single-pass order aggregation shared by the dashboard and reports
+
+Each order is parsed once into a compact OrderRecord (timestamps parsed,
+items and workflow steps flattened) and fed to an OrderAggregator that
+computes only the requested metrics in one streaming pass:
+
+- totals: orders, revenue and item count
+- status: orders per status
+- periods: revenue/orders/items per day, week or month
+- hours: revenue/orders per hour of day
+- items: quantity/revenue per item
+- customers: order count, spend and first/last order per customer
+- steps: workflow step durations and staff stats of completed orders
+- fulfillment: workflow totalTimeMinutes of completed orders
+
+aggregate_orders() switches large windows to the NumPy engine in
+columnar_analytics when it is installed; OrderAggregator is the fallback.
+"""
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.models.order_status import OrderStatus
+
+
+ALL_METRICS = (
+    'totals', 'status', 'periods', 'hours', 'items',
+    'customers', 'steps', 'fulfillment'
+)
+
+# auto: NumPy engine for windows of at least COLUMNAR_MIN_ORDERS orders
+ANALYTICS_ENGINE = os.environ.get('ANALYTICS_ENGINE', 'auto')
+COLUMNAR_MIN_ORDERS = int(os.environ.get('ANALYTICS_COLUMNAR_MIN_ORDERS', 5000))
+
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """Parse an ISO timestamp into a naive UTC datetime, None if invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (ValueError, AttributeError):
+        return None
+
+
+class ItemLine(NamedTuple):
+    item_id: str
+    name: str
+    quantity: float
+    revenue: float
+
+
+class StepRecord(NamedTuple):
+    step: str
+    staff_id: Optional[str]
+    staff_name: str
+    minutes: Optional[float]
+
+
+class OrderRecord(NamedTuple):
+    order_id: str
+    created: datetime
+    created_at: str
+    status: str
+    total: float
+    customer_id: str
+    customer_name: str
+    items: Tuple[ItemLine, ...]
+    steps: Tuple[StepRecord, ...]
+    total_time_minutes: float
+
+
+def parse_order(order: Dict[str, Any]) -> Optional[OrderRecord]:
+    """
+    Parse an order item into a compact record
+
+    Workflow steps are only parsed for completed orders, the only ones
+    step metrics are computed from.
+
+    Args:
+        order: Order item
+
+    Returns:
+        OrderRecord, or None if the order has no valid createdAt
+    """
+    created_at = order.get('createdAt', '')
+    created = parse_timestamp(created_at)
+    if created is None:
+        return None
+
+    items = tuple(
+        ItemLine(
+            item.get('itemId', item.get('name', 'unknown')),
+            item.get('name', 'Unknown'),
+            item.get('quantity', 1),
+            item.get('price', 0) * item.get('quantity', 1)
+        )
+        for item in order.get('items', [])
+    )
+
+    status = order.get('status', 'UNKNOWN')
+    workflow = order.get('workflow', {}) or {}
+    steps = ()
+    if status == OrderStatus.COMPLETED.value:
+        parsed_steps = []
+        for step in workflow.get('steps', []):
+            start = parse_timestamp(step.get('startTime'))
+            end = parse_timestamp(step.get('endTime'))
+            minutes = (end - start).total_seconds() / 60 if start and end else None
+            parsed_steps.append(StepRecord(
+                step.get('step', ''),
+                step.get('staffId'),
+                step.get('staffName', 'Unknown'),
+                minutes
+            ))
+        steps = tuple(parsed_steps)
+
+    return OrderRecord(
+        order.get('orderId', ''),
+        created,
+        created_at,
+        status,
+        order.get('total', 0),
+        order.get('customerId', 'anonymous'),
+        order.get('customerName', 'Anonymous'),
+        items,
+        steps,
+        workflow.get('totalTimeMinutes', 0) or 0
+    )
+
+
+def period_key(created: datetime, group_by: str) -> str:
+    """Period a timestamp falls in for day, week or month grouping"""
+    if group_by == 'day':
+        return created.strftime('%Y-%m-%d')
+    if group_by == 'week':
+        return created.strftime('%Y-W%W')
+    return created.strftime('%Y-%m')
+
+
+class OrderAggregator:
+    """Streaming accumulator for the requested order metrics"""
+
+    def __init__(
+        self,
+        metrics: Iterable[str] = ALL_METRICS,
+        group_by: str = 'day',
+        item_key: str = 'name'
+    ):
+        """
+        Args:
+            metrics: Metric groups to compute (see ALL_METRICS)
+            group_by: Period grouping for 'periods': day, week or month
+            item_key: Item attribute items are grouped by: name or itemId
+        """
+        self.metrics = set(metrics)
+        self.group_by = group_by
+        self.item_key = item_key
+
+        self.orders = 0
+        self.revenue = 0
+        self.item_count = 0
+        self.status_counts = defaultdict(int)
+        self.periods = defaultdict(lambda: {'revenue': 0, 'orders': 0, 'items': 0})
+        self.hours = defaultdict(lambda: {'revenue': 0, 'orders': 0})
+        self.item_sales = defaultdict(lambda: {'quantity': 0, 'revenue': 0, 'name': 'Unknown'})
+        self.customers = defaultdict(lambda: {
+            'orderCount': 0,
+            'totalSpent': 0,
+            'lastOrder': None,
+            'firstOrder': None
+        })
+        self.step_durations = defaultdict(list)
+        self.staff = defaultdict(lambda: {
+            'name': 'Unknown',
+            'stepsHandled': 0,
+            'timedSteps': 0,
+            'totalTime': 0,
+            'roles': set()
+        })
+        self.fulfillment_times = []
+
+    def add(self, record: OrderRecord) -> None:
+        """Accumulate one order record"""
+        metrics = self.metrics
+        item_quantity = sum(line.quantity for line in record.items)
+
+        if 'totals' in metrics:
+            self.orders += 1
+            self.revenue += record.total
+            self.item_count += item_quantity
+
+        if 'status' in metrics:
+            self.status_counts[record.status] += 1
+
+        if 'periods' in metrics:
+            period = self.periods[period_key(record.created, self.group_by)]
+            period['revenue'] += record.total
+            period['orders'] += 1
+            period['items'] += item_quantity
+
+        if 'hours' in metrics:
+            hour = self.hours[record.created.strftime('%H:00')]
+            hour['revenue'] += record.total
+            hour['orders'] += 1
+
+        if 'items' in metrics:
+            by_id = self.item_key == 'itemId'
+            for line in record.items:
+                sales = self.item_sales[line.item_id if by_id else line.name]
+                sales['quantity'] += line.quantity
+                sales['revenue'] += line.revenue
+                sales['name'] = line.name
+
+        if 'customers' in metrics:
+            customer = self.customers[record.customer_id]
+            customer['name'] = record.customer_name
+            customer['orderCount'] += 1
+            customer['totalSpent'] += record.total
+            if not customer['firstOrder'] or record.created_at < customer['firstOrder']:
+                customer['firstOrder'] = record.created_at
+            if not customer['lastOrder'] or record.created_at > customer['lastOrder']:
+                customer['lastOrder'] = record.created_at
+
+        if 'steps' in metrics:
+            for step in record.steps:
+                staff = self.staff[step.staff_id] if step.staff_id else None
+                if staff is not None:
+                    staff['name'] = step.staff_name
+                    staff['stepsHandled'] += 1
+                    staff['roles'].add(step.step)
+                if step.minutes is not None:
+                    self.step_durations[step.step].append(step.minutes)
+                    if staff is not None:
+                        staff['timedSteps'] += 1
+                        staff['totalTime'] += step.minutes
+
+        if 'fulfillment' in metrics and record.status == OrderStatus.COMPLETED.value:
+            if record.total_time_minutes > 0:
+                self.fulfillment_times.append(record.total_time_minutes)
+
+    def consume(
+        self,
+        orders: Iterable[Dict[str, Any]],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        include_statuses: Optional[Iterable[str]] = None,
+        exclude_statuses: Optional[Iterable[str]] = None
+    ) -> 'OrderAggregator':
+        """
+        Parse and accumulate orders in one pass
+
+        Args:
+            orders: Order items (any iterable, consumed once)
+            start: Only orders created at or after this time
+            end: Only orders created at or before this time
+            include_statuses: Only orders in these statuses
+            exclude_statuses: Skip orders in these statuses
+
+        Returns:
+            self, for chaining
+        """
+        include = set(include_statuses) if include_statuses else None
+        exclude = set(exclude_statuses) if exclude_statuses else set()
+
+        for order in orders:
+            status = order.get('status')
+            if (include is not None and status not in include) or status in exclude:
+                continue
+            record = parse_order(order)
+            if record is None:
+                continue
+            if (start and record.created < start) or (end and record.created > end):
+                continue
+            self.add(record)
+
+        return self
+
+    def top_items(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best selling items by quantity"""
+        key_name = 'itemId' if self.item_key == 'itemId' else 'name'
+        return sorted(
+            [{**sales, key_name: key} for key, sales in self.item_sales.items()],
+            key=lambda x: x['quantity'],
+            reverse=True
+        )[:limit]
+
+    def step_summary(self) -> Dict[str, Dict[str, float]]:
+        """Average/min/max duration in minutes per workflow step"""
+        return {
+            step: {
+                'average': sum(times) / len(times),
+                'min': min(times),
+                'max': max(times),
+                'count': len(times)
+            }
+            for step, times in self.step_durations.items() if times
+        }
+
+
+def aggregate_orders(
+    orders: Iterable[Dict[str, Any]],
+    metrics: Iterable[str],
+    group_by: str = 'day',
+    item_key: str = 'name',
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    include_statuses: Optional[Iterable[str]] = None,
+    exclude_statuses: Optional[Iterable[str]] = None,
+    engine: str = None
+):
+    """
+    Aggregate an order window with the best available engine
+
+    Args:
+        orders: Order items; an iterable without a length (such as a
+            paginated query) is treated as a large window
+        metrics: Metric groups to compute (see ALL_METRICS)
+        group_by: Period grouping for 'periods'
+        item_key: Item attribute items are grouped by
+        start, end, include_statuses, exclude_statuses: Filters, as in
+            OrderAggregator.consume
+        engine: auto, numpy or python (defaults to ANALYTICS_ENGINE)
+
+    Returns:
+        An OrderAggregator or ColumnarAggregator holding the results
+    """
+    from src.services.columnar_analytics import (
+        ColumnarAggregator, COLUMNAR_METRICS, HAS_NUMPY
+    )
+
+    metrics = tuple(metrics)
+    engine = engine or ANALYTICS_ENGINE
+    large_window = not hasattr(orders, '__len__') or len(orders) >= COLUMNAR_MIN_ORDERS
+    use_columnar = HAS_NUMPY and set(metrics) <= COLUMNAR_METRICS and (
+        engine == 'numpy' or (engine == 'auto' and large_window)
+    )
+
+    aggregator_class = ColumnarAggregator if use_columnar else OrderAggregator
+    return aggregator_class(metrics, group_by=group_by, item_key=item_key).consume(
+        orders,
+        start=start,
+        end=end,
+        include_statuses=include_statuses,
+        exclude_statuses=exclude_statuses
+    )
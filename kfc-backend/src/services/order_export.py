@@ -0,0 +1,410 @@
+"""
+Streaming order exports to NDJSON or CSV
+
+An export pages through the tenant's orders and serializes each page as
+it arrives; rows are buffered only up to one multipart part
+(ORDER_EXPORT_PART_MB) before being uploaded to the assets bucket, so
+memory stays bounded whatever the tenant size.
+
+Parts are only flushed at query page boundaries, and every flush records
+a checkpoint on the export item (SK = EXPORT#<exportId>): the upload ID,
+the uploaded parts and the query cursor after the flushed rows. A run that
+runs out of Lambda time, or fails and is redelivered, resumes from the
+last checkpoint.
+"""
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import boto3
+import ulid
+from boto3.dynamodb.conditions import Attr
+
+from src.utils.dynamodb import get_orders_table, get_item, put_item, float_to_decimal
+from src.utils.events import send_to_queue
+from src.utils.order_keys import order_key_condition
+from src.utils.response import DecimalEncoder
+from src.models.order_status import OrderStatus
+
+
+s3_client = boto3.client('s3')
+ASSETS_BUCKET = os.environ.get('ASSETS_BUCKET', 'kfc-assets-dev-595645243021')
+ORDER_EXPORTS_QUEUE_URL = os.environ.get('ORDER_EXPORTS_QUEUE_URL')
+ORDER_EXPORTS_PREFIX = 'exports/orders'
+
+# S3 parts must be at least 5 MB, except the last one
+ORDER_EXPORT_PART_BYTES = max(5, int(os.environ.get('ORDER_EXPORT_PART_MB', 8))) * 1024 * 1024
+# Stop and continue in a new invocation when less time than this is left
+ORDER_EXPORT_TIME_MARGIN_MS = int(os.environ.get('ORDER_EXPORT_TIME_MARGIN_MS', 60000))
+ORDER_EXPORT_MAX_ATTEMPTS = int(os.environ.get('ORDER_EXPORT_MAX_ATTEMPTS', 3))
+ORDER_EXPORT_RETENTION_SECONDS = 7 * 24 * 3600
+ORDER_EXPORT_URL_EXPIRES = int(os.environ.get('ORDER_EXPORT_URL_EXPIRES', 3600))
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+DEFAULT_EXPORT_COLUMNS = [
+    'orderId', 'orderNumber', 'createdAt', 'status', 'customerId',
+    'customerName', 'orderType', 'paymentMethod', 'paymentStatus',
+    'subtotal', 'tax', 'deliveryFee', 'total', 'items'
+]
+MAX_EXPORT_COLUMNS = 50
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', ''))
+
+
+def normalize_export_request(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate an export request
+
+    Args:
+        body: Request body with format, columns, startDate, endDate and
+            statuses (all optional)
+
+    Returns:
+        Export options with defaults applied
+
+    Raises:
+        ValueError: If an option is invalid
+    """
+    export_format = (body.get('format') or 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(EXPORT_FORMATS)}')
+
+    columns = body.get('columns') or DEFAULT_EXPORT_COLUMNS
+    if not isinstance(columns, list) or not all(isinstance(c, str) and c for c in columns):
+        raise ValueError('columns must be a list of attribute names')
+    if len(columns) > MAX_EXPORT_COLUMNS:
+        raise ValueError(f'At most {MAX_EXPORT_COLUMNS} columns can be exported')
+
+    start_date = _parse_date(body.get('startDate'))
+    end_date = _parse_date(body.get('endDate'))
+    if start_date and end_date and start_date > end_date:
+        raise ValueError('startDate must be before endDate')
+
+    statuses = body.get('statuses') or []
+    valid_statuses = [s.value for s in OrderStatus]
+    invalid = [s for s in statuses if s not in valid_statuses]
+    if invalid:
+        raise ValueError(f'Invalid statuses: {", ".join(invalid)}')
+
+    return {
+        'format': export_format,
+        'columns': columns,
+        'startDate': start_date.isoformat() if start_date else None,
+        'endDate': end_date.isoformat() if end_date else None,
+        'statuses': statuses
+    }
+
+
+def export_key(tenant_id: str, export_id: str) -> Dict[str, str]:
+    """Primary key of an order export"""
+    return {
+        'PK': f'TENANT#{tenant_id}',
+        'SK': f'EXPORT#{export_id}'
+    }
+
+
+def get_order_export(tenant_id: str, export_id: str) -> Optional[Dict[str, Any]]:
+    """Get an order export, None if it does not exist"""
+    return get_item(get_orders_table(), export_key(tenant_id, export_id))
+
+
+def create_order_export(tenant_id: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Create an order export and queue its first run
+
+    Args:
+        tenant_id: The tenant ID
+        options: Export options (see normalize_export_request)
+
+    Returns:
+        The export item
+    """
+    export_id = str(ulid.new())
+    now = int(time.time())
+    extension = 'csv' if options['format'] == 'csv' else 'ndjson'
+
+    export = put_item(get_orders_table(), {
+        **export_key(tenant_id, export_id),
+        'exportId': export_id,
+        'status': QUEUED,
+        **options,
+        'resultKey': f'{ORDER_EXPORTS_PREFIX}/{tenant_id}/{export_id}.{extension}',
+        'parts': [],
+        'rowsExported': 0,
+        'bytesExported': 0,
+        'requestedAt': now,
+        'updatedAt': now,
+        'expiresAt': now + ORDER_EXPORT_RETENTION_SECONDS
+    })
+
+    send_to_queue(ORDER_EXPORTS_QUEUE_URL, {'tenantId': tenant_id, 'exportId': export_id})
+    return export
+
+
+def _order_query(tenant_id: str, export: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Query parameters for the orders of an export
+
+    Order IDs are ULIDs, so a date range maps to an SK range; the createdAt
+    filter keeps the bounds exact.
+    """
+    start_date = _parse_date(export.get('startDate'))
+    end_date = _parse_date(export.get('endDate'))
+
+    key_condition = order_key_condition(tenant_id, start_date, end_date)
+
+    filters = []
+    if start_date:
+        filters.append(Attr('createdAt').gte(start_date.isoformat()))
+    if end_date:
+        filters.append(Attr('createdAt').lte(end_date.isoformat()))
+    if export.get('statuses'):
+        filters.append(Attr('status').is_in(export['statuses']))
+
+    params = {'KeyConditionExpression': key_condition}
+    if filters:
+        filter_expression = filters[0]
+        for condition in filters[1:]:
+            filter_expression &= condition
+        params['FilterExpression'] = filter_expression
+    return params
+
+
+def _column_value(order: Dict[str, Any], column: str) -> Any:
+    """Value of a column; dotted names read nested attributes"""
+    value = order
+    for part in column.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class RowWriter:
+    """Serializes orders into an in-memory part buffer"""
+
+    def __init__(self, export_format: str, columns: List[str], header: bool):
+        """
+        Args:
+            export_format: ndjson or csv
+            columns: Columns to write
+            header: Write the CSV header first (first part only)
+        """
+        self.format = export_format
+        self.columns = columns
+        self.buffer = bytearray()
+        self.rows = 0
+        if export_format == 'csv' and header:
+            self._write_csv([columns])
+
+    def _write_csv(self, rows: List[List[Any]]) -> None:
+        text = io.StringIO()
+        csv.writer(text).writerows(rows)
+        self.buffer += text.getvalue().encode('utf-8')
+
+    def write_page(self, orders: List[Dict[str, Any]]) -> None:
+        """Serialize one page of orders"""
+        if self.format == 'csv':
+            rows = []
+            for order in orders:
+                row = []
+                for column in self.columns:
+                    value = _column_value(order, column)
+                    if isinstance(value, (dict, list)):
+                        value = json.dumps(value, cls=DecimalEncoder)
+                    row.append('' if value is None else value)
+                rows.append(row)
+            self._write_csv(rows)
+        else:
+            for order in orders:
+                row = {column: _column_value(order, column) for column in self.columns}
+                self.buffer += (json.dumps(row, cls=DecimalEncoder) + '\n').encode('utf-8')
+        self.rows += len(orders)
+
+    def take(self) -> bytes:
+        """Return and clear the buffered bytes"""
+        data = bytes(self.buffer)
+        self.buffer = bytearray()
+        return data
+
+
+def _save_checkpoint(tenant_id: str, export_id: str, fields: Dict[str, Any]) -> None:
+    """Record export progress"""
+    names = {}
+    values = {':now': int(time.time())}
+    assignments = ['updatedAt = :now']
+
+    for index, (field, value) in enumerate(fields.items()):
+        names[f'#f{index}'] = field
+        values[f':f{index}'] = float_to_decimal(value)
+        assignments.append(f'#f{index} = :f{index}')
+
+    get_orders_table().update_item(
+        Key=export_key(tenant_id, export_id),
+        UpdateExpression='SET ' + ', '.join(assignments),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+
+def _upload_part(export: Dict[str, Any], parts: List[Dict[str, Any]], data: bytes) -> None:
+    part_number = len(parts) + 1
+    response = s3_client.upload_part(
+        Bucket=ASSETS_BUCKET,
+        Key=export['resultKey'],
+        UploadId=export['uploadId'],
+        PartNumber=part_number,
+        Body=data
+    )
+    parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+
+
+def fail_order_export(tenant_id: str, export: Dict[str, Any], error: str) -> None:
+    """Mark an export as failed and abort its multipart upload"""
+    if export.get('uploadId'):
+        try:
+            s3_client.abort_multipart_upload(
+                Bucket=ASSETS_BUCKET,
+                Key=export['resultKey'],
+                UploadId=export['uploadId']
+            )
+        except Exception as abort_error:
+            print(f"Order export abort error: {str(abort_error)}")
+    _save_checkpoint(tenant_id, export['exportId'], {'status': FAILED, 'error': error})
+
+
+def run_order_export(
+    tenant_id: str,
+    export_id: str,
+    remaining_ms: Callable[[], int]
+) -> Optional[str]:
+    """
+    Run an export from its last checkpoint
+
+    Args:
+        tenant_id: The tenant ID
+        export_id: The export ID
+        remaining_ms: Milliseconds left in the invocation
+
+    Returns:
+        COMPLETED, RUNNING if it was continued in a new message, or None if
+        the export does not exist or already finished
+    """
+    table = get_orders_table()
+    export = get_order_export(tenant_id, export_id)
+    if not export or export['status'] in (COMPLETED, FAILED):
+        return None
+
+    if not export.get('uploadId'):
+        export['uploadId'] = s3_client.create_multipart_upload(
+            Bucket=ASSETS_BUCKET,
+            Key=export['resultKey'],
+            ContentType=CONTENT_TYPES[export['format']]
+        )['UploadId']
+    export.setdefault('startedAt', int(time.time()))
+    _save_checkpoint(tenant_id, export_id, {
+        'status': RUNNING,
+        'uploadId': export['uploadId'],
+        'startedAt': export['startedAt']
+    })
+
+    parts = [
+        {'PartNumber': int(part['PartNumber']), 'ETag': part['ETag']}
+        for part in export.get('parts', [])
+    ]
+    rows = int(export.get('rowsExported', 0))
+    exported_bytes = int(export.get('bytesExported', 0))
+    writer = RowWriter(export['format'], export['columns'], header=not parts)
+
+    params = _order_query(tenant_id, export)
+    if export.get('cursor'):
+        params['ExclusiveStartKey'] = json.loads(export['cursor'])
+
+    while True:
+        response = table.query(**params)
+        writer.write_page(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+
+        if len(writer.buffer) >= ORDER_EXPORT_PART_BYTES or not last_key:
+            data = writer.take()
+            _upload_part(export, parts, data)
+            rows += writer.rows
+            exported_bytes += len(data)
+            writer.rows = 0
+            _save_checkpoint(tenant_id, export_id, {
+                'parts': parts,
+                'cursor': json.dumps(last_key, cls=DecimalEncoder) if last_key else None,
+                'rowsExported': rows,
+                'bytesExported': exported_bytes
+            })
+
+        if not last_key:
+            break
+        params['ExclusiveStartKey'] = last_key
+
+        if remaining_ms() < ORDER_EXPORT_TIME_MARGIN_MS:
+            # Rows buffered since the last checkpoint are read again by
+            # the next invocation
+            send_to_queue(ORDER_EXPORTS_QUEUE_URL, {'tenantId': tenant_id, 'exportId': export_id})
+            return RUNNING
+
+    s3_client.complete_multipart_upload(
+        Bucket=ASSETS_BUCKET,
+        Key=export['resultKey'],
+        UploadId=export['uploadId'],
+        MultipartUpload={'Parts': parts}
+    )
+    _save_checkpoint(tenant_id, export_id, {
+        'status': COMPLETED,
+        'completedAt': int(time.time())
+    })
+    return COMPLETED
+
+
+def _iso(timestamp: Any) -> Optional[str]:
+    return datetime.utcfromtimestamp(int(timestamp)).isoformat() if timestamp else None
+
+
+def order_export_view(export: Dict[str, Any]) -> Dict[str, Any]:
+    """Public representation of an export, with a download URL once completed"""
+    view = {
+        'exportId': export['exportId'],
+        'status': export['status'],
+        'format': export['format'],
+        'columns': export['columns'],
+        'startDate': export.get('startDate'),
+        'endDate': export.get('endDate'),
+        'statuses': export.get('statuses', []),
+        'rowsExported': int(export.get('rowsExported', 0)),
+        'bytesExported': int(export.get('bytesExported', 0)),
+        'requestedAt': _iso(export.get('requestedAt')),
+        'completedAt': _iso(export.get('completedAt'))
+    }
+
+    if export['status'] == COMPLETED:
+        view['downloadUrl'] = s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': ASSETS_BUCKET, 'Key': export['resultKey']},
+            ExpiresIn=ORDER_EXPORT_URL_EXPIRES
+        )
+        view['urlExpiresIn'] = ORDER_EXPORT_URL_EXPIRES
+    if export['status'] == FAILED:
+        view['error'] = export.get('error')
+
+    return view
@@ -0,0 +1,244 @@
+"""
+Maintained per-tenant, per-day order statistics
+
+Each day has one item in the orders table (SK = STATS#DAY#<date>) holding
+counters that are updated atomically with ADD whenever an order is
+created or changes status, so reading today's statistics is one get_item.
+Orders are attributed to the UTC day they were created on.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from boto3.dynamodb.conditions import Key
+
+from src.utils.dynamodb import (
+    get_orders_table, get_item, query_all_items, float_to_decimal
+)
+from src.models.order_status import OrderStatus
+
+
+def stats_key(tenant_id: str, day: str) -> Dict[str, str]:
+    """Primary key of a tenant's statistics item for a day (YYYY-MM-DD)"""
+    return {
+        'PK': f'TENANT#{tenant_id}',
+        'SK': f'STATS#DAY#{day}'
+    }
+
+
+def status_counter(status: str) -> str:
+    """Attribute name of the per-status order counter"""
+    return f'count_{status}'
+
+
+def fulfillment_minutes(order: Dict[str, Any]) -> Optional[float]:
+    """
+    Minutes from order creation to completion
+
+    Args:
+        order: A completed order
+
+    Returns:
+        Fulfillment time in minutes, or None if it cannot be determined
+    """
+    created_at = order.get('createdAt')
+    completed_at = (
+        order.get('completedAt')
+        or order.get('workflow', {}).get('completedAt')
+        or order.get('updatedAt')
+    )
+    if not created_at or not completed_at:
+        return None
+
+    try:
+        start = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        end = datetime.fromisoformat(completed_at.replace('Z', '+00:00'))
+        return (end.replace(tzinfo=None) - start.replace(tzinfo=None)).total_seconds() / 60
+    except ValueError:
+        return None
+
+
+def _apply_counters(
+    tenant_id: str,
+    day: str,
+    counters: Dict[str, float]
+) -> None:
+    """Atomically ADD the given deltas to a day's statistics item"""
+    counters = {k: v for k, v in counters.items() if v}
+    if not counters:
+        return
+
+    names = {}
+    values = {':now': datetime.utcnow().isoformat()}
+    add_clauses = []
+    for index, (attribute, delta) in enumerate(counters.items()):
+        names[f'#c{index}'] = attribute
+        values[f':c{index}'] = delta
+        add_clauses.append(f'#c{index} :c{index}')
+
+    table = get_orders_table()
+    table.update_item(
+        Key=stats_key(tenant_id, day),
+        UpdateExpression='ADD ' + ', '.join(add_clauses) + ' SET updatedAt = :now',
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=float_to_decimal(values)
+    )
+
+
+def record_order_created(tenant_id: str, order: Dict[str, Any]) -> None:
+    """
+    Count a newly created order in its day's statistics
+
+    Args:
+        tenant_id: The tenant ID
+        order: The created order
+    """
+    _apply_counters(tenant_id, order['createdAt'][:10], {
+        'totalOrders': 1,
+        'totalRevenue': float(order.get('total', 0)),
+        status_counter(order.get('status', OrderStatus.PENDING.value)): 1
+    })
+
+
+def record_status_change(tenant_id: str, order: Dict[str, Any]) -> None:
+    """
+    Move an order between status counters after a transition
+
+    Args:
+        tenant_id: The tenant ID
+        order: The updated order (including previousStatus)
+    """
+    old_status = order.get('previousStatus')
+    new_status = order.get('status')
+    if not order.get('createdAt') or old_status == new_status:
+        return
+
+    counters = {status_counter(new_status): 1}
+    if old_status:
+        counters[status_counter(old_status)] = -1
+
+    if new_status == OrderStatus.CANCELLED.value:
+        counters['totalRevenue'] = -float(order.get('total', 0))
+
+    if new_status == OrderStatus.COMPLETED.value:
+        minutes = fulfillment_minutes(order)
+        if minutes is not None:
+            counters['fulfillmentMinutesSum'] = minutes
+            counters['fulfillmentCount'] = 1
+
+    _apply_counters(tenant_id, order['createdAt'][:10], counters)
+
+
+def compute_daily_stats(orders: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Compute statistics counters from order history, grouped by day
+
+    Args:
+        orders: Orders to aggregate
+
+    Returns:
+        Mapping of day (YYYY-MM-DD) to counters
+    """
+    days = defaultdict(lambda: defaultdict(float))
+
+    for order in orders:
+        created_at = order.get('createdAt', '')
+        if not created_at:
+            continue
+
+        status = order.get('status', OrderStatus.PENDING.value)
+        counters = days[created_at[:10]]
+        counters['totalOrders'] += 1
+        counters[status_counter(status)] += 1
+
+        if status != OrderStatus.CANCELLED.value:
+            counters['totalRevenue'] += float(order.get('total', 0))
+
+        if status == OrderStatus.COMPLETED.value:
+            minutes = fulfillment_minutes(order)
+            if minutes is not None:
+                counters['fulfillmentMinutesSum'] += minutes
+                counters['fulfillmentCount'] += 1
+
+    return days
+
+
+def rebuild_daily_stats(
+    tenant_id: str,
+    start_day: str = None,
+    end_day: str = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    Recompute and overwrite a tenant's statistics items from order history
+
+    Args:
+        tenant_id: The tenant ID
+        start_day: First day to rebuild (YYYY-MM-DD, inclusive)
+        end_day: Last day to rebuild (YYYY-MM-DD, inclusive)
+
+    Returns:
+        The rebuilt counters by day
+    """
+    table = get_orders_table()
+
+    orders = query_all_items(
+        table,
+        Key('PK').eq(f'TENANT#{tenant_id}') & Key('SK').begins_with('ORDER#')
+    )
+    days = compute_daily_stats(
+        o for o in orders
+        if (not start_day or o.get('createdAt', '')[:10] >= start_day)
+        and (not end_day or o.get('createdAt', '')[:10] <= end_day)
+    )
+
+    now = datetime.utcnow().isoformat()
+    with table.batch_writer() as batch:
+        for day, counters in days.items():
+            batch.put_item(Item=float_to_decimal({
+                **stats_key(tenant_id, day),
+                **counters,
+                'updatedAt': now,
+                'rebuiltAt': now
+            }))
+
+    return days
+
+
+def get_daily_stats(tenant_id: str, day: str) -> Dict[str, Any]:
+    """
+    Read a day's statistics and format them for the API
+
+    Args:
+        tenant_id: The tenant ID
+        day: The day (YYYY-MM-DD)
+
+    Returns:
+        Statistics summary
+    """
+    stats = get_item(get_orders_table(), stats_key(tenant_id, day)) or {}
+    return format_daily_stats(day, stats)
+
+
+def format_daily_stats(day: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Format raw statistics counters as the statistics response"""
+    total_orders = int(stats.get('totalOrders', 0))
+    completed = int(stats.get(status_counter(OrderStatus.COMPLETED.value), 0))
+    cancelled = int(stats.get(status_counter(OrderStatus.CANCELLED.value), 0))
+    pending = int(stats.get(status_counter(OrderStatus.PENDING.value), 0))
+    in_progress = total_orders - completed - cancelled - pending
+
+    fulfillment_count = stats.get('fulfillmentCount', 0)
+    avg_time = stats.get('fulfillmentMinutesSum', 0) / \
+        fulfillment_count if fulfillment_count else 0
+
+    return {
+        'date': day,
+        'totalOrders': total_orders,
+        'totalRevenue': round(stats.get('totalRevenue', 0), 2),
+        'completedOrders': completed,
+        'pendingOrders': pending,
+        'inProgressOrders': in_progress,
+        'cancelledOrders': cancelled,
+        'averageCompletionTime': round(avg_time, 1),
+        'completionRate': round(completed / total_orders * 100, 1) if total_orders > 0 else 0
+    }
@@ -0,0 +1,300 @@
+"""
+Order writes: conditional status transitions and versioned field updates
+
+Every write to an order item increments its numeric `version` attribute,
+which is what order ETags are derived from.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from botocore.exceptions import ClientError
+
+from src.utils.dynamodb import get_orders_table, float_to_decimal, decimal_to_float
+from src.models.order_status import get_previous_statuses, ACTIVE_STATUSES
+from src.services.order_stats import record_status_change
+from src.services.admission import record_kitchen_transition
+
+
+def active_index_keys(tenant_id: str, order_id: str, created_at: str) -> Dict[str, str]:
+    """
+    Key attributes for the sparse ActiveIndex GSI
+
+    Only orders in ACTIVE_STATUSES carry these attributes, so the index
+    holds just the orders currently moving through the kitchen.
+    """
+    return {
+        'ActivePK': f'TENANT#{tenant_id}',
+        'ActiveSK': f'{created_at}#{order_id}'
+    }
+
+
+class OrderTransitionError(Exception):
+    """Raised when an order is not in a status that allows the transition"""
+
+    def __init__(self, order_id: str, new_status: str,
+                 expected_statuses: List[str], current_status: Optional[str] = None):
+        self.order_id = order_id
+        self.new_status = new_status
+        self.expected_statuses = expected_statuses
+        self.current_status = current_status
+        if not expected_statuses:
+            super().__init__(f'No order can move to {new_status}')
+        else:
+            super().__init__(
+                f'Order {order_id} cannot move to {new_status}. '
+                f'Current status: {current_status}'
+            )
+
+
+class WorkflowStepChangedError(Exception):
+    """Raised when the workflow step to close moved since the order was read"""
+
+
+def transition_order_status(
+    tenant_id: str,
+    order_id: str,
+    new_status: str,
+    expected_status: Optional[Union[str, List[str]]] = None,
+    staff_id: str = None,
+    staff_name: str = None,
+    message: str = None,
+    history_entry: Optional[Dict[str, Any]] = None,
+    extra_updates: Optional[Dict[str, Any]] = None,
+    workflow_step: Optional[Dict[str, Any]] = None,
+    close_step: Optional[Tuple[int, str]] = None,
+    broadcast: bool = True
+) -> Dict[str, Any]:
+    """
+    Move an order to a new status with a single conditional UpdateItem
+
+    The update asserts the current status instead of reading the order
+    first, so concurrent transitions of the same order cannot both win.
+
+    Args:
+        tenant_id: The tenant ID
+        order_id: The order ID
+        new_status: The new status
+        expected_status: Status (or list of statuses) the order must be in.
+            Defaults to the legal predecessors of new_status.
+        staff_id: ID of staff making the change
+        staff_name: Name of staff making the change
+        message: Optional status history message
+        history_entry: Extra fields merged into the status history entry
+        extra_updates: Additional attribute paths to SET in the same update
+        workflow_step: Step record appended to workflow.steps
+        close_step: (index, step name) of an open workflow step, read from
+            the order beforehand; its endTime is set to the transition time
+        broadcast: Whether to broadcast and publish the change
+
+    Returns:
+        Updated order (ALL_NEW)
+
+    Raises:
+        ValueError: If the order does not exist
+        OrderTransitionError: If the order is not in an expected status
+        WorkflowStepChangedError: If close_step no longer names an open step
+    """
+    if expected_status is None:
+        expected_statuses = get_previous_statuses(new_status)
+    elif isinstance(expected_status, str):
+        expected_statuses = [expected_status]
+    else:
+        expected_statuses = list(expected_status)
+
+    if not expected_statuses:
+        raise OrderTransitionError(order_id, new_status, expected_statuses)
+
+    table = get_orders_table()
+    now = datetime.utcnow().isoformat()
+
+    status_entry = {
+        'status': new_status,
+        'timestamp': now,
+        'message': message or f'Status changed to {new_status}'
+    }
+    if staff_id:
+        status_entry['staffId'] = staff_id
+        status_entry['staffName'] = staff_name
+    if history_entry:
+        status_entry.update(history_entry)
+
+    # Operands on the right-hand side see the item before the update,
+    # so previousStatus captures the status we transitioned from.
+    set_clauses = [
+        'previousStatus = #status',
+        '#status = :newStatus',
+        'GSI1PK = :gsi1pk',
+        'GSI1SK = :now',
+        'statusHistory = list_append(if_not_exists(statusHistory, :empty), :statusEntry)',
+        'updatedAt = :now'
+    ]
+    expression_values = {
+        ':newStatus': new_status,
+        ':gsi1pk': f'TENANT#{tenant_id}#STATUS#{new_status}',
+        ':now': now,
+        ':statusEntry': [status_entry],
+        ':empty': []
+    }
+
+    if workflow_step:
+        set_clauses.append(
+            'workflow.steps = list_append(if_not_exists(workflow.steps, :empty), :workflowStep)')
+        expression_values[':workflowStep'] = [workflow_step]
+
+    for index, (path, value) in enumerate((extra_updates or {}).items()):
+        set_clauses.append(f'{path} = :extra{index}')
+        expression_values[f':extra{index}'] = value
+
+    expression_names = {'#status': 'status'}
+    conditions = []
+    if close_step:
+        # Steps are only ever appended, so the index stays valid unless the
+        # step was closed meanwhile; the condition catches that
+        step_index, step_name = close_step
+        step_path = f'workflow.steps[{step_index}]'
+        set_clauses.append(f'{step_path}.endTime = :now')
+        conditions.append(
+            f'{step_path}.#step = :closeStep AND attribute_not_exists({step_path}.endTime)')
+        expression_names['#step'] = 'step'
+        expression_values[':closeStep'] = step_name
+
+    update_expression = 'SET ' + ', '.join(set_clauses)
+
+    # Leaving the active set drops the order out of the sparse ActiveIndex
+    if new_status not in ACTIVE_STATUSES:
+        update_expression += ' REMOVE ActivePK, ActiveSK'
+
+    update_expression += ' ADD version :one'
+    expression_values[':one'] = 1
+
+    expected_placeholders = []
+    for index, status in enumerate(expected_statuses):
+        placeholder = f':expected{index}'
+        expected_placeholders.append(placeholder)
+        expression_values[placeholder] = status
+
+    try:
+        response = table.update_item(
+            Key={
+                'PK': f'TENANT#{tenant_id}',
+                'SK': f'ORDER#{order_id}'
+            },
+            UpdateExpression=update_expression,
+            ConditionExpression=' AND '.join([
+                'attribute_exists(PK)',
+                f'#status IN ({", ".join(expected_placeholders)})',
+                *conditions
+            ]),
+            ExpressionAttributeNames=expression_names,
+            ExpressionAttributeValues=float_to_decimal(expression_values),
+            ReturnValues='ALL_NEW',
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+        current = e.response.get('Item')
+        if not current:
+            raise ValueError('Order not found')
+        current_status = current.get('status', {}).get('S')
+        if close_step and current_status in expected_statuses:
+            raise WorkflowStepChangedError(f'Workflow step of order {order_id} changed')
+        raise OrderTransitionError(
+            order_id, new_status, expected_statuses, current_status)
+
+    updated_order = decimal_to_float(response.get('Attributes', {}))
+
+    try:
+        record_status_change(tenant_id, updated_order)
+    except Exception as stats_error:
+        print(f"Order statistics update error: {str(stats_error)}")
+
+    try:
+        record_kitchen_transition(tenant_id, updated_order)
+    except Exception as admission_error:
+        print(f"Kitchen capacity release error: {str(admission_error)}")
+
+    if broadcast:
+        publish_transition(tenant_id, order_id, updated_order)
+
+    return updated_order
+
+
+def update_order_fields(
+    tenant_id: str,
+    order_id: str,
+    fields: Dict[str, Any],
+    expression_names: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    SET attributes on an existing order and bump its version
+
+    Args:
+        tenant_id: The tenant ID
+        order_id: The order ID
+        fields: Attribute paths to values, e.g. {'workflow.steps': [...]}
+        expression_names: Optional ExpressionAttributeNames for the paths
+
+    Returns:
+        Updated order (ALL_NEW)
+
+    Raises:
+        ValueError: If the order does not exist
+    """
+    set_clauses = []
+    expression_values = {':one': 1}
+    for index, (path, value) in enumerate(fields.items()):
+        set_clauses.append(f'{path} = :field{index}')
+        expression_values[f':field{index}'] = value
+
+    params = {
+        'Key': {
+            'PK': f'TENANT#{tenant_id}',
+            'SK': f'ORDER#{order_id}'
+        },
+        'UpdateExpression': 'SET ' + ', '.join(set_clauses) + ' ADD version :one',
+        'ConditionExpression': 'attribute_exists(PK)',
+        'ExpressionAttributeValues': float_to_decimal(expression_values),
+        'ReturnValues': 'ALL_NEW'
+    }
+    if expression_names:
+        params['ExpressionAttributeNames'] = expression_names
+
+    try:
+        response = get_orders_table().update_item(**params)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            raise ValueError('Order not found')
+        raise
+
+    return decimal_to_float(response.get('Attributes', {}))
+
+
+def publish_transition(tenant_id: str, order_id: str, order: Dict[str, Any]) -> None:
+    """
+    Broadcast a completed transition and publish it to EventBridge
+
+    Args:
+        tenant_id: The tenant ID
+        order_id: The order ID
+        order: The updated order
+    """
+    from src.services.broadcast_coalescing import coalesce_order_update
+    from src.utils.events import publish_order_event
+
+    new_status = order.get('status')
+
+    try:
+        # Back-to-back transitions of an order go out as one update
+        coalesce_order_update(tenant_id, order_id, new_status, order)
+    except Exception as ws_error:
+        print(f"WebSocket broadcast error: {str(ws_error)}")
+
+    try:
+        publish_order_event('OrderStatusChanged', tenant_id, order_id, {
+            'order': order,
+            'oldStatus': order.get('previousStatus'),
+            'newStatus': new_status
+        })
+    except Exception as event_error:
+        print(f"EventBridge publish error: {str(event_error)}")
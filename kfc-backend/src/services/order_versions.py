@@ -0,0 +1,80 @@
+"""
+Order versions and ETags for conditional GETs
+
+Order items carry a `version` that every write increments, so a poll can
+be answered with 304 Not Modified after reading just that attribute.
+"""
+from typing import Any, Dict, Optional
+
+from src.utils.dynamodb import get_orders_table, get_item
+from src.utils.response import build_etag, get_if_none_match
+
+
+def order_etag(order: Dict[str, Any], variant: str = None) -> str:
+    """
+    ETag for an order representation
+
+    Args:
+        order: The order (or a projection with orderId/version/updatedAt)
+        variant: Representation name, so different endpoints never share tags
+
+    Returns:
+        Quoted ETag string
+    """
+    # Orders written before versioning fall back to their last update time
+    version = order.get('version')
+    parts = [
+        order.get('orderId', ''),
+        int(version) if version else order.get('updatedAt', '')
+    ]
+    if variant:
+        parts.append(variant)
+    return build_etag(*parts)
+
+
+def get_order_version(tenant_id: str, order_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Projected read of just the fields an ETag is built from
+
+    Returns:
+        Dict with orderId, version and updatedAt, or None if not found
+    """
+    return get_item(
+        get_orders_table(),
+        {'PK': f'TENANT#{tenant_id}', 'SK': f'ORDER#{order_id}'},
+        projection='orderId, #version, updatedAt',
+        expression_names={'#version': 'version'}
+    )
+
+
+def check_not_modified(
+    event: Dict[str, Any],
+    tenant_id: str,
+    order_id: str,
+    variant: str = None
+) -> Optional[str]:
+    """
+    Answer If-None-Match from a projected version read
+
+    Args:
+        event: The Lambda event
+        tenant_id: The tenant ID
+        order_id: The order ID
+        variant: Representation name passed to order_etag
+
+    Returns:
+        The current ETag if the client's copy is still fresh, else None
+    """
+    if_none_match = get_if_none_match(event)
+    if not if_none_match:
+        return None
+
+    current = get_order_version(tenant_id, order_id)
+    if not current:
+        return None
+
+    etag = order_etag(current, variant)
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    if etag in candidates or f'W/{etag}' in candidates or '*' in candidates:
+        return etag
+    return None
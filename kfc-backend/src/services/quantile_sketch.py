@@ -0,0 +1,147 @@
+"""
+Mergeable quantile sketch for durations
+
+Values are counted in logarithmic buckets: bucket i holds the values in
+(gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so every quantile
+is answered within relative accuracy a (1% by default) of a value of the
+right rank. Two sketches merge by adding bucket counts, which is also how
+they are stored: each bucket is a plain counter attribute (b<index>) that
+DynamoDB ADD updates can increment. The exact min and max are stored next
+to count and sum; they are not additive, so writers keep the lower or
+higher of the stored and the new value (see EXTREMES).
+"""
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional
+
+
+RELATIVE_ACCURACY = 0.01
+# Values at or below this (minutes) are counted in the zero bucket
+MIN_VALUE = 1e-3
+
+BUCKET_PREFIX = 'b'
+ZERO_BUCKET = 'zero'
+
+# Non-additive attributes of to_counters and how two values combine
+EXTREMES = {'min': min, 'max': max}
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch with relative error guarantees"""
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def _extend(self, low: Optional[float], high: Optional[float]) -> None:
+        if low is not None:
+            self.min = low if self.min is None else min(self.min, low)
+        if high is not None:
+            self.max = high if self.max is None else max(self.max, high)
+
+    def bucket_index(self, value: float) -> int:
+        """Bucket a positive value falls in"""
+        return int(math.ceil(math.log(value) / self.log_gamma))
+
+    def add(self, value: float, count: int = 1) -> 'QuantileSketch':
+        """Count a value"""
+        if value is None:
+            return self
+        if value <= MIN_VALUE:
+            self.zero_count += count
+        else:
+            self.buckets[self.bucket_index(value)] += count
+        self.count += count
+        self.sum += max(value, 0) * count
+        self._extend(max(value, 0), max(value, 0))
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Add another sketch's counts (same accuracy) into this one"""
+        for index, count in other.buckets.items():
+            self.buckets[index] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self._extend(other.min, other.max)
+        return self
+
+    def _bucket_value(self, index: int) -> float:
+        # The point of the bucket with the same relative error to both ends
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Approximate q-quantile
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            The quantile, None if the sketch is empty
+        """
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return self._bucket_value(index)
+        return self._bucket_value(max(self.buckets))
+
+    @property
+    def average(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def summary(self, quantiles: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, Any]:
+        """Count, average, min, max and the given quantiles (keys p50, p90, p99...)"""
+        result = {'count': self.count, 'average': self.average, 'min': self.min, 'max': self.max}
+        for q in quantiles:
+            result[f'p{q * 100:g}'] = self.quantile(q)
+        return result
+
+    def to_counters(self) -> Dict[str, float]:
+        """Counter attributes of the sketch, for storage or ADD updates"""
+        counters = {f'{BUCKET_PREFIX}{index}': count for index, count in self.buckets.items()}
+        if self.zero_count:
+            counters[ZERO_BUCKET] = self.zero_count
+        counters['count'] = self.count
+        counters['sum'] = self.sum
+        if self.count:
+            counters['min'] = self.min
+            counters['max'] = self.max
+        return counters
+
+    @classmethod
+    def from_counters(
+        cls,
+        attributes: Dict[str, Any],
+        relative_accuracy: float = RELATIVE_ACCURACY
+    ) -> 'QuantileSketch':
+        """Rebuild a sketch from stored counter attributes"""
+        sketch = cls(relative_accuracy)
+        for attribute, value in attributes.items():
+            if attribute == ZERO_BUCKET:
+                sketch.zero_count += int(value)
+            elif attribute.startswith(BUCKET_PREFIX) and attribute[1:].lstrip('-').isdigit():
+                sketch.buckets[int(attribute[1:])] += int(value)
+        sketch.count = int(attributes.get('count', 0))
+        sketch.sum = float(attributes.get('sum', 0))
+        if 'min' in attributes and 'max' in attributes:
+            sketch._extend(float(attributes['min']), float(attributes['max']))
+        else:
+            # Stored before min/max were kept: the edge buckets, within
+            # the relative accuracy
+            sketch._extend(sketch.quantile(0), sketch.quantile(1))
+        return sketch
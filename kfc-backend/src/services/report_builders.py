@@ -0,0 +1,362 @@
+"""
+Report payload builders for the sales, performance and customer reports
+
+Builders take normalized parameters (see normalize_report_params), so the
+same parameters identify a report in the result cache and in report jobs.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.utils.dynamodb import get_orders_table, query_all_items
+from src.utils.order_keys import order_key_condition
+from src.models.order_status import OrderStatus
+from src.services.order_analytics import OrderAggregator, aggregate_orders
+from src.services.order_aggregates import (
+    get_step_percentiles, get_top_items, use_exact_top_items
+)
+
+
+REPORT_TYPES = ('sales', 'performance', 'customers')
+GROUP_BY_VALUES = ('day', 'week', 'month')
+# Sales reports without a startDate cover this many days up to their end
+DEFAULT_SALES_DAYS = 7
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Parse a report date parameter (ISO, optional Z suffix)"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', ''))
+
+
+def normalize_report_params(report_type: str, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize report query parameters
+
+    Args:
+        report_type: sales, performance or customers
+        query_params: Raw query string parameters
+
+    Returns:
+        Parameters with defaults applied and dates in ISO format
+
+    Raises:
+        ValueError: If the report type or a parameter is invalid
+    """
+    query_params = query_params or {}
+
+    if report_type == 'sales':
+        start_date = _parse_date(query_params.get('startDate'))
+        end_date = _parse_date(query_params.get('endDate'))
+        # With a fixed end the default start is fixed too, so the cache key
+        # names the period actually reported; without one both stay open
+        if end_date and not start_date:
+            start_date = end_date - timedelta(days=DEFAULT_SALES_DAYS)
+        group_by = (query_params.get('groupBy') or 'day').lower()
+        if group_by not in GROUP_BY_VALUES:
+            raise ValueError(f'groupBy must be one of: {", ".join(GROUP_BY_VALUES)}')
+        return {
+            'startDate': start_date.isoformat() if start_date else None,
+            'endDate': end_date.isoformat() if end_date else None,
+            'groupBy': group_by,
+            'exactItems': str(query_params.get('exactItems', '')).lower() == 'true'
+        }
+
+    if report_type == 'performance':
+        days = int(query_params.get('days', 7))
+        if days < 1:
+            raise ValueError('days must be at least 1')
+        return {'days': days}
+
+    if report_type == 'customers':
+        return {}
+
+    raise ValueError(f'Unknown report type: {report_type}')
+
+
+def report_end(report_type: str, params: Dict[str, Any]) -> Optional[datetime]:
+    """End of the period a report covers, None if it runs up to now"""
+    if report_type == 'sales':
+        return _parse_date(params.get('endDate'))
+    return None
+
+
+def report_window(
+    report_type: str,
+    params: Dict[str, Any],
+    now: Optional[datetime] = None
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Creation-time window of the orders a report covers, None for unbounded"""
+    now = now or datetime.utcnow()
+    if report_type == 'sales':
+        end_date = _parse_date(params.get('endDate')) or now
+        start_date = _parse_date(params.get('startDate')) or end_date - timedelta(days=DEFAULT_SALES_DAYS)
+        return start_date, end_date
+    if report_type == 'performance':
+        return now - timedelta(days=params.get('days', 7)), now
+    return None, None
+
+
+def load_tenant_orders(
+    tenant_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """All orders of a tenant created in a window, every query page"""
+    return list(stream_tenant_orders(tenant_id, start, end))
+
+
+def stream_tenant_orders(
+    tenant_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Orders of a tenant created in a window, one query page at a time (generator)"""
+    return query_all_items(get_orders_table(), order_key_condition(tenant_id, start, end))
+
+
+def build_report(
+    tenant_id: str,
+    report_type: str,
+    params: Dict[str, Any],
+    orders: Iterable[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Compute a report payload
+
+    Args:
+        tenant_id: The tenant ID
+        report_type: sales, performance or customers
+        params: Normalized parameters
+        orders: Orders to report on (defaults to the tenant orders of the
+            report window, see report_window)
+
+    Returns:
+        The report payload
+    """
+    start_date, end_date = report_window(report_type, params)
+    if orders is None:
+        orders = load_tenant_orders(tenant_id, start_date, end_date)
+
+    if report_type == 'sales':
+        top_items = None
+        if not params.get('exactItems') and not use_exact_top_items(start_date, end_date):
+            top_items = get_top_items(tenant_id, start_date, end_date)
+        return build_sales_report(
+            orders,
+            start_date,
+            end_date,
+            params.get('groupBy', 'day'),
+            top_items
+        )
+    if report_type == 'performance':
+        days = params.get('days', 7)
+        return build_performance_report(
+            orders,
+            days,
+            get_step_percentiles(tenant_id, start_date)
+        )
+    if report_type == 'customers':
+        return build_customer_report(orders)
+
+    raise ValueError(f'Unknown report type: {report_type}')
+
+
+def build_sales_report(
+    orders: Iterable[Dict[str, Any]],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    group_by: str = 'day',
+    top_items: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Sales report for a date range (last 7 days by default)
+
+    Top selling items are counted exactly from the orders unless
+    top_items (see get_top_items) is given.
+    """
+    now = datetime.utcnow()
+    start_date = start_date or now - timedelta(days=7)
+    end_date = end_date or now
+
+    # One pass over the window, cancelled orders excluded
+    metrics = ('totals', 'periods', 'hours') + (('items',) if top_items is None else ())
+    sales = aggregate_orders(
+        orders,
+        metrics,
+        group_by=group_by,
+        start=start_date,
+        end=end_date,
+        exclude_statuses=[OrderStatus.CANCELLED.value]
+    )
+
+    total_revenue = sales.revenue
+    total_orders = sales.orders
+
+    return {
+        'period': {
+            'startDate': start_date.isoformat(),
+            'endDate': end_date.isoformat(),
+            'groupBy': group_by
+        },
+        'summary': {
+            'totalRevenue': round(total_revenue, 2),
+            'totalOrders': total_orders,
+            'totalItems': sales.item_count,
+            'averageOrderValue': round(total_revenue / total_orders, 2) if total_orders > 0 else 0
+        },
+        'salesByPeriod': [
+            {'period': k, **v, 'revenue': round(v['revenue'], 2)}
+            for k, v in sorted(sales.periods.items())
+        ],
+        'topSellingItems': sales.top_items(10) if top_items is None else top_items,
+        'salesByHour': [
+            {'hour': k, 'revenue': round(
+                v['revenue'], 2), 'orders': v['orders']}
+            for k, v in sorted(sales.hours.items())
+        ],
+        'generatedAt': now.isoformat()
+    }
+
+
+def _percentile_fields(summary: Optional[Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    """p50/p90/p99 minutes of a step duration sketch summary"""
+    summary = summary or {}
+    return {
+        f'{name}Minutes': round(summary[name], 2) if summary.get(name) is not None else None
+        for name in ('p50', 'p90', 'p99')
+    }
+
+
+def build_performance_report(
+    orders: Iterable[Dict[str, Any]],
+    days: int = 7,
+    percentiles: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Staff and operations performance over the last N days
+
+    Percentiles (see get_step_percentiles) come from the daily step
+    duration sketches, so they cover whole days.
+    """
+    percentiles = percentiles or {'steps': {}, 'staff': {}}
+    # Completed orders of the last N days, in one pass
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    performance = aggregate_orders(
+        orders,
+        ('totals', 'steps', 'fulfillment'),
+        start=cutoff,
+        include_statuses=[OrderStatus.COMPLETED.value]
+    )
+
+    step_averages = {
+        step_name: {
+            'averageMinutes': round(summary['average'], 2),
+            'minMinutes': round(summary['min'], 2),
+            'maxMinutes': round(summary['max'], 2),
+            'count': summary['count'],
+            **_percentile_fields(percentiles['steps'].get(step_name))
+        }
+        for step_name, summary in performance.step_summary().items()
+    }
+
+    # Staff rankings
+    staff_rankings = []
+    for staff_id, stats in performance.staff.items():
+        avg_time = stats['totalTime'] / \
+            stats['stepsHandled'] if stats['stepsHandled'] > 0 else 0
+        staff_rankings.append({
+            'staffId': staff_id,
+            'staffName': stats['name'],
+            'ordersHandled': stats['stepsHandled'],
+            'averageTimeMinutes': round(avg_time, 2),
+            **_percentile_fields(percentiles['staff'].get(staff_id)),
+            'roles': list(stats['roles'])
+        })
+
+    staff_rankings.sort(key=lambda x: x['ordersHandled'], reverse=True)
+
+    # Order fulfillment times
+    fulfillment_times = performance.fulfillment_times
+    avg_fulfillment = sum(fulfillment_times) / \
+        len(fulfillment_times) if fulfillment_times else 0
+
+    return {
+        'period': {
+            'days': days,
+            'startDate': cutoff.isoformat(),
+            'endDate': datetime.utcnow().isoformat()
+        },
+        'orderMetrics': {
+            'totalCompleted': performance.orders,
+            'averageFulfillmentTime': round(avg_fulfillment, 2),
+            'fastestOrder': round(min(fulfillment_times), 2) if fulfillment_times else 0,
+            'slowestOrder': round(max(fulfillment_times), 2) if fulfillment_times else 0
+        },
+        'stepPerformance': step_averages,
+        'staffRankings': staff_rankings[:20],
+        'generatedAt': datetime.utcnow().isoformat()
+    }
+
+
+def build_customer_report(orders: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Customer analytics over the whole order history"""
+    customer_stats = OrderAggregator(('customers',)).consume(
+        orders, exclude_statuses=[OrderStatus.CANCELLED.value]
+    ).customers
+
+    # Calculate metrics
+    total_customers = len(customer_stats)
+    returning_customers = len(
+        [c for c in customer_stats.values() if c['orderCount'] > 1])
+    new_customers = total_customers - returning_customers
+
+    # Top customers
+    top_customers = sorted(
+        [
+            {
+                'customerId': cid,
+                **stats,
+                'totalSpent': round(stats['totalSpent'], 2),
+                'averageOrder': round(stats['totalSpent'] / stats['orderCount'], 2)
+            }
+            for cid, stats in customer_stats.items()
+        ],
+        key=lambda x: x['totalSpent'],
+        reverse=True
+    )[:20]
+
+    # Customer order frequency distribution
+    frequency_dist = defaultdict(int)
+    for stats in customer_stats.values():
+        count = stats['orderCount']
+        if count == 1:
+            frequency_dist['1 order'] += 1
+        elif count <= 3:
+            frequency_dist['2-3 orders'] += 1
+        elif count <= 5:
+            frequency_dist['4-5 orders'] += 1
+        elif count <= 10:
+            frequency_dist['6-10 orders'] += 1
+        else:
+            frequency_dist['10+ orders'] += 1
+
+    # Average order value by customer segment
+    total_spent_all = sum(c['totalSpent'] for c in customer_stats.values())
+    total_orders_all = sum(c['orderCount']
+                           for c in customer_stats.values())
+
+    return {
+        'summary': {
+            'totalCustomers': total_customers,
+            'newCustomers': new_customers,
+            'returningCustomers': returning_customers,
+            'repeatRate': round(returning_customers / total_customers * 100, 1) if total_customers > 0 else 0,
+            'averageOrderValue': round(total_spent_all / total_orders_all, 2) if total_orders_all > 0 else 0,
+            'averageOrdersPerCustomer': round(total_orders_all / total_customers, 2) if total_customers > 0 else 0
+        },
+        'topCustomers': top_customers,
+        'frequencyDistribution': dict(frequency_dist),
+        'generatedAt': datetime.utcnow().isoformat()
+    }
@@ -0,0 +1,159 @@
+"""
+Report result cache with event-driven invalidation
+
+Computed report payloads are stored in the orders table under
+SK = REPORTCACHE#<type>#<params hash>. A report whose period ended more
+than REPORT_CACHE_CLOSE_HOURS ago is closed: its entry never changes and
+is served until it expires. Entries for open periods record the tenant's
+report generation when they were computed; every order event bumps that
+generation (SK = REPORTCACHE#GENERATION), which invalidates them.
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.utils.dynamodb import get_orders_table, get_item
+from src.utils.response import DecimalEncoder
+
+
+REPORT_CACHE_CLOSE_HOURS = int(os.environ.get('REPORT_CACHE_CLOSE_HOURS', 24))
+REPORT_CACHE_OPEN_TTL_SECONDS = int(os.environ.get('REPORT_CACHE_OPEN_TTL_SECONDS', 900))
+REPORT_CACHE_CLOSED_TTL_SECONDS = int(
+    os.environ.get('REPORT_CACHE_CLOSED_TTL_SECONDS', 30 * 24 * 3600))
+
+# Keep well under DynamoDB's 400 KB item limit
+MAX_CACHED_PAYLOAD_BYTES = 350 * 1024
+
+
+def report_params_digest(params: Dict[str, Any]) -> str:
+    """Stable digest of normalized report parameters"""
+    return hashlib.sha256(
+        json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()[:32]
+
+
+def report_cache_key(tenant_id: str, report_type: str, params: Dict[str, Any]) -> Dict[str, str]:
+    """Primary key of a cached report"""
+    return {
+        'PK': f'TENANT#{tenant_id}',
+        'SK': f'REPORTCACHE#{report_type}#{report_params_digest(params)}'
+    }
+
+
+def generation_key(tenant_id: str) -> Dict[str, str]:
+    """Primary key of a tenant's report generation counter"""
+    return {
+        'PK': f'TENANT#{tenant_id}',
+        'SK': 'REPORTCACHE#GENERATION'
+    }
+
+
+def is_closed_period(period_end: Optional[datetime]) -> bool:
+    """Whether no more order events are expected for a period"""
+    if period_end is None:
+        return False
+    return period_end < datetime.utcnow() - timedelta(hours=REPORT_CACHE_CLOSE_HOURS)
+
+
+def get_report_generation(tenant_id: str) -> int:
+    """Current report generation of a tenant"""
+    item = get_item(get_orders_table(), generation_key(tenant_id)) or {}
+    return int(item.get('generation', 0))
+
+
+def invalidate_open_reports(tenant_id: str) -> None:
+    """Invalidate every cached open-period report of a tenant"""
+    get_orders_table().update_item(
+        Key=generation_key(tenant_id),
+        UpdateExpression='ADD generation :one SET updatedAt = :now',
+        ExpressionAttributeValues={
+            ':one': 1,
+            ':now': datetime.utcnow().isoformat()
+        }
+    )
+
+
+def _cache_info(hit: bool, computed_at: float, closed: bool) -> Dict[str, Any]:
+    return {
+        'hit': hit,
+        'closedPeriod': closed,
+        'computedAt': datetime.utcfromtimestamp(computed_at).isoformat(),
+        'ageSeconds': max(0, int(time.time() - computed_at))
+    }
+
+
+def get_or_compute_report(
+    tenant_id: str,
+    report_type: str,
+    params: Dict[str, Any],
+    compute: Callable[[], Dict[str, Any]],
+    period_end: Optional[datetime] = None,
+    refresh: bool = False
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Serve a report from cache, computing and storing it on a miss
+
+    Args:
+        tenant_id: The tenant ID
+        report_type: Report type (part of the key)
+        params: Normalized report parameters (part of the key)
+        compute: Computes the payload on a miss
+        period_end: End of the reported period, None if it runs up to now
+        refresh: Skip the cache read and recompute
+
+    Returns:
+        Tuple of (payload, cache info with hit, closedPeriod, computedAt
+        and ageSeconds)
+    """
+    table = get_orders_table()
+    key = report_cache_key(tenant_id, report_type, params)
+    closed = is_closed_period(period_end)
+    generation = 0
+
+    try:
+        if not closed:
+            generation = get_report_generation(tenant_id)
+        entry = None if refresh else get_item(table, key)
+        if entry and entry.get('expiresAt', 0) > time.time() and (
+                entry.get('closed') or int(entry.get('generation', -1)) == generation):
+            return (
+                json.loads(entry['payload']),
+                _cache_info(True, entry['computedAt'], bool(entry.get('closed')))
+            )
+    except Exception as cache_error:
+        print(f"Report cache read error: {str(cache_error)}")
+
+    computed_at = int(time.time())
+    payload = compute()
+
+    try:
+        serialized = json.dumps(payload, cls=DecimalEncoder)
+        if len(serialized.encode('utf-8')) <= MAX_CACHED_PAYLOAD_BYTES:
+            ttl = REPORT_CACHE_CLOSED_TTL_SECONDS if closed else REPORT_CACHE_OPEN_TTL_SECONDS
+            table.put_item(Item={
+                **key,
+                'reportType': report_type,
+                'params': json.dumps(params, sort_keys=True, default=str),
+                'payload': serialized,
+                'closed': closed,
+                # The generation read before computing: events that arrive
+                # while computing leave this entry already stale
+                'generation': generation,
+                'computedAt': computed_at,
+                'expiresAt': computed_at + ttl
+            })
+    except Exception as cache_error:
+        print(f"Report cache write error: {str(cache_error)}")
+
+    return payload, _cache_info(False, computed_at, closed)
+
+
+def report_cache_headers(cache_info: Dict[str, Any]) -> Dict[str, str]:
+    """X-Cache and Age response headers for a report"""
+    return {
+        'X-Cache': 'HIT' if cache_info['hit'] else 'MISS',
+        'Age': str(cache_info['ageSeconds'])
+    }
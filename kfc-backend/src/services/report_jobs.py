@@ -0,0 +1,314 @@
+"""
+Asynchronous report jobs with results stored in S3
+
+A job is identified by its report type and normalized parameters, so
+identical requests map to the same item (SK = REPORTJOB#<jobId>) and share
+one computation: a new run is only queued when there is no job yet, the
+last run failed or went stale, or its result may be outdated. Runs are
+computed by a worker from the report jobs queue, streaming the tenant's
+orders page by page, and the JSON result is written to the assets bucket
+(or to REPORT_JOBS_LOCAL_DIR, for local development).
+"""
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+from src.utils.dynamodb import get_orders_table, get_item
+from src.utils.events import send_to_queue
+from src.utils.response import DecimalEncoder
+from src.services.report_builders import build_report, report_end, report_window, stream_tenant_orders
+from src.services.report_cache import is_closed_period, report_params_digest
+
+
+s3_client = boto3.client('s3')
+ASSETS_BUCKET = os.environ.get('ASSETS_BUCKET', 'kfc-assets-dev-595645243021')
+REPORT_JOBS_QUEUE_URL = os.environ.get('REPORT_JOBS_QUEUE_URL')
+REPORT_JOBS_LOCAL_DIR = os.environ.get('REPORT_JOBS_LOCAL_DIR')
+REPORT_JOBS_PREFIX = 'reports/jobs'
+
+# A completed open-period result is shared for this long
+REPORT_JOB_REUSE_SECONDS = int(os.environ.get('REPORT_JOB_REUSE_SECONDS', 300))
+# A queued or running job with no progress for this long is requeued
+REPORT_JOB_STALE_SECONDS = int(os.environ.get('REPORT_JOB_STALE_SECONDS', 1800))
+# Job items and results (see the bucket lifecycle rule) are kept this long
+REPORT_JOB_RETENTION_SECONDS = int(
+    os.environ.get('REPORT_JOB_RETENTION_SECONDS', 7 * 24 * 3600))
+REPORT_JOB_URL_EXPIRES = int(os.environ.get('REPORT_JOB_URL_EXPIRES', 3600))
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+
+
+def report_job_id(report_type: str, params: Dict[str, Any]) -> str:
+    """Job ID of a report type and its normalized parameters"""
+    return f'{report_type}-{report_params_digest(params)}'
+
+
+def report_job_key(tenant_id: str, job_id: str) -> Dict[str, str]:
+    """Primary key of a report job"""
+    return {
+        'PK': f'TENANT#{tenant_id}',
+        'SK': f'REPORTJOB#{job_id}'
+    }
+
+
+def _is_conditional_failure(error: ClientError) -> bool:
+    return error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+
+def get_report_job(tenant_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+    """Get a report job, None if it does not exist"""
+    return get_item(get_orders_table(), report_job_key(tenant_id, job_id))
+
+
+def create_report_job(
+    tenant_id: str,
+    report_type: str,
+    params: Dict[str, Any]
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Create a report job, or join the one already computing the same report
+
+    Args:
+        tenant_id: The tenant ID
+        report_type: sales, performance or customers
+        params: Normalized report parameters
+
+    Returns:
+        Tuple of (job item, whether a new run was queued)
+    """
+    table = get_orders_table()
+    job_id = report_job_id(report_type, params)
+    key = report_job_key(tenant_id, job_id)
+    now = int(time.time())
+
+    try:
+        # Only one concurrent request can win this condition; the others
+        # see the queued run and share it
+        job = table.update_item(
+            Key=key,
+            UpdateExpression=(
+                'SET #status = :queued, jobId = :job_id, reportType = :report_type, '
+                'params = :params, requestedAt = :now, updatedAt = :now, '
+                'expiresAt = :expires_at '
+                'REMOVE resultKey, resultBytes, #error, startedAt, completedAt, reusableUntil '
+                'ADD #run :one'
+            ),
+            ConditionExpression=(
+                'attribute_not_exists(PK) OR #status = :failed '
+                'OR (#status = :completed AND reusableUntil < :now) '
+                'OR (#status IN (:queued, :running) AND updatedAt < :stale_before)'
+            ),
+            ExpressionAttributeNames={
+                '#status': 'status',
+                '#error': 'error',
+                '#run': 'run'
+            },
+            ExpressionAttributeValues={
+                ':queued': QUEUED,
+                ':running': RUNNING,
+                ':completed': COMPLETED,
+                ':failed': FAILED,
+                ':job_id': job_id,
+                ':report_type': report_type,
+                ':params': json.dumps(params, sort_keys=True, default=str),
+                ':now': now,
+                ':stale_before': now - REPORT_JOB_STALE_SECONDS,
+                ':expires_at': now + REPORT_JOB_RETENTION_SECONDS,
+                ':one': 1
+            },
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+    except ClientError as e:
+        if not _is_conditional_failure(e):
+            raise
+        return get_report_job(tenant_id, job_id), False
+
+    try:
+        send_to_queue(REPORT_JOBS_QUEUE_URL, {
+            'tenantId': tenant_id,
+            'jobId': job_id,
+            'run': int(job['run'])
+        })
+    except Exception as queue_error:
+        _finish_run(tenant_id, job_id, int(job['run']), FAILED, {
+            'error': f'Failed to queue job: {str(queue_error)}'
+        })
+        raise
+
+    return job, True
+
+
+def _claim_run(tenant_id: str, job_id: str, run: int) -> Optional[Dict[str, Any]]:
+    """Mark a run as running, None if it was superseded or already finished"""
+    now = int(time.time())
+    try:
+        return get_orders_table().update_item(
+            Key=report_job_key(tenant_id, job_id),
+            UpdateExpression='SET #status = :running, startedAt = :now, updatedAt = :now',
+            # A redelivered message may resume a run left RUNNING
+            ConditionExpression='#run = :run AND #status IN (:queued, :running)',
+            ExpressionAttributeNames={'#status': 'status', '#run': 'run'},
+            ExpressionAttributeValues={
+                ':running': RUNNING,
+                ':queued': QUEUED,
+                ':run': run,
+                ':now': now
+            },
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+    except ClientError as e:
+        if _is_conditional_failure(e):
+            return None
+        raise
+
+
+def _finish_run(
+    tenant_id: str,
+    job_id: str,
+    run: int,
+    status: str,
+    fields: Dict[str, Any]
+) -> bool:
+    """Record the outcome of a run, unless a newer run replaced it"""
+    now = int(time.time())
+    names = {'#status': 'status', '#run': 'run'}
+    values = {':status': status, ':run': run, ':now': now}
+    assignments = ['#status = :status', 'updatedAt = :now']
+
+    for index, (field, value) in enumerate(fields.items()):
+        names[f'#f{index}'] = field
+        values[f':f{index}'] = value
+        assignments.append(f'#f{index} = :f{index}')
+
+    try:
+        get_orders_table().update_item(
+            Key=report_job_key(tenant_id, job_id),
+            UpdateExpression='SET ' + ', '.join(assignments),
+            ConditionExpression='#run = :run',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+        return True
+    except ClientError as e:
+        if _is_conditional_failure(e):
+            return False
+        raise
+
+
+def _result_key(tenant_id: str, job_id: str, run: int) -> str:
+    return f'{REPORT_JOBS_PREFIX}/{tenant_id}/{job_id}/{run}.json'
+
+
+def _write_result(result_key: str, body: bytes) -> None:
+    """Store a job result in the assets bucket or the local results dir"""
+    if REPORT_JOBS_LOCAL_DIR:
+        path = os.path.join(REPORT_JOBS_LOCAL_DIR, result_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as result_file:
+            result_file.write(body)
+        return
+
+    s3_client.put_object(
+        Bucket=ASSETS_BUCKET,
+        Key=result_key,
+        Body=body,
+        ContentType='application/json'
+    )
+
+
+def result_url(result_key: str) -> str:
+    """Presigned download URL of a job result (file URL when stored locally)"""
+    if REPORT_JOBS_LOCAL_DIR:
+        return 'file://' + os.path.abspath(os.path.join(REPORT_JOBS_LOCAL_DIR, result_key))
+
+    return s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': ASSETS_BUCKET, 'Key': result_key},
+        ExpiresIn=REPORT_JOB_URL_EXPIRES
+    )
+
+
+def run_report_job(tenant_id: str, job_id: str, run: int) -> Optional[str]:
+    """
+    Compute one run of a report job and store its result
+
+    Args:
+        tenant_id: The tenant ID
+        job_id: The job ID
+        run: Run number from the queue message
+
+    Returns:
+        Final status of the run, None if it was superseded or already done
+    """
+    job = _claim_run(tenant_id, job_id, run)
+    if job is None:
+        print(f"Report job {job_id} run {run}: superseded or already finished")
+        return None
+
+    report_type = job['reportType']
+    params = json.loads(job['params'])
+
+    try:
+        # Only the report window's orders are streamed, page by page, into
+        # the aggregators
+        payload = build_report(
+            tenant_id, report_type, params,
+            orders=stream_tenant_orders(tenant_id, *report_window(report_type, params))
+        )
+        body = json.dumps(payload, cls=DecimalEncoder).encode('utf-8')
+        result_key = _result_key(tenant_id, job_id, run)
+        _write_result(result_key, body)
+    except Exception as e:
+        print(f"Report job {job_id} run {run} error: {str(e)}")
+        _finish_run(tenant_id, job_id, run, FAILED, {'error': str(e)})
+        return FAILED
+
+    completed_at = int(time.time())
+    if is_closed_period(report_end(report_type, params)):
+        reusable_until = completed_at + REPORT_JOB_RETENTION_SECONDS
+    else:
+        reusable_until = completed_at + REPORT_JOB_REUSE_SECONDS
+
+    _finish_run(tenant_id, job_id, run, COMPLETED, {
+        'resultKey': result_key,
+        'resultBytes': len(body),
+        'completedAt': completed_at,
+        'reusableUntil': reusable_until,
+        'expiresAt': completed_at + REPORT_JOB_RETENTION_SECONDS
+    })
+    return COMPLETED
+
+
+def _iso(timestamp: Any) -> Optional[str]:
+    return datetime.utcfromtimestamp(int(timestamp)).isoformat() if timestamp else None
+
+
+def report_job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public representation of a job, with a result URL once completed"""
+    view = {
+        'jobId': job['jobId'],
+        'reportType': job['reportType'],
+        'params': json.loads(job['params']),
+        'status': job['status'],
+        'run': int(job.get('run', 0)),
+        'requestedAt': _iso(job.get('requestedAt')),
+        'startedAt': _iso(job.get('startedAt')),
+        'completedAt': _iso(job.get('completedAt'))
+    }
+
+    if job['status'] == COMPLETED and job.get('resultKey'):
+        view['resultUrl'] = result_url(job['resultKey'])
+        view['resultBytes'] = int(job.get('resultBytes', 0))
+        view['urlExpiresIn'] = REPORT_JOB_URL_EXPIRES
+    if job['status'] == FAILED:
+        view['error'] = job.get('error')
+
+    return view
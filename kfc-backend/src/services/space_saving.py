@@ -0,0 +1,123 @@
+"""
+Space-Saving heavy-hitter sketch
+
+A sketch monitors at most `capacity` keys. A monitored key's weight is
+added to its counter; an unmonitored key takes over the counter with the
+smallest count and records that count as its error. A counter never
+underestimates its key's true weight and overestimates it by at most its
+error, which is bounded by total weight / capacity. When fewer distinct
+keys than `capacity` are seen, every count is exact.
+
+Two sketches merge by adding counters, charging a key missing from a full
+sketch with that sketch's minimum count (as both count and error), and
+keeping the `capacity` largest counters.
+
+Counters are stored as attributes <prefix>#<key> and <prefix>Err#<key>.
+"""
+from typing import Any, Dict, List, Tuple
+
+
+DEFAULT_CAPACITY = 64
+
+
+class SpaceSaving:
+    """Mergeable top-K sketch over weighted keys"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        # key -> [count, error]
+        self.counters: Dict[str, List[float]] = {}
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.counters) >= self.capacity
+
+    def min_count(self) -> float:
+        """Smallest monitored count, 0 while the sketch has room"""
+        if not self.is_full:
+            return 0.0
+        return min(count for count, _ in self.counters.values())
+
+    def add(self, key: str, weight: float = 1) -> 'SpaceSaving':
+        """Count a key with a weight"""
+        if weight <= 0:
+            return self
+        if key in self.counters:
+            self.counters[key][0] += weight
+        elif not self.is_full:
+            self.counters[key] = [float(weight), 0.0]
+        else:
+            evicted = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(evicted)[0]
+            self.counters[key] = [floor + weight, floor]
+        return self
+
+    def remove(self, key: str, weight: float) -> 'SpaceSaving':
+        """
+        Take back weight from a monitored key (e.g. a cancelled order)
+
+        Unmonitored keys are left alone: their true weight was already
+        below the minimum counter.
+        """
+        if key in self.counters:
+            counter = self.counters[key]
+            counter[0] = max(0.0, counter[0] - weight)
+            counter[1] = min(counter[1], counter[0])
+        return self
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        """Union with another sketch"""
+        own_floor = self.min_count()
+        other_floor = other.min_count()
+        merged = {}
+        for key in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(key, (own_floor, own_floor))
+            other_count, other_error = other.counters.get(key, (other_floor, other_floor))
+            merged[key] = [count + other_count, error + other_error]
+
+        kept = sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[:self.capacity]
+        self.counters = dict(kept)
+        return self
+
+    def top(self, limit: int = 10) -> List[Tuple[str, float, float]]:
+        """Heaviest keys as (key, count, error), heaviest first"""
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(key, count, error) for key, (count, error) in ranked[:limit]]
+
+    def estimate(self, key: str) -> Tuple[float, float]:
+        """(count, error) of a key; unmonitored keys are bounded by the minimum"""
+        if key in self.counters:
+            count, error = self.counters[key]
+            return count, error
+        floor = self.min_count()
+        return floor, floor
+
+    def to_attributes(self, prefix: str) -> Dict[str, float]:
+        """Counter attributes (<prefix>#<key>, <prefix>Err#<key>) of the sketch"""
+        attributes = {}
+        for key, (count, error) in self.counters.items():
+            attributes[f'{prefix}#{key}'] = count
+            if error:
+                attributes[f'{prefix}Err#{key}'] = error
+        return attributes
+
+    @classmethod
+    def from_attributes(
+        cls,
+        attributes: Dict[str, Any],
+        prefix: str,
+        capacity: int = DEFAULT_CAPACITY
+    ) -> 'SpaceSaving':
+        """Rebuild a sketch from stored counter attributes"""
+        sketch = cls(capacity)
+        errors = {}
+        for attribute, value in attributes.items():
+            name, _, key = attribute.partition('#')
+            if name == prefix:
+                sketch.counters[key] = [float(value), 0.0]
+            elif name == f'{prefix}Err':
+                errors[key] = float(value)
+        for key, error in errors.items():
+            if key in sketch.counters:
+                sketch.counters[key][1] = error
+        return sketch
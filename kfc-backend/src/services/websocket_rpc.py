@@ -0,0 +1,191 @@
+"""
+Read-only request/response calls over the WebSocket
+
+The ops front keeps a socket open; loading active orders, an order or the
+queue counts through it skips a separate HTTPS request and Lambda. A
+request is a message {id, method, params} on the $default route. Every
+reply frame is {type: 'rpc_response', id, part, done} plus either result,
+items (streamed methods, sent as each page of results is read) or error.
+
+The tenant always comes from the connection row, never from the request.
+Customer connections may only read their own orders.
+"""
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+from boto3.dynamodb.conditions import Key
+
+from src.utils.dynamodb import get_orders_table, get_item, query_all_items, decimal_to_float
+from src.utils.websocket import (
+    post_to_connection, encode_message, chunk_by_size, get_api_gateway_management_client, SENT
+)
+from src.utils.websocket_routing import CUSTOMER_ROLE, connection_role
+from src.models.order_status import OrderStatus
+from src.services.admission import get_kitchen_load
+
+
+class RpcError(Exception):
+    """Raised to answer an RPC request with an error"""
+
+    def __init__(self, code: str, message: str):
+        self.code = code
+        super().__init__(message)
+
+
+class _Undelivered(Exception):
+    """A reply frame could not be posted; the rest of the reply is dropped"""
+
+
+def _active_orders(tenant_id: str) -> Iterator[Dict[str, Any]]:
+    # Sparse index of live orders, oldest first (see order_transitions)
+    return query_all_items(
+        get_orders_table(),
+        Key('ActivePK').eq(f'TENANT#{tenant_id}'),
+        index_name='ActiveIndex'
+    )
+
+
+def active_orders(
+    tenant_id: str,
+    params: Dict[str, Any],
+    connection: Dict[str, Any]
+) -> Iterator[Dict[str, Any]]:
+    """Active orders, optionally of some statuses (streamed)"""
+    statuses = set(params.get('statuses') or [])
+    for order in _active_orders(tenant_id):
+        if not statuses or order.get('status') in statuses:
+            yield order
+
+
+def order_by_id(
+    tenant_id: str,
+    params: Dict[str, Any],
+    connection: Dict[str, Any]
+) -> Dict[str, Any]:
+    """One order"""
+    order_id = params.get('orderId')
+    if not order_id:
+        raise RpcError('BAD_REQUEST', 'orderId is required')
+
+    order = get_item(get_orders_table(), {
+        'PK': f'TENANT#{tenant_id}',
+        'SK': f'ORDER#{order_id}'
+    })
+    # Another customer's order is reported as missing, not forbidden
+    if not order or (_is_customer(connection) and order.get('customerId') != connection.get('userId')):
+        raise RpcError('NOT_FOUND', 'Order not found')
+    return order
+
+
+def queue_counts(
+    tenant_id: str,
+    params: Dict[str, Any],
+    connection: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Active orders per status and the kitchen load"""
+    counts = {status.value: 0 for status in OrderStatus
+              if status not in (OrderStatus.COMPLETED, OrderStatus.CANCELLED)}
+    for order in _active_orders(tenant_id):
+        status = order.get('status', 'UNKNOWN')
+        counts[status] = counts.get(status, 0) + 1
+
+    return {
+        'byStatus': counts,
+        'active': sum(counts.values()),
+        'kitchen': get_kitchen_load(tenant_id, params.get('locationId'))
+    }
+
+
+# method -> (function, staff only, streamed)
+METHODS: Dict[str, Tuple[Callable, bool, bool]] = {
+    'orders.active': (active_orders, True, True),
+    'orders.get': (order_by_id, False, False),
+    'queue.counts': (queue_counts, True, False)
+}
+
+
+def _is_customer(connection: Dict[str, Any]) -> bool:
+    return connection_role(connection) == CUSTOMER_ROLE
+
+
+def is_rpc_request(body: Dict[str, Any]) -> bool:
+    return isinstance(body, dict) and 'id' in body and 'method' in body
+
+
+def _frames(
+    method: str,
+    params: Dict[str, Any],
+    connection: Dict[str, Any]
+) -> Iterator[Dict[str, Any]]:
+    """Reply frames of a request, without part/done"""
+    if method not in METHODS:
+        raise RpcError('METHOD_NOT_FOUND', f'Unknown method {method}')
+    function, staff_only, streamed = METHODS[method]
+    if staff_only and _is_customer(connection):
+        raise RpcError('FORBIDDEN', f'{method} is for staff connections')
+
+    result = function(connection['tenantId'], params, connection)
+    if not streamed:
+        yield {'result': decimal_to_float(result)}
+        return
+
+    count = 0
+    for items in chunk_by_size(decimal_to_float(item) for item in result):
+        count += len(items)
+        yield {'items': items, 'count': count}
+
+
+def handle_rpc_request(connection: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Answer an RPC request on its connection
+
+    Frames are posted in order; each is sent once the next one is known,
+    so the last carries done=True. Errors, including those raised midway
+    through a stream, end the reply with an error frame.
+
+    Args:
+        connection: Connection item of the caller
+        body: The request {id, method, params}
+
+    Returns:
+        Dictionary with the method, frames sent and error code (if any)
+    """
+    request_id = body['id']
+    method = str(body.get('method'))
+    client = get_api_gateway_management_client()
+    sent = 0
+
+    def post(frame: Dict[str, Any], done: bool) -> None:
+        nonlocal sent
+        outcome = post_to_connection(connection['connectionId'], encode_message({
+            'type': 'rpc_response',
+            'id': request_id,
+            'part': sent + 1,
+            'done': done,
+            **frame
+        }), client)
+        if outcome != SENT:
+            raise _Undelivered(outcome)
+        sent += 1
+
+    pending = None
+    failure = None
+    try:
+        for frame in _frames(method, body.get('params') or {}, connection):
+            if pending is not None:
+                post(pending, False)
+            pending = frame
+        post(pending if pending is not None else {'items': [], 'count': 0}, True)
+    except _Undelivered as e:
+        return {'method': method, 'frames': sent, 'error': f'UNDELIVERED ({e})'}
+    except RpcError as e:
+        failure = {'code': e.code, 'message': str(e)}
+    except Exception as e:
+        print(f"RPC {method} error: {str(e)}")
+        failure = {'code': 'INTERNAL', 'message': f'{method} failed'}
+
+    if failure:
+        try:
+            post({'error': failure}, True)
+        except _Undelivered:
+            pass
+    return {'method': method, 'frames': sent, 'error': failure and failure['code']}
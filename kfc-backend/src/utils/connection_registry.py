@@ -0,0 +1,238 @@
+"""
+Warm in-process registry of tenant connections
+
+Broadcasts used to query the TenantIndex GSI every time. The routing index
+of a tenant is instead kept in memory, across warm invocations, together
+with the tenant's connection version: a counter (orders table, SK =
+CONNVERSION) bumped on every connect, subscribe and disconnect.
+
+For REGISTRY_TRUST_SECONDS a cached index is used as is. Up to
+REGISTRY_TTL_SECONDS it is revalidated with a single GetItem of the
+version, and only reloaded from the GSI when the version moved. Tenants
+without connections are cached the same way, so broadcasts to them cost
+nothing while nobody is connected.
+
+The same item counts the tenant's connections per role (count#<role>),
+moved atomically on connect and disconnect. Counts only go down when a
+connection row is known to be deleted; rows removed in batches or by TTL
+leave them high until the scheduled sweep recounts them (see
+reconcile_presence). Until a tenant's first recount (presenceSince) its
+counts are unknown.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from .dynamodb import get_orders_table
+from .websocket_routing import ConnectionIndex
+
+
+REGISTRY_TRUST_SECONDS = float(os.environ.get('WEBSOCKET_REGISTRY_TRUST_SECONDS', 2))
+# 0 turns the registry off: every broadcast queries the GSI
+REGISTRY_TTL_SECONDS = float(os.environ.get('WEBSOCKET_REGISTRY_TTL_SECONDS', 60))
+
+VERSION_SK = 'CONNVERSION'
+# The GSI lags the table; an index loaded this soon after a change may miss
+# it, so it is only trusted until the next revalidation
+INDEX_LAG_SECONDS = 3
+
+PRESENCE_PREFIX = 'count#'
+
+# tenant ID -> (index, version, loaded at, checked at)
+_entries: Dict[str, Tuple[ConnectionIndex, int, float, float]] = {}
+# tenant ID -> (version item, read at)
+_states: Dict[str, Tuple[Dict[str, Any], float]] = {}
+_lock = threading.Lock()
+
+
+def _key(tenant_id: str) -> Dict[str, str]:
+    return {'PK': f'TENANT#{tenant_id}', 'SK': VERSION_SK}
+
+
+def read_state(tenant_id: str, now: Optional[float] = None, max_age: float = 0) -> Dict[str, Any]:
+    """
+    Connection version item of a tenant
+
+    A copy read less than max_age seconds ago is reused, so a presence
+    check and an index revalidation in the same broadcast share one read.
+    """
+    now = now or time.time()
+    cached = _states.get(tenant_id)
+    if cached and now - cached[1] < max_age:
+        return cached[0]
+
+    item = get_orders_table().get_item(
+        Key=_key(tenant_id), ConsistentRead=True).get('Item') or {}
+    with _lock:
+        _states[tenant_id] = (item, now)
+    return item
+
+
+def presence_of(item: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    """Connections per role of a version item, None until first recounted"""
+    if 'presenceSince' not in item:
+        return None
+    return {
+        name[len(PRESENCE_PREFIX):]: max(0, int(value))
+        for name, value in item.items() if name.startswith(PRESENCE_PREFIX)
+    }
+
+
+def bump_version(tenant_id: str, role: Optional[str] = None, delta: int = 0) -> None:
+    """
+    Mark a tenant's connections as changed, for every warm registry, and
+    move its count of a role by delta (+1 connect, -1 disconnect)
+
+    The local entry is dropped right away; other Lambdas notice on their
+    next revalidation.
+    """
+    invalidate(tenant_id)
+    if REGISTRY_TTL_SECONDS <= 0 and not delta:
+        return
+
+    expression = 'SET changedAt = :now ADD #version :one'
+    names = {'#version': 'version'}
+    values = {':one': 1, ':now': int(time.time())}
+    if role and delta:
+        expression += ', #count :delta'
+        names['#count'] = f'{PRESENCE_PREFIX}{role}'
+        values[':delta'] = delta
+    try:
+        get_orders_table().update_item(
+            Key=_key(tenant_id),
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+    except Exception as e:
+        # Other registries fall back to their TTL
+        print(f"Connection version bump failed for {tenant_id}: {str(e)}")
+
+
+def get_presence(tenant_id: str, now: Optional[float] = None) -> Optional[Dict[str, int]]:
+    """
+    Connected clients of a tenant per role
+
+    Read at most once per REGISTRY_TRUST_SECONDS per tenant.
+
+    Returns:
+        Count per role, None when unknown (not recounted yet or unreadable)
+    """
+    try:
+        return presence_of(read_state(tenant_id, now, REGISTRY_TRUST_SECONDS))
+    except Exception as e:
+        print(f"Presence unavailable for {tenant_id}: {str(e)}")
+        return None
+
+
+def reconcile_presence(tenant_id: str, counts: Dict[str, int], counted_from: float) -> bool:
+    """
+    Overwrite a tenant's counts with a recount of its connection rows
+
+    The write is skipped when anything changed since counted_from, the
+    start of the recount, as the recount may have missed that change.
+
+    Args:
+        tenant_id: The tenant ID
+        counts: Live connection rows per role
+        counted_from: When the recount started (epoch seconds)
+
+    Returns:
+        True if the counts were written
+    """
+    item = get_orders_table().get_item(
+        Key=_key(tenant_id), ConsistentRead=True).get('Item') or {}
+    roles = {name[len(PRESENCE_PREFIX):] for name in item if name.startswith(PRESENCE_PREFIX)}
+    roles |= set(counts)
+
+    names = {'#changed': 'changedAt'}
+    values = {':from': int(counted_from), ':since': int(time.time())}
+    assignments = ['presenceSince = :since']
+    for number, role in enumerate(sorted(roles)):
+        names[f'#c{number}'] = f'{PRESENCE_PREFIX}{role}'
+        values[f':c{number}'] = counts.get(role, 0)
+        assignments.append(f'#c{number} = :c{number}')
+    try:
+        get_orders_table().update_item(
+            Key=_key(tenant_id),
+            UpdateExpression='SET ' + ', '.join(assignments),
+            ConditionExpression='attribute_not_exists(#changed) OR #changed < :from',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+    invalidate(tenant_id)
+    return True
+
+
+def get_index(
+    tenant_id: str,
+    load: Callable[[str], ConnectionIndex],
+    now: Optional[float] = None
+) -> ConnectionIndex:
+    """
+    Routing index of a tenant, from the registry when still valid
+
+    Args:
+        tenant_id: The tenant ID
+        load: Loads the index from the connections table
+        now: Current time (epoch seconds)
+
+    Returns:
+        The tenant's connection index
+    """
+    if REGISTRY_TTL_SECONDS <= 0:
+        return load(tenant_id)
+
+    now = now or time.time()
+    entry = _entries.get(tenant_id)
+    if entry and now - entry[3] < REGISTRY_TRUST_SECONDS:
+        return entry[0]
+
+    try:
+        item = read_state(tenant_id, now, REGISTRY_TRUST_SECONDS)
+        current, changed_at = int(item.get('version', 0)), float(item.get('changedAt', 0))
+    except Exception as e:
+        print(f"Connection version unavailable for {tenant_id}: {str(e)}")
+        return load(tenant_id)
+
+    if entry and entry[1] == current and now - entry[2] < REGISTRY_TTL_SECONDS:
+        with _lock:
+            _entries[tenant_id] = (entry[0], current, entry[2], now)
+        return entry[0]
+
+    # The version is read before loading, so a change made meanwhile
+    # forces the next reload instead of being hidden
+    index = load(tenant_id)
+    if now - changed_at < INDEX_LAG_SECONDS:
+        current = -1
+    with _lock:
+        _entries[tenant_id] = (index, current, now, now)
+    return index
+
+
+def forget(tenant_id: str, connection_ids: Iterable[str]) -> None:
+    """Drop connections found gone from a tenant's cached index"""
+    entry = _entries.get(tenant_id)
+    if not entry:
+        return
+    with _lock:
+        for connection_id in connection_ids:
+            entry[0].remove(connection_id)
+
+
+def invalidate(tenant_id: Optional[str] = None) -> None:
+    """Drop one tenant's entry, or every entry"""
+    with _lock:
+        if tenant_id is None:
+            _entries.clear()
+            _states.clear()
+        else:
+            _entries.pop(tenant_id, None)
+            _states.pop(tenant_id, None)
@@ -72,9 +72,22 @@ def put_item(table, item: Dict[str, Any]) -> Dict[str, Any]:
     return item
 
 
-def get_item(table, key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    """Get an item from DynamoDB"""
-    response = table.get_item(Key=key)
+def get_item(
+    table,
+    key: Dict[str, Any],
+    projection: Optional[str] = None,
+    expression_names: Optional[Dict[str, str]] = None
+) -> Optional[Dict[str, Any]]:
+    """Get an item from DynamoDB, optionally projecting a few attributes"""
+    params = {'Key': key}
+
+    if projection:
+        params['ProjectionExpression'] = projection
+
+    if expression_names:
+        params['ExpressionAttributeNames'] = expression_names
+
+    response = table.get_item(**params)
     item = response.get('Item')
     if item:
         return decimal_to_float(item)
@@ -139,6 +152,36 @@ def query_items(
     return [decimal_to_float(item) for item in items]
 
 
+def query_all_items(
+    table,
+    key_condition: Any,
+    index_name: Optional[str] = None,
+    filter_expression: Optional[Any] = None,
+    scan_forward: bool = True
+):
+    """Query items from DynamoDB, following pagination (generator)"""
+    params = {
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': scan_forward
+    }
+
+    if index_name:
+        params['IndexName'] = index_name
+
+    if filter_expression:
+        params['FilterExpression'] = filter_expression
+
+    while True:
+        response = table.query(**params)
+        for item in response.get('Items', []):
+            yield decimal_to_float(item)
+
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        params['ExclusiveStartKey'] = last_key
+
+
 def scan_items(
     table,
     filter_expression: Optional[Any] = None,
@@ -158,6 +201,43 @@ def scan_items(
     return [decimal_to_float(item) for item in items]
 
 
+def scan_all_items(
+    table,
+    filter_expression: Optional[Any] = None,
+    projection: Optional[str] = None,
+    consistent_read: bool = False
+):
+    """Scan items from DynamoDB, following pagination (generator)"""
+    params = {}
+
+    if consistent_read:
+        params['ConsistentRead'] = True
+
+    if filter_expression:
+        params['FilterExpression'] = filter_expression
+
+    if projection:
+        params['ProjectionExpression'] = projection
+
+    while True:
+        response = table.scan(**params)
+        for item in response.get('Items', []):
+            yield decimal_to_float(item)
+
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        params['ExclusiveStartKey'] = last_key
+
+
+def batch_delete_items(table, keys: List[Dict[str, Any]]) -> int:
+    """Batch delete items from DynamoDB (BatchWriteItem, 25 keys per call)"""
+    with table.batch_writer() as batch:
+        for key in keys:
+            batch.delete_item(Key=key)
+    return len(keys)
+
+
 def batch_write_items(table, items: List[Dict[str, Any]]) -> bool:
     """Batch write items to DynamoDB"""
     with table.batch_writer() as batch:
@@ -0,0 +1,130 @@
+"""
+Per-tenant log of broadcast events, for resuming after a reconnect
+
+Every broadcast gets the next number of its tenant's sequence (an atomic
+counter at SK = EVENTSEQ) and is kept for EVENT_LOG_TTL_SECONDS in the
+orders table (SK = EVENT#<seq>), with the routing fields needed to decide
+who may see it again. A client that reconnects sends the last sequence
+number it saw and gets only the events after it. When those are no longer
+all in the log (expired, beyond EVENT_LOG_MAX_REPLAY, or never logged) the
+client is told to reload instead.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from boto3.dynamodb.conditions import Key
+
+from .dynamodb import get_orders_table, query_all_items, decimal_to_float
+
+
+# 0 turns the log off: broadcasts go out unnumbered
+EVENT_LOG_TTL_SECONDS = int(os.environ.get('WEBSOCKET_EVENT_LOG_TTL_SECONDS', 3600))
+EVENT_LOG_MAX_REPLAY = int(os.environ.get('WEBSOCKET_EVENT_LOG_MAX_REPLAY', 200))
+
+SEQUENCE_SK = 'EVENTSEQ'
+EVENT_PREFIX = 'EVENT#'
+# Zero-padded so the sort key orders events by sequence number
+SEQUENCE_DIGITS = 12
+
+
+def event_sk(seq: int) -> str:
+    return f'{EVENT_PREFIX}{seq:0{SEQUENCE_DIGITS}d}'
+
+
+def next_sequence(tenant_id: str) -> int:
+    """Take the next sequence number of a tenant"""
+    response = get_orders_table().update_item(
+        Key={'PK': f'TENANT#{tenant_id}', 'SK': SEQUENCE_SK},
+        UpdateExpression='ADD seq :one',
+        ExpressionAttributeValues={':one': 1},
+        ReturnValues='UPDATED_NEW'
+    )
+    return int(response['Attributes']['seq'])
+
+
+def current_sequence(tenant_id: str) -> int:
+    """Last sequence number handed out for a tenant, 0 if none"""
+    item = get_orders_table().get_item(
+        Key={'PK': f'TENANT#{tenant_id}', 'SK': SEQUENCE_SK}
+    ).get('Item')
+    return int(item['seq']) if item else 0
+
+
+def log_event(
+    tenant_id: str,
+    message: Dict[str, Any],
+    routing: Optional[Dict[str, Any]] = None
+) -> Optional[int]:
+    """
+    Number a broadcast message and keep it in the tenant's event log
+
+    The sequence number is set on the message as `seq`. A failure leaves
+    the message unnumbered; clients that later resume past the missing
+    number are told to reload.
+
+    Args:
+        tenant_id: The tenant ID
+        message: The message about to be broadcast
+        routing: Who the message is for: orderId and customerId for order
+            events, channel for channel events, nothing for every connection
+
+    Returns:
+        The sequence number, None if the event could not be logged
+    """
+    if EVENT_LOG_TTL_SECONDS <= 0:
+        return None
+    try:
+        seq = next_sequence(tenant_id)
+        message['seq'] = seq
+        item = {
+            'PK': f'TENANT#{tenant_id}',
+            'SK': event_sk(seq),
+            'seq': seq,
+            'message': json.dumps(decimal_to_float(message), default=str),
+            'expiresAt': int(time.time()) + EVENT_LOG_TTL_SECONDS
+        }
+        item.update({k: v for k, v in (routing or {}).items() if v})
+        get_orders_table().put_item(Item=item)
+        return seq
+    except Exception as e:
+        message.pop('seq', None)
+        print(f"Event log unavailable for {tenant_id}: {str(e)}")
+        return None
+
+
+def events_since(tenant_id: str, last_seq: int) -> Dict[str, Any]:
+    """
+    Logged events of a tenant after a sequence number
+
+    Args:
+        tenant_id: The tenant ID
+        last_seq: Last sequence number the client saw
+
+    Returns:
+        Dictionary with the events (oldest first), the sequence number the
+        client is at after applying them and reset=True when the events
+        after last_seq can no longer be replayed completely
+    """
+    current = current_sequence(tenant_id)
+    if last_seq >= current:
+        return {'events': [], 'lastSeq': current, 'reset': last_seq > current}
+    if current - last_seq > EVENT_LOG_MAX_REPLAY:
+        return {'events': [], 'lastSeq': current, 'reset': True}
+
+    now = time.time()
+    events: List[Dict[str, Any]] = []
+    for item in query_all_items(
+        get_orders_table(),
+        Key('PK').eq(f'TENANT#{tenant_id}')
+        & Key('SK').between(event_sk(last_seq + 1), event_sk(current))
+    ):
+        # TTL deletion lags; an expired event counts as gone
+        if item.get('expiresAt', 0) <= now or int(item['seq']) != last_seq + len(events) + 1:
+            return {'events': [], 'lastSeq': current, 'reset': True}
+        events.append(item)
+
+    # The newest events may still be on their way to the log; they reach
+    # the client as live broadcasts
+    return {'events': events, 'lastSeq': last_seq + len(events), 'reset': False}
@@ -5,7 +5,7 @@ import os
 import json
 import boto3
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
 
 # Initialize clients
@@ -14,6 +14,10 @@ sns = boto3.client('sns')
 sqs = boto3.client('sqs')
 stepfunctions = boto3.client('stepfunctions')
 
+# SendMessageBatch limits: entries per call and total size of the bodies
+SQS_MAX_BATCH_ENTRIES = 10
+SQS_MAX_BATCH_BYTES = 256 * 1024
+
 
 def publish_order_event(
     event_type: str,
@@ -100,7 +104,8 @@ def send_notification(
 def send_to_queue(
     queue_url: str,
     message: Dict[str, Any],
-    message_group_id: str = None
+    message_group_id: str = None,
+    delay_seconds: int = None
 ) -> Dict[str, Any]:
     """
     Send a message to SQS
@@ -109,6 +114,7 @@ def send_to_queue(
         queue_url: The SQS queue URL
         message: The message to send
         message_group_id: Optional message group ID for FIFO queues
+        delay_seconds: Optional delivery delay (0-900 seconds)
 
     Returns:
         SQS response
@@ -121,10 +127,64 @@ def send_to_queue(
     if message_group_id:
         params['MessageGroupId'] = message_group_id
 
+    if delay_seconds:
+        params['DelaySeconds'] = delay_seconds
+
     response = sqs.send_message(**params)
     return response
 
 
+def send_batch_to_queue(queue_url: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Send messages to SQS in SendMessageBatch calls
+
+    A batch holds at most SQS_MAX_BATCH_ENTRIES messages and
+    SQS_MAX_BATCH_BYTES of bodies; a message too large to share a batch is
+    sent alone. A failed call does not stop the remaining batches.
+
+    Args:
+        queue_url: The SQS queue URL
+        messages: The messages to send
+
+    Returns:
+        The messages SQS did not accept (empty when all were sent)
+    """
+    batches: List[List[Tuple[Dict[str, Any], str]]] = []
+    batch_bytes = 0
+    for message in messages:
+        body = json.dumps(message)
+        size = len(body.encode('utf-8'))
+        if (
+            not batches
+            or len(batches[-1]) >= SQS_MAX_BATCH_ENTRIES
+            or batch_bytes + size > SQS_MAX_BATCH_BYTES
+        ):
+            batches.append([])
+            batch_bytes = 0
+        batches[-1].append((message, body))
+        batch_bytes += size
+
+    rejected = []
+    for batch in batches:
+        try:
+            response = sqs.send_message_batch(
+                QueueUrl=queue_url,
+                Entries=[
+                    {'Id': str(index), 'MessageBody': body}
+                    for index, (_, body) in enumerate(batch)
+                ]
+            )
+        except Exception as e:
+            print(f"SQS batch of {len(batch)} messages failed: {str(e)}")
+            rejected.extend(message for message, _ in batch)
+            continue
+        for failure in response.get('Failed', []):
+            print(f"SQS rejected a message: {failure}")
+            rejected.append(batch[int(failure['Id'])][0])
+
+    return rejected
+
+
 def start_order_workflow(
     tenant_id: str,
     order_id: str,
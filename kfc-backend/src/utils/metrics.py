@@ -0,0 +1,53 @@
+"""
+CloudWatch metrics via Embedded Metric Format (EMF)
+
+Metrics are written as structured log lines, which CloudWatch turns into
+metrics without an extra PutMetricData call from the Lambda.
+"""
+import json
+import time
+from typing import Dict, Optional
+
+
+METRICS_NAMESPACE = 'KFC/Orders'
+
+
+def emit_metrics(
+    metrics: Dict[str, float],
+    dimensions: Optional[Dict[str, str]] = None,
+    unit: str = 'Count',
+    namespace: str = METRICS_NAMESPACE
+) -> None:
+    """
+    Emit one or more metrics sharing the same dimensions
+
+    Args:
+        metrics: Metric names to values
+        dimensions: Dimension names to values (e.g. {'TenantId': 'kfc-main'})
+        unit: CloudWatch unit for all metrics
+        namespace: CloudWatch namespace
+    """
+    dimensions = dimensions or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': [list(dimensions.keys())],
+                'Metrics': [{'Name': name, 'Unit': unit} for name in metrics]
+            }]
+        },
+        **dimensions,
+        **metrics
+    }
+    print(json.dumps(record))
+
+
+def emit_metric(
+    name: str,
+    value: float = 1,
+    dimensions: Optional[Dict[str, str]] = None,
+    unit: str = 'Count'
+) -> None:
+    """Emit a single metric"""
+    emit_metrics({name: value}, dimensions, unit)
@@ -0,0 +1,50 @@
+"""
+Sort key ranges of orders by creation time
+
+Order IDs are ULIDs, whose first 10 characters encode the creation time in
+milliseconds, so a date range maps to a range of ORDER#<id> sort keys.
+The bounds are widened by a second on each side; callers that need them
+exact also filter on createdAt.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from boto3.dynamodb.conditions import Key
+
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+
+def ulid_time_prefix(moment: datetime) -> str:
+    """First 10 ULID characters (millisecond timestamp) of a UTC time"""
+    millis = max(0, int((moment - datetime(1970, 1, 1)).total_seconds() * 1000))
+    chars = []
+    for _ in range(10):
+        chars.append(CROCKFORD_ALPHABET[millis % 32])
+        millis //= 32
+    return ''.join(reversed(chars))
+
+
+def order_key_condition(
+    tenant_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """
+    Key condition for the orders of a tenant created in a date range
+
+    Args:
+        tenant_id: The tenant ID
+        start: Earliest creation time, None for no lower bound
+        end: Latest creation time, None for no upper bound
+
+    Returns:
+        A KeyConditionExpression on PK and SK
+    """
+    key_condition = Key('PK').eq(f'TENANT#{tenant_id}')
+    if not start and not end:
+        return key_condition & Key('SK').begins_with('ORDER#')
+
+    lower = ulid_time_prefix(start - timedelta(seconds=1)) if start else ''
+    upper = ulid_time_prefix(end + timedelta(seconds=1)) if end else 'Z' * 10
+    return key_condition & Key('SK').between(f'ORDER#{lower}', f'ORDER#{upper}' + 'Z' * 16)
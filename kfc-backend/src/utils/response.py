@@ -34,7 +34,8 @@ def create_response(
     default_headers = {
         'Content-Type': 'application/json',
         'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,X-Tenant-Id',
+        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,X-Tenant-Id,If-None-Match',
+        'Access-Control-Expose-Headers': 'ETag,Retry-After,X-Cache,Age',
         'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
     }
 
@@ -52,12 +53,16 @@ def create_response(
     return response
 
 
-def success_response(data: Any = None, message: str = "Success") -> Dict[str, Any]:
+def success_response(
+    data: Any = None,
+    message: str = "Success",
+    headers: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
     """Create a success response (200)"""
     body = {"success": True, "message": message}
     if data is not None:
         body["data"] = data
-    return create_response(200, body)
+    return create_response(200, body, headers)
 
 
 def created_response(data: Any = None, message: str = "Created") -> Dict[str, Any]:
@@ -68,6 +73,18 @@ def created_response(data: Any = None, message: str = "Created") -> Dict[str, An
     return create_response(201, body)
 
 
+def accepted_response(
+    data: Any = None,
+    message: str = "Accepted",
+    headers: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """Create an accepted response (202)"""
+    body = {"success": True, "message": message}
+    if data is not None:
+        body["data"] = data
+    return create_response(202, body, headers)
+
+
 def error_response(
     message: str,
     status_code: int = 400,
@@ -98,3 +115,25 @@ def forbidden_response(message: str = "Forbidden") -> Dict[str, Any]:
 def internal_error_response(message: str = "Internal server error") -> Dict[str, Any]:
     """Create an internal error response (500)"""
     return error_response(message, 500)
+
+
+def too_many_requests_response(message: str, retry_after: int) -> Dict[str, Any]:
+    """Create a too many requests response (429) with Retry-After"""
+    body = {"success": False, "message": message, "retryAfter": retry_after}
+    return create_response(429, body, {'Retry-After': str(retry_after)})
+
+
+def not_modified_response(etag: str) -> Dict[str, Any]:
+    """Create a not modified response (304) with no body"""
+    return create_response(304, headers={'ETag': etag})
+
+
+def build_etag(*parts: Any) -> str:
+    """Build a strong ETag from the given parts"""
+    return '"' + ':'.join(str(part) for part in parts) + '"'
+
+
+def get_if_none_match(event: Dict[str, Any]) -> Optional[str]:
+    """Get the If-None-Match request header (case-insensitive)"""
+    headers = event.get('headers', {}) or {}
+    return headers.get('If-None-Match') or headers.get('if-none-match')
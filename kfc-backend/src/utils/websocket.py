@@ -3,22 +3,116 @@ WebSocket utilities for real-time communication
 """
 import os
 import json
+import time
+import threading
+from datetime import datetime
 import boto3
-from typing import Any, Dict, List
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
 from boto3.dynamodb.conditions import Key
-from .dynamodb import get_connections_table, query_items, decimal_to_float
-
-
-def get_api_gateway_management_client():
-    """Get API Gateway Management API client"""
-    endpoint = os.environ.get('WEBSOCKET_API_ENDPOINT')
+from .dynamodb import (
+    get_connections_table, get_tenants_table, query_all_items, scan_all_items, scan_items,
+    batch_delete_items, decimal_to_float
+)
+from .websocket_routing import ConnectionIndex, CHANNEL_DASHBOARD, connection_role, is_staff_role
+from .events import send_batch_to_queue
+from .event_log import log_event, events_since
+from . import connection_registry
+from .metrics import emit_metrics
+
+
+# Concurrent posts per broadcast
+FANOUT_MAX_WORKERS = int(os.environ.get('WEBSOCKET_FANOUT_WORKERS', 16))
+# Per-post timeouts (seconds); a slow client must not hold up a broadcast
+POST_CONNECT_TIMEOUT = float(os.environ.get('WEBSOCKET_POST_CONNECT_TIMEOUT', 1))
+POST_READ_TIMEOUT = float(os.environ.get('WEBSOCKET_POST_READ_TIMEOUT', 2))
+
+# Broadcasts to at least this many connections are split into shards of
+# FANOUT_SHARD_SIZE and delivered by fan-out workers from the queue
+FANOUT_QUEUE_URL = os.environ.get('WEBSOCKET_FANOUT_QUEUE_URL')
+FANOUT_SHARD_THRESHOLD = int(os.environ.get('WEBSOCKET_FANOUT_SHARD_THRESHOLD', 500))
+FANOUT_SHARD_SIZE = int(os.environ.get('WEBSOCKET_FANOUT_SHARD_SIZE', 200))
+# Shard messages carry the payload; larger ones are delivered directly
+FANOUT_MAX_SHARD_PAYLOAD_BYTES = 200 * 1024
+
+# Resume and RPC replies are split into messages of at most this size
+# (API Gateway rejects WebSocket frames over 128 KB)
+MAX_MESSAGE_BYTES = 96 * 1024
+
+# Connection rows expire (table TTL on expiresAt) unless a ping refreshes them
+CONNECTION_TTL_SECONDS = int(os.environ.get('WEBSOCKET_CONNECTION_TTL_SECONDS', 3600))
+# The sweeper probes connections that have not pinged for this long
+CONNECTION_STALE_SECONDS = int(os.environ.get('WEBSOCKET_CONNECTION_STALE_SECONDS', 900))
+
+# Outcomes of a post to a connection
+SENT = 'sent'
+GONE = 'gone'
+FAILED = 'failed'
+UNAVAILABLE = 'unavailable'
+
+# Management API clients by endpoint, reused across messages and invocations
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_api_gateway_management_client(endpoint: str = None):
+    """Get the (cached) API Gateway Management API client of an endpoint"""
+    endpoint = endpoint or os.environ.get('WEBSOCKET_API_ENDPOINT')
     if not endpoint:
         print("WARNING: WEBSOCKET_API_ENDPOINT not configured")
         return None
-    return boto3.client(
-        'apigatewaymanagementapi',
-        endpoint_url=endpoint
-    )
+
+    client = _clients.get(endpoint)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(endpoint)
+            if client is None:
+                client = boto3.client(
+                    'apigatewaymanagementapi',
+                    endpoint_url=endpoint,
+                    config=Config(
+                        connect_timeout=POST_CONNECT_TIMEOUT,
+                        read_timeout=POST_READ_TIMEOUT,
+                        retries={'max_attempts': 2, 'mode': 'standard'},
+                        max_pool_connections=max(10, FANOUT_MAX_WORKERS)
+                    )
+                )
+                _clients[endpoint] = client
+    return client
+
+
+def encode_message(data: Dict[str, Any]) -> bytes:
+    """Serialize a message for posting"""
+    return json.dumps(data).encode('utf-8')
+
+
+def post_to_connection(connection_id: str, payload: bytes, client=None) -> str:
+    """
+    Post an encoded message to a connection
+
+    Args:
+        connection_id: The WebSocket connection ID
+        payload: The encoded message (see encode_message)
+        client: Management API client (defaults to the cached one)
+
+    Returns:
+        SENT, GONE (the connection no longer exists), FAILED or UNAVAILABLE
+    """
+    client = client or get_api_gateway_management_client()
+    if not client:
+        print(f"WebSocket client not available, cannot send to {connection_id}")
+        return UNAVAILABLE
+    try:
+        client.post_to_connection(ConnectionId=connection_id, Data=payload)
+        return SENT
+    except Exception as e:
+        error_str = str(e)
+        if 'GoneException' in error_str or 'Gone' in error_str:
+            return GONE
+        print(f"Error sending to connection {connection_id}: {error_str}")
+        return FAILED
 
 
 def send_to_connection(connection_id: str, data: Dict[str, Any]) -> bool:
@@ -32,38 +126,272 @@ def send_to_connection(connection_id: str, data: Dict[str, Any]) -> bool:
     Returns:
         True if successful, False otherwise
     """
-    try:
-        client = get_api_gateway_management_client()
-        if not client:
-            print(
-                f"WebSocket client not available, cannot send to {connection_id}")
-            return False
-        client.post_to_connection(
-            ConnectionId=connection_id,
-            Data=json.dumps(data).encode('utf-8')
-        )
-        return True
-    except Exception as e:
-        error_str = str(e)
-        if 'GoneException' in error_str or 'Gone' in error_str:
-            # Connection no longer exists, clean it up
-            cleanup_connection(connection_id)
-        else:
-            print(f"Error sending to connection {connection_id}: {error_str}")
-        return False
+    outcome = post_to_connection(connection_id, encode_message(data))
+    if outcome == GONE:
+        # Connection no longer exists, clean it up
+        cleanup_connection(connection_id)
+    return outcome == SENT
+
+
+def send_to_connections(
+    connection_ids: Iterable[str],
+    data: Union[Dict[str, Any], bytes],
+    max_workers: int = None
+) -> Dict[str, str]:
+    """
+    Send one message to many connections concurrently
+
+    The message is serialized once and posted through a bounded thread
+    pool sharing one cached client. Gone connections are cleaned up.
+
+    Args:
+        connection_ids: The WebSocket connection IDs
+        data: The data to send, or a message encoded with encode_message
+        max_workers: Concurrent posts (defaults to FANOUT_MAX_WORKERS)
+
+    Returns:
+        Outcome (SENT, GONE, FAILED or UNAVAILABLE) per connection ID
+    """
+    payload = data if isinstance(data, bytes) else encode_message(data)
+    return send_payloads(
+        {connection_id: payload for connection_id in connection_ids if connection_id},
+        max_workers
+    )
+
+
+def send_payloads(payloads: Dict[str, bytes], max_workers: int = None) -> Dict[str, str]:
+    """
+    Post encoded messages to connections concurrently
+
+    Args:
+        payloads: Encoded message per connection ID; connections sharing a
+            message should share the same bytes object
+        max_workers: Concurrent posts (defaults to FANOUT_MAX_WORKERS)
+
+    Returns:
+        Outcome (SENT, GONE, FAILED or UNAVAILABLE) per connection ID
+    """
+    connection_ids = list(payloads)
+    if not connection_ids:
+        return {}
+
+    client = get_api_gateway_management_client()
+    if not client:
+        return {connection_id: UNAVAILABLE for connection_id in connection_ids}
+
+    def post(connection_id):
+        return post_to_connection(connection_id, payloads[connection_id], client)
+
+    workers = max(1, min(max_workers or FANOUT_MAX_WORKERS, len(connection_ids)))
+    if workers == 1:
+        outcomes = [post(c) for c in connection_ids]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(post, connection_ids))
+
+    results = dict(zip(connection_ids, outcomes))
+    cleanup_connections(c for c, outcome in results.items() if outcome == GONE)
+    return results
 
 
 def cleanup_connection(connection_id: str) -> bool:
-    """Remove a stale connection from DynamoDB"""
+    """Remove a connection from DynamoDB"""
     try:
         table = get_connections_table()
-        table.delete_item(Key={'connectionId': connection_id})
+        old = table.delete_item(
+            Key={'connectionId': connection_id},
+            ReturnValues='ALL_OLD'
+        ).get('Attributes') or {}
+        if old.get('tenantId'):
+            connection_registry.bump_version(old['tenantId'], connection_role(old), -1)
         return True
     except Exception as e:
         print(f"Error cleaning up connection {connection_id}: {str(e)}")
         return False
 
 
+def cleanup_connections(connection_ids: Iterable[str]) -> int:
+    """Remove stale connections from DynamoDB in batched deletes"""
+    keys = [{'connectionId': c} for c in dict.fromkeys(connection_ids)]
+    if not keys:
+        return 0
+    try:
+        return batch_delete_items(get_connections_table(), keys)
+    except Exception as e:
+        print(f"Error cleaning up {len(keys)} connections: {str(e)}")
+        return 0
+
+
+def connection_expires_at(now: float = None) -> int:
+    """expiresAt (epoch seconds) of a connection row seen now"""
+    return int(now or time.time()) + CONNECTION_TTL_SECONDS
+
+
+def is_live_connection(connection: Dict[str, Any], now: float = None) -> bool:
+    """False for rows past their expiresAt that TTL has not deleted yet"""
+    expires_at = connection.get('expiresAt')
+    return expires_at is None or expires_at > (now or time.time())
+
+
+def touch_connection(connection_id: str) -> bool:
+    """
+    Refresh a connection's expiresAt and lastSeenAt (heartbeat)
+
+    Returns:
+        False if the connection row no longer exists
+    """
+    try:
+        get_connections_table().update_item(
+            Key={'connectionId': connection_id},
+            UpdateExpression='SET expiresAt = :exp, lastSeenAt = :seen',
+            ConditionExpression='attribute_exists(connectionId)',
+            ExpressionAttributeValues={
+                ':exp': connection_expires_at(),
+                ':seen': datetime.utcnow().isoformat()
+            }
+        )
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def is_gone(connection_id: str, client=None) -> bool:
+    """Whether API Gateway no longer knows a connection"""
+    client = client or get_api_gateway_management_client()
+    if not client:
+        return False
+    try:
+        client.get_connection(ConnectionId=connection_id)
+        return False
+    except Exception as e:
+        error_str = str(e)
+        return 'GoneException' in error_str or 'Gone' in error_str
+
+
+def sweep_stale_connections(now: float = None) -> Dict[str, int]:
+    """
+    Remove dead connection rows
+
+    Rows past their expiresAt are deleted outright. Rows that have not
+    pinged for CONNECTION_STALE_SECONDS (or that predate expiresAt) are
+    probed with GetConnection, concurrently, and deleted when gone.
+    Deletes are batched. The remaining rows are recounted into each
+    tenant's presence counters (see connection_registry).
+
+    Returns:
+        Dict with scanned, expired, probed, deleted and recounted counts
+    """
+    started = time.time()
+    now = now or started
+    stale_before = datetime.utcfromtimestamp(now - CONNECTION_STALE_SECONDS).isoformat()
+
+    scanned = 0
+    expired = []
+    stale = []
+    live = {}
+    for connection in scan_all_items(
+        get_connections_table(),
+        projection='connectionId, tenantId, userType, expiresAt, lastSeenAt, connectedAt',
+        # The rows are recounted; a scan missing a fresh row would undercount
+        consistent_read=True
+    ):
+        scanned += 1
+        connection_id = connection['connectionId']
+        live[connection_id] = connection
+        if not is_live_connection(connection, now):
+            expired.append(connection_id)
+        elif (connection.get('lastSeenAt') or connection.get('connectedAt') or '') < stale_before:
+            stale.append(connection_id)
+
+    gone = []
+    client = get_api_gateway_management_client()
+    if stale and client:
+        workers = max(1, min(FANOUT_MAX_WORKERS, len(stale)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            probes = list(pool.map(lambda c: is_gone(c, client), stale))
+        gone = [c for c, is_dead in zip(stale, probes) if is_dead]
+
+    deleted = cleanup_connections(expired + gone)
+    for connection_id in expired + gone:
+        live.pop(connection_id, None)
+
+    return {
+        'scanned': scanned,
+        'expired': len(expired),
+        'probed': len(stale) if client else 0,
+        'deleted': deleted,
+        'recounted': recount_presence(live.values(), started)
+    }
+
+
+def recount_presence(connections: Iterable[Dict[str, Any]], counted_from: float) -> int:
+    """
+    Reset the presence counters of every tenant from its live connection rows
+
+    Tenants of the tenants table with no rows left are reset to zero.
+
+    Returns:
+        Number of tenants whose counters were written
+    """
+    counts: Dict[str, Dict[str, int]] = {}
+    for connection in connections:
+        if connection.get('tenantId'):
+            roles = counts.setdefault(connection['tenantId'], {})
+            role = connection_role(connection)
+            roles[role] = roles.get(role, 0) + 1
+
+    try:
+        for tenant in scan_items(get_tenants_table()):
+            counts.setdefault(tenant['tenantId'], {})
+    except Exception as e:
+        print(f"Presence recount: tenants unavailable: {str(e)}")
+
+    written = 0
+    for tenant_id, roles in counts.items():
+        try:
+            written += connection_registry.reconcile_presence(tenant_id, roles, counted_from)
+        except Exception as e:
+            print(f"Presence recount failed for {tenant_id}: {str(e)}")
+    return written
+
+
+def get_presence(tenant_id: str) -> Dict[str, Any]:
+    """
+    Connected clients of a tenant per role, from the presence counters
+
+    Returns:
+        Dictionary with the count per role, staff and total counts, and
+        known=False while the counters have not been recounted yet
+    """
+    roles = connection_registry.get_presence(tenant_id)
+    return {
+        'known': roles is not None,
+        'byRole': roles or {},
+        'staff': sum(n for role, n in (roles or {}).items() if is_staff_role(role)),
+        'total': sum((roles or {}).values())
+    }
+
+
+def has_listeners(tenant_id: str, staff_only: bool = False) -> bool:
+    """
+    Whether a broadcast to a tenant may reach anyone
+
+    False only when the presence counters are known and show no connection
+    (of a staff role, with staff_only); unknown counts never skip a broadcast.
+    """
+    presence = get_presence(tenant_id)
+    if not presence['known']:
+        return True
+    return (presence['staff'] if staff_only else presence['total']) > 0
+
+
+def _skipped_broadcast() -> Dict[str, Any]:
+    """Result of a broadcast skipped because nobody is connected"""
+    return {**broadcast_result({}, 0), 'mode': 'skipped'}
+
+
 def broadcast_to_tenant(tenant_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Broadcast a message to all connections for a specific tenant
@@ -73,32 +401,260 @@ def broadcast_to_tenant(tenant_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         data: The data to send
 
     Returns:
-        Dictionary with success count and failure count
+        Dictionary with success, failure and gone counts and the outcome
+        per connection ID
     """
-    table = get_connections_table()
+    log_event(tenant_id, data)
+    if not has_listeners(tenant_id):
+        return _skipped_broadcast()
+
+    index = get_connection_index(tenant_id)
+    return broadcast_to_connections(tenant_id, index.all(), data, len(index.connection_ids))
+
+
+def get_tenant_connections(tenant_id: str) -> List[Dict[str, Any]]:
+    """Live connection items of a tenant"""
+    now = time.time()
+    return [
+        connection for connection in query_all_items(
+            get_connections_table(),
+            Key('tenantId').eq(tenant_id),
+            index_name='TenantIndex'
+        )
+        if is_live_connection(connection, now)
+    ]
+
+
+def get_connection_index(tenant_id: str) -> ConnectionIndex:
+    """Routing index of a tenant's connections (see connection_registry)"""
+    return connection_registry.get_index(tenant_id, load_connection_index)
+
+
+def load_connection_index(tenant_id: str) -> ConnectionIndex:
+    """Routing index of a tenant's connections, from the TenantIndex GSI"""
+    return ConnectionIndex(get_tenant_connections(tenant_id))
+
+
+def broadcast_to_connections(
+    tenant_id: str,
+    connection_ids: Iterable[str],
+    data: Union[Dict[str, Any], bytes],
+    total_connections: int = None
+) -> Dict[str, Any]:
+    """
+    Send a message to a set of connections of a tenant
+
+    Args:
+        tenant_id: The tenant ID
+        connection_ids: Target connection IDs
+        data: The data to send, or a message encoded with encode_message
+        total_connections: Connections of the tenant, for the result
 
-    # Query connections for this tenant
-    connections = query_items(
-        table,
-        Key('tenantId').eq(tenant_id),
-        index_name='TenantIndex'
+    Returns:
+        Broadcast result (see deliver_payloads)
+    """
+    payload = data if isinstance(data, bytes) else encode_message(data)
+    return deliver_payloads(
+        tenant_id,
+        {connection_id: payload for connection_id in connection_ids if connection_id},
+        total_connections
     )
 
-    success_count = 0
-    failure_count = 0
 
-    for connection in connections:
-        connection_id = connection.get('connectionId')
-        if connection_id:
-            if send_to_connection(connection_id, data):
-                success_count += 1
-            else:
-                failure_count += 1
+def deliver_payloads(
+    tenant_id: str,
+    payloads: Dict[str, bytes],
+    total_connections: int = None
+) -> Dict[str, Any]:
+    """
+    Deliver encoded messages directly or through the fan-out workers
+
+    Broadcasts to fewer than FANOUT_SHARD_THRESHOLD connections are posted
+    from the calling Lambda. Larger ones are split into shards of
+    FANOUT_SHARD_SIZE connections, one queue message per shard, which
+    fan-out workers deliver in parallel (see deliver_shard). Shards the
+    queue did not accept are posted directly, so no connection gets a
+    message twice or not at all.
+
+    Args:
+        tenant_id: The tenant ID
+        payloads: Encoded message per connection ID
+        total_connections: Connections of the tenant, for the result
+
+    Returns:
+        For direct delivery, success, failure and gone counts and the
+        outcome per connection ID; for sharded delivery, the number of
+        shards queued; for mixed delivery (some shards posted directly),
+        both. mode tells which
+    """
+    shards = 0
+    if (
+        FANOUT_QUEUE_URL
+        and len(payloads) >= FANOUT_SHARD_THRESHOLD
+        and all(len(p) <= FANOUT_MAX_SHARD_PAYLOAD_BYTES for p in payloads.values())
+    ):
+        if total_connections is None:
+            total_connections = len(payloads)
+        shards, unqueued = _queue_shards(tenant_id, payloads)
+        if not unqueued:
+            return {
+                'mode': 'sharded',
+                'shards': shards,
+                'targeted_connections': len(payloads),
+                'total_connections': total_connections
+            }
+        print(f"Fan-out queue took {shards} shards for {tenant_id}, "
+              f"delivering {len(unqueued)} connections directly")
+        payloads = unqueued
+
+    started = time.perf_counter()
+    result = broadcast_result(send_payloads(payloads), total_connections)
+    _emit_delivery_metrics(tenant_id, 'direct', result, time.perf_counter() - started)
+    if result['gone_count']:
+        connection_registry.forget(
+            tenant_id, [c for c, outcome in result['outcomes'].items() if outcome == GONE])
+    if shards:
+        return {**result, 'mode': 'mixed', 'shards': shards}
+    return {**result, 'mode': 'direct'}
+
+
+def _queue_shards(tenant_id: str, payloads: Dict[str, bytes]) -> Tuple[int, Dict[str, bytes]]:
+    """
+    Split a broadcast into shards and queue one message per shard
+
+    Returns:
+        Number of shards queued and the payloads of the connections whose
+        shards were not
+    """
+    groups: Dict[bytes, List[str]] = {}
+    for connection_id, payload in payloads.items():
+        groups.setdefault(payload, []).append(connection_id)
+
+    queued_at = time.time()
+    messages = []
+    for payload, connection_ids in groups.items():
+        body = payload.decode('utf-8')
+        for start in range(0, len(connection_ids), FANOUT_SHARD_SIZE):
+            messages.append({
+                'tenantId': tenant_id,
+                'payload': body,
+                'connectionIds': connection_ids[start:start + FANOUT_SHARD_SIZE],
+                'queuedAt': queued_at
+            })
+
+    try:
+        rejected = send_batch_to_queue(FANOUT_QUEUE_URL, messages)
+    except Exception as e:
+        print(f"Fan-out queue unavailable for {tenant_id}: {str(e)}")
+        rejected = messages
+
+    unqueued = {
+        connection_id: payloads[connection_id]
+        for message in rejected for connection_id in message['connectionIds']
+    }
+    queued = len(messages) - len(rejected)
+    emit_metrics({
+        'BroadcastShardsQueued': queued,
+        'BroadcastShardsRejected': len(rejected)
+    }, {'TenantId': tenant_id})
+    return queued, unqueued
+
+
+def deliver_shard(shard: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Deliver one queued broadcast shard (fan-out worker)
+
+    Args:
+        shard: Shard message with tenantId, payload, connectionIds and
+            queuedAt
+
+    Returns:
+        Broadcast result of the shard
+    """
+    payload = shard['payload'].encode('utf-8')
+    started = time.perf_counter()
+    result = broadcast_result(send_payloads(
+        {connection_id: payload for connection_id in shard.get('connectionIds', [])}))
+    _emit_delivery_metrics(
+        shard.get('tenantId', 'unknown'),
+        'sharded',
+        result,
+        time.perf_counter() - started,
+        queued_at=shard.get('queuedAt')
+    )
+    return result
+
+
+def _emit_delivery_metrics(
+    tenant_id: str,
+    path: str,
+    result: Dict[str, Any],
+    seconds: float,
+    queued_at: float = None
+) -> None:
+    """Delivery counts and latency of a broadcast (or shard)"""
+    if not result.get('targeted_connections'):
+        return
+    dimensions = {'TenantId': tenant_id, 'DeliveryPath': path}
+    emit_metrics({
+        'BroadcastDelivered': result['success_count'],
+        'BroadcastFailed': result['failure_count'] - result['gone_count'],
+        'BroadcastGone': result['gone_count']
+    }, dimensions)
+    latency = {'BroadcastSendMs': round(seconds * 1000, 1)}
+    if queued_at:
+        latency['BroadcastEndToEndMs'] = round((time.time() - queued_at) * 1000, 1)
+    emit_metrics(latency, dimensions, unit='Milliseconds')
+
+
+def broadcast_result(outcomes: Dict[str, str], total_connections: int = None) -> Dict[str, Any]:
+    """Summary of the outcomes of a broadcast"""
+    success_count = sum(1 for outcome in outcomes.values() if outcome == SENT)
 
     return {
         'success_count': success_count,
-        'failure_count': failure_count,
-        'total_connections': len(connections)
+        'failure_count': len(outcomes) - success_count,
+        'gone_count': sum(1 for outcome in outcomes.values() if outcome == GONE),
+        'targeted_connections': len(outcomes),
+        'total_connections': len(outcomes) if total_connections is None else total_connections,
+        'outcomes': outcomes
+    }
+
+
+def _counts(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Broadcast result without the per-connection outcomes, for logging"""
+    return {k: v for k, v in result.items() if k != 'outcomes'}
+
+
+def order_update_delta(
+    order_id: str,
+    status: str,
+    order_data: Dict[str, Any],
+    from_version: int = None,
+    from_status: str = None
+) -> Dict[str, Any]:
+    """
+    Changed fields of an order update, for connections in delta mode
+
+    fromVersion is the version the delta applies to: the one before the
+    update, or before the first of several coalesced updates (from_version,
+    with from_status as previousStatus). Clients apply the delta when they
+    hold that version, and fetch the full order otherwise.
+    """
+    steps = order_data.get('workflow', {}).get('steps') or []
+    version = order_data.get('version')
+    version = int(version) if version is not None else None
+    if from_version is None and version is not None:
+        from_version = version - 1
+    return {
+        'orderId': order_id,
+        'status': status,
+        'previousStatus': from_status or order_data.get('previousStatus'),
+        'version': version,
+        'fromVersion': from_version,
+        'updatedAt': order_data.get('updatedAt', ''),
+        'step': steps[-1].get('step') if steps else None,
+        'timestamp': order_data.get('updatedAt', '')
     }
 
 
@@ -106,21 +662,30 @@ def broadcast_order_update(
     tenant_id: str,
     order_id: str,
     status: str,
-    order_data: Dict[str, Any]
+    order_data: Dict[str, Any],
+    from_version: int = None,
+    from_status: str = None
 ) -> Dict[str, Any]:
     """
-    Broadcast an order status update to all connections for a tenant
+    Send an order status update to the staff screens of a tenant and to
+    the order's customer
+
+    Connections in delta mode get only the changed fields and the order
+    version; the others get the full order. Each form is encoded once.
 
     Args:
         tenant_id: The tenant ID
         order_id: The order ID
         status: The new status
         order_data: The full order data
+        from_version: Version the update starts from, when it stands for
+            several coalesced updates (see order_update_delta)
+        from_status: Status the update starts from, likewise
 
     Returns:
         Broadcast result
     """
-    message = {
+    full = {
         'type': 'order_update',
         'payload': {
             'orderId': order_id,
@@ -129,15 +694,43 @@ def broadcast_order_update(
             'timestamp': order_data.get('updatedAt', '')
         }
     }
+    # The full form is logged; both forms carry its sequence number
+    seq = log_event(tenant_id, full, {
+        'orderId': order_id,
+        'customerId': order_data.get('customerId')
+    })
+
+    if not has_listeners(tenant_id):
+        return _skipped_broadcast()
+
+    index = get_connection_index(tenant_id)
+    targets = index.order_targets({**order_data, 'orderId': order_id})
+    delta_targets = targets & index.delta
+    full_targets = targets - delta_targets
+
+    payloads = {}
+    if full_targets:
+        payloads.update(dict.fromkeys(full_targets, encode_message(full)))
+    if delta_targets:
+        delta = {
+            'type': 'order_update',
+            'mode': 'delta',
+            'payload': decimal_to_float(order_update_delta(
+                order_id, status, order_data, from_version, from_status))
+        }
+        if seq is not None:
+            delta['seq'] = seq
+        payloads.update(dict.fromkeys(delta_targets, encode_message(delta)))
 
-    result = broadcast_to_tenant(tenant_id, message)
-    print(f"WebSocket broadcast result for order {order_id}: {result}")
+    result = deliver_payloads(tenant_id, payloads, len(index.connection_ids))
+    print(f"WebSocket broadcast result for order {order_id}: {_counts(result)}")
     return result
 
 
 def broadcast_new_order(tenant_id: str, order_data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Broadcast a new order notification to all connections for a tenant
+    Send a new order notification to the staff screens of a tenant and to
+    the order's customer
 
     Args:
         tenant_id: The tenant ID
@@ -153,9 +746,17 @@ def broadcast_new_order(tenant_id: str, order_data: Dict[str, Any]) -> Dict[str,
             'timestamp': order_data.get('createdAt', '')
         }
     }
-
-    result = broadcast_to_tenant(tenant_id, message)
-    print(f"WebSocket broadcast new order: {result}")
+    log_event(tenant_id, message, {
+        'orderId': order_data.get('orderId'),
+        'customerId': order_data.get('customerId')
+    })
+    if not has_listeners(tenant_id):
+        return _skipped_broadcast()
+
+    index = get_connection_index(tenant_id)
+    result = broadcast_to_connections(
+        tenant_id, index.order_targets(order_data), message, len(index.connection_ids))
+    print(f"WebSocket broadcast new order: {_counts(result)}")
     return result
 
 
@@ -164,7 +765,8 @@ def broadcast_dashboard_update(
     dashboard_data: Dict[str, Any]
 ) -> Dict[str, Any]:
     """
-    Broadcast a dashboard update to all connections for a tenant
+    Send a dashboard update to the staff connections of a tenant that
+    watch the dashboard
 
     Args:
         tenant_id: The tenant ID
@@ -177,8 +779,85 @@ def broadcast_dashboard_update(
         'type': 'dashboard_update',
         'payload': dashboard_data
     }
+    log_event(tenant_id, message, {'channel': CHANNEL_DASHBOARD})
+    if not has_listeners(tenant_id, staff_only=True):
+        return _skipped_broadcast()
+
+    index = get_connection_index(tenant_id)
+    return broadcast_to_connections(
+        tenant_id,
+        index.channel_targets(CHANNEL_DASHBOARD),
+        message,
+        len(index.connection_ids)
+    )
 
-    return broadcast_to_tenant(tenant_id, message)
+
+def chunk_by_size(
+    items: Iterable[Dict[str, Any]],
+    max_bytes: int = MAX_MESSAGE_BYTES
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Group items into lists whose encoded size stays under max_bytes
+
+    Items are consumed lazily, so a list is yielded as soon as it is full.
+    """
+    batch: List[Dict[str, Any]] = []
+    size = 0
+    for item in items:
+        item_size = len(encode_message(item))
+        if batch and size + item_size > max_bytes:
+            yield batch
+            batch = []
+            size = 0
+        batch.append(item)
+        size += item_size
+    if batch:
+        yield batch
+
+
+def resume_connection(connection_id: str, last_seq: int) -> Dict[str, Any]:
+    """
+    Replay to a reconnected client the events it missed
+
+    The events after last_seq that the connection would have received are
+    sent in order, packed into 'resume' messages; the last one has
+    done=True. With reset=True the client must reload instead.
+
+    Args:
+        connection_id: The connection ID
+        last_seq: Last sequence number the client saw
+
+    Returns:
+        Dictionary with the replayed event count, the client's new sequence
+        number and the reset flag
+    """
+    connection = get_connections_table().get_item(
+        Key={'connectionId': connection_id}
+    ).get('Item')
+    if not connection:
+        raise ValueError(f'Unknown connection {connection_id}')
+
+    log = events_since(connection['tenantId'], last_seq)
+    index = ConnectionIndex([connection])
+    events = [
+        json.loads(event['message']) for event in log['events']
+        if connection_id in index.event_targets(event)
+    ]
+
+    batches = list(chunk_by_size(events)) or [[]]
+    client = get_api_gateway_management_client()
+    for number, batch in enumerate(batches, start=1):
+        outcome = post_to_connection(connection_id, encode_message({
+            'type': 'resume',
+            'events': batch,
+            'lastSeq': log['lastSeq'],
+            'reset': log['reset'],
+            'done': number == len(batches)
+        }), client)
+        if outcome != SENT:
+            raise RuntimeError(f'Resume of {connection_id} interrupted: {outcome}')
+
+    return {'replayed': len(events), 'lastSeq': log['lastSeq'], 'reset': log['reset']}
 
 
 def save_connection(
@@ -199,13 +878,14 @@ def save_connection(
     Returns:
         True if successful
     """
-    from datetime import datetime
-
     table = get_connections_table()
+    now = datetime.utcnow().isoformat()
     item = {
         'connectionId': connection_id,
         'tenantId': tenant_id,
-        'connectedAt': datetime.utcnow().isoformat(),
+        'connectedAt': now,
+        'lastSeenAt': now,
+        'expiresAt': connection_expires_at()
     }
 
     if user_id:
@@ -214,4 +894,5 @@ def save_connection(
         item['userType'] = user_type
 
     table.put_item(Item=item)
+    connection_registry.bump_version(tenant_id, connection_role(item), 1)
     return True
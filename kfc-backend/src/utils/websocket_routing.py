@@ -0,0 +1,140 @@
+"""
+Routing of WebSocket messages to the connections that should get them
+
+Connections of a tenant are indexed by role, customer ID, subscribed
+order IDs and subscribed channels, so an order message reaches the staff
+screens and the phones of the order's own customer instead of every
+connection of the tenant.
+"""
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set
+
+
+CUSTOMER_ROLE = 'customer'
+
+# Channels a staff connection can subscribe to; 'all' receives everything
+CHANNEL_ALL = 'all'
+CHANNEL_ORDERS = 'orders'
+CHANNEL_KITCHEN = 'kitchen'
+CHANNEL_DASHBOARD = 'dashboard'
+
+# Order update encodings a connection can ask for
+PAYLOAD_FULL = 'full'
+PAYLOAD_DELTA = 'delta'
+
+# Order messages go to staff subscribed to any of these channels
+ORDER_CHANNELS = (CHANNEL_ALL, CHANNEL_ORDERS, CHANNEL_KITCHEN)
+
+
+def connection_role(connection: Dict[str, Any]) -> str:
+    """Normalized role (userType) of a connection; customer when unset"""
+    role = str(connection.get('userType') or CUSTOMER_ROLE).lower()
+    # Roles name presence counters; anything odd is counted as 'other'
+    return role if re.fullmatch(r'[a-z][a-z_-]{0,31}', role) else 'other'
+
+
+def is_staff_role(role: str) -> bool:
+    return role != CUSTOMER_ROLE
+
+
+def connection_channels(connection: Dict[str, Any]) -> Set[str]:
+    """
+    Channels a connection subscribed to
+
+    An explicit channel list wins over the subscriptionType; a connection
+    that never chose receives everything.
+    """
+    channels = set(connection.get('channels') or [])
+    if not channels and connection.get('subscriptionType'):
+        channels.add(connection['subscriptionType'])
+    return channels or {CHANNEL_ALL}
+
+
+class ConnectionIndex:
+    """Index of a tenant's connections by role, customer, order and channel"""
+
+    def __init__(self, connections: Iterable[Dict[str, Any]] = ()):
+        self.by_role: Dict[str, Set[str]] = defaultdict(set)
+        self.by_customer: Dict[str, Set[str]] = defaultdict(set)
+        self.by_order: Dict[str, Set[str]] = defaultdict(set)
+        self.by_channel: Dict[str, Set[str]] = defaultdict(set)
+        self.connection_ids: Set[str] = set()
+        # Connections that asked for delta-encoded order updates
+        self.delta: Set[str] = set()
+        for connection in connections:
+            self.add(connection)
+
+    def add(self, connection: Dict[str, Any]) -> None:
+        """Index one connection item"""
+        connection_id = connection.get('connectionId')
+        if not connection_id:
+            return
+        self.connection_ids.add(connection_id)
+
+        role = connection_role(connection)
+        self.by_role[role].add(connection_id)
+
+        if role == CUSTOMER_ROLE:
+            if connection.get('userId'):
+                self.by_customer[connection['userId']].add(connection_id)
+        else:
+            for channel in connection_channels(connection):
+                self.by_channel[channel].add(connection_id)
+
+        for order_id in connection.get('orderIds') or []:
+            self.by_order[order_id].add(connection_id)
+
+        if connection.get('payloadMode') == PAYLOAD_DELTA:
+            self.delta.add(connection_id)
+
+    def remove(self, connection_id: str) -> None:
+        """Unindex a connection"""
+        self.connection_ids.discard(connection_id)
+        self.delta.discard(connection_id)
+        for groups in (self.by_role, self.by_customer, self.by_order, self.by_channel):
+            for members in groups.values():
+                members.discard(connection_id)
+
+    def staff(self, channels: Iterable[str]) -> Set[str]:
+        """Staff connections subscribed to any of the channels (or to all)"""
+        targets = set(self.by_channel.get(CHANNEL_ALL, ()))
+        for channel in channels:
+            targets |= self.by_channel.get(channel, set())
+        return targets
+
+    def order_targets(self, order: Dict[str, Any]) -> Set[str]:
+        """
+        Connections an order message goes to
+
+        Staff on an order channel, the connections of the order's customer
+        and any connection that subscribed to the order ID.
+        """
+        targets = self.staff(ORDER_CHANNELS)
+        customer_id = order.get('customerId')
+        if customer_id:
+            targets |= self.by_customer.get(customer_id, set())
+        order_id = order.get('orderId')
+        if order_id:
+            targets |= self.by_order.get(order_id, set())
+        return targets
+
+    def channel_targets(self, channel: str) -> Set[str]:
+        """Staff connections of a channel"""
+        return self.staff((channel,))
+
+    def event_targets(self, routing: Dict[str, Any]) -> Set[str]:
+        """
+        Connections a logged event goes to (see event_log.log_event)
+
+        Order events carry orderId/customerId, channel events a channel and
+        tenant-wide events neither.
+        """
+        if routing.get('orderId') or routing.get('customerId'):
+            return self.order_targets(routing)
+        if routing.get('channel'):
+            return self.channel_targets(routing['channel'])
+        return set(self.connection_ids)
+
+    def all(self) -> List[str]:
+        return list(self.connection_ids)
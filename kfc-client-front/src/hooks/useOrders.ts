@@ -1,3 +1,4 @@
+import { useCallback } from "react";
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import orderService, {
   CreateOrderData,
@@ -68,6 +69,44 @@ export const useOrderTracking = (orderId: string) => {
   });
 };
 
+export interface OrderDelta {
+  orderId: string;
+  status?: string;
+  version?: number | null;
+  // Version the delta applies to; several coalesced updates arrive as one
+  // delta, so this can be more than one version behind `version`
+  fromVersion?: number | null;
+  updatedAt?: string;
+}
+
+// Apply a delta-encoded order update to the cached order. Returns false
+// when there is nothing cached or the cached order is not the version the
+// delta starts from, so the caller fetches the full order instead.
+export const useApplyOrderDelta = (orderId: string) => {
+  const queryClient = useQueryClient();
+
+  return useCallback(
+    (delta: OrderDelta) => {
+      const cached = queryClient.getQueryData<any>(["orders", orderId]);
+      if (!cached || delta.version == null || cached.version == null) {
+        return false;
+      }
+      const fromVersion = delta.fromVersion ?? delta.version - 1;
+      if (Number(cached.version) !== fromVersion) {
+        return false;
+      }
+      queryClient.setQueryData(["orders", orderId], {
+        ...cached,
+        status: mapBackendStatus(delta.status),
+        version: delta.version,
+        updatedAt: delta.updatedAt ?? cached.updatedAt,
+      });
+      return true;
+    },
+    [queryClient, orderId]
+  );
+};
+
 export const useCreateOrder = () => {
   const queryClient = useQueryClient();
 
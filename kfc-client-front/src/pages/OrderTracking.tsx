@@ -5,7 +5,11 @@ import { Card } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import { Skeleton } from "@/components/ui/skeleton";
-import { useOrder, useOrderTracking } from "@/hooks/useOrders";
+import {
+  useOrder,
+  useOrderTracking,
+  useApplyOrderDelta,
+} from "@/hooks/useOrders";
 import websocketService from "@/services/websocket.service";
 import {
   CheckCircle2,
@@ -37,23 +41,31 @@ const OrderTracking = () => {
   const navigate = useNavigate();
   const { data: order, isLoading, refetch } = useOrder(orderId || "");
   const { data: tracking } = useOrderTracking(orderId || "");
+  const applyOrderDelta = useApplyOrderDelta(orderId || "");
   const [showRating, setShowRating] = useState(false);
   const [rating, setRating] = useState(0);
 
   useEffect(() => {
-    // Connect to WebSocket for real-time updates
-    websocketService.connect();
+    // Connect to WebSocket for real-time updates of this order
+    websocketService
+      .connect()
+      .then(() => orderId && websocketService.watchOrder(orderId))
+      .catch(() => undefined);
 
     const unsubscribe = websocketService.onOrderUpdate((data: any) => {
       if (data.orderId === orderId) {
-        refetch();
+        // Delta updates carry no order: fetch it only on a version gap
+        if (data.order || !applyOrderDelta(data)) {
+          refetch();
+        }
       }
     });
 
     return () => {
       unsubscribe();
+      if (orderId) websocketService.unwatchOrder(orderId);
     };
-  }, [orderId, refetch]);
+  }, [orderId, refetch, applyOrderDelta]);
 
   if (isLoading) {
     return (
@@ -1,6 +1,7 @@
 import { API_CONFIG } from "@/config/api";
 
 type MessageHandler = (data: unknown) => void;
+type PayloadMode = "full" | "delta";
 
 class WebSocketService {
   private ws: WebSocket | null = null;
@@ -9,6 +10,13 @@ class WebSocketService {
   private reconnectDelay = 3000;
   private handlers: Map<string, Set<MessageHandler>> = new Map();
   private isConnecting = false;
+  private heartbeat: ReturnType<typeof setInterval> | null = null;
+  // Pings keep the server-side connection row from expiring
+  private heartbeatInterval = 5 * 60 * 1000;
+  // Orders whose updates are routed to this connection; a new connection
+  // starts without them, so they are sent again on every (re)connect
+  private watchedOrders: Set<string> = new Set();
+  private payloadMode: PayloadMode = "delta";
 
   connect(tenantId: string = API_CONFIG.TENANT_ID): Promise<void> {
     return new Promise((resolve, reject) => {
@@ -37,11 +45,16 @@ class WebSocketService {
           console.log("WebSocket connected");
           this.isConnecting = false;
           this.reconnectAttempts = 0;
+          this.startHeartbeat();
 
-          // Subscribe to tenant updates
+          // Subscribe to tenant updates, and again to any watched orders
           this.send({
             action: "subscribe",
             tenantId,
+            ...(this.watchedOrders.size > 0 && {
+              orderIds: Array.from(this.watchedOrders),
+              payloadMode: this.payloadMode,
+            }),
           });
 
           resolve();
@@ -72,6 +85,7 @@ class WebSocketService {
 
         this.ws.onclose = () => {
           console.log("WebSocket disconnected");
+          this.stopHeartbeat();
           this.isConnecting = false;
           this.attemptReconnect(tenantId);
         };
@@ -101,12 +115,28 @@ class WebSocketService {
     }
   }
 
+  private startHeartbeat(): void {
+    this.stopHeartbeat();
+    this.heartbeat = setInterval(() => {
+      this.send({ action: "ping" });
+    }, this.heartbeatInterval);
+  }
+
+  private stopHeartbeat(): void {
+    if (this.heartbeat) {
+      clearInterval(this.heartbeat);
+      this.heartbeat = null;
+    }
+  }
+
   disconnect(): void {
+    this.stopHeartbeat();
     if (this.ws) {
       this.ws.close();
       this.ws = null;
     }
     this.handlers.clear();
+    this.watchedOrders.clear();
   }
 
   send(data: unknown): void {
@@ -133,6 +163,30 @@ class WebSocketService {
     this.handlers.get(eventType)?.delete(handler);
   }
 
+  // Ask the server to route an order's updates to this connection, as
+  // deltas (changed fields and the order version) by default. The order
+  // stays watched across reconnects until unwatchOrder
+  watchOrder(
+    orderId: string,
+    tenantId: string = API_CONFIG.TENANT_ID,
+    payloadMode: PayloadMode = "delta"
+  ): void {
+    this.watchedOrders.add(orderId);
+    this.payloadMode = payloadMode;
+    this.send({
+      action: "subscribe",
+      tenantId,
+      orderIds: [orderId],
+      payloadMode,
+    });
+  }
+
+  // Stop re-sending an order on reconnect (the current connection keeps
+  // receiving its updates until it closes)
+  unwatchOrder(orderId: string): void {
+    this.watchedOrders.delete(orderId);
+  }
+
   // Convenience methods for order tracking
   subscribeToOrder(orderId: string, handler: MessageHandler): () => void {
     return this.on(`order:${orderId}`, handler);
@@ -22,6 +22,7 @@ export const ENDPOINTS = {
 
   // Orders (Operations)
   ORDERS: `/tenants/${API_CONFIG.TENANT_ID}/orders`,
+  ORDERS_ACTIVE: `/tenants/${API_CONFIG.TENANT_ID}/orders/active`,
   ORDER: (orderId: string) =>
     `/tenants/${API_CONFIG.TENANT_ID}/orders/${orderId}`,
   ORDERS_BY_STATUS: (status: string) =>
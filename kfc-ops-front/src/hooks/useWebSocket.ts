@@ -28,6 +28,12 @@ export const useWebSocket = () => {
         queryClient.invalidateQueries({ queryKey: ["dashboard"] });
       });
 
+      // Reconnected after missing more events than the server can replay
+      const unsubResync = websocketService.on("resync", () => {
+        queryClient.invalidateQueries({ queryKey: ["orders"] });
+        queryClient.invalidateQueries({ queryKey: ["dashboard"] });
+      });
+
       const unsubInventoryAlert = websocketService.on("inventoryAlert", () => {
         queryClient.invalidateQueries({ queryKey: ["inventory"] });
         queryClient.invalidateQueries({ queryKey: ["inventory", "alerts"] });
@@ -37,6 +43,7 @@ export const useWebSocket = () => {
         unsubOrderReceived();
         unsubOrderUpdated();
         unsubOrderCancelled();
+        unsubResync();
         unsubInventoryAlert();
       };
     }
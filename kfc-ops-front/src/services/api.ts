@@ -120,6 +120,12 @@ export interface DashboardStats {
   salesTotal?: number;
   salesChange?: number;
   activeOrders?: number;
+  presence?: {
+    known: boolean;
+    byRole: Record<string, number>;
+    staff: number;
+    total: number;
+  };
   customersServed?: number;
   customerChange?: number;
   prepTimeChange?: number;
@@ -1,5 +1,6 @@
 import apiClient, { Order, ApiResponse } from "./api";
 import { ENDPOINTS } from "@/config/api";
+import websocketService from "./websocket.service";
 
 type WorkflowAction =
   | "take"
@@ -47,11 +48,41 @@ class OrdersService {
     return response as ApiResponse<Order[]>;
   }
 
-  // Get single order details
+  // Get single order details (over the open socket when possible)
   async getOrder(orderId: string): Promise<ApiResponse<Order>> {
+    if (websocketService.isConnected()) {
+      try {
+        const order = await websocketService.request<Order>("orders.get", { orderId });
+        return { success: true, data: order };
+      } catch (error) {
+        console.warn("[WS] orders.get failed, falling back to HTTP:", error);
+      }
+    }
     return apiClient.get<Order>(ENDPOINTS.ORDER(orderId));
   }
 
+  // Get active orders (over the open socket when possible)
+  async getActiveOrders(statuses?: string[]): Promise<ApiResponse<Order[]>> {
+    if (websocketService.isConnected()) {
+      try {
+        const orders = await websocketService.request<Order[]>("orders.active", { statuses });
+        return { success: true, data: orders };
+      } catch (error) {
+        console.warn("[WS] orders.active failed, falling back to HTTP:", error);
+      }
+    }
+
+    const response = await apiClient.get<{ orders?: Order[] }>(ENDPOINTS.ORDERS_ACTIVE);
+    if (response.success) {
+      const orders = response.data?.orders ?? [];
+      return {
+        ...response,
+        data: statuses?.length ? orders.filter((o) => statuses.includes(o.status)) : orders,
+      };
+    }
+    return response as ApiResponse<Order[]>;
+  }
+
   // Get orders in queue
   async getQueue(): Promise<ApiResponse<QueueOrder[]>> {
     return apiClient.get<QueueOrder[]>(ENDPOINTS.QUEUE);
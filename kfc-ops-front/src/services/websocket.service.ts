@@ -8,6 +8,34 @@ interface WebSocketMessage {
   type?: string;
   data?: unknown;
   payload?: unknown;
+  seq?: number;
+  lastSeq?: number;
+}
+
+interface RpcResponse {
+  type: "rpc_response";
+  id: number;
+  part: number;
+  done: boolean;
+  result?: unknown;
+  items?: unknown[];
+  error?: { code: string; message: string };
+}
+
+interface PendingRequest {
+  resolve: (value: unknown) => void;
+  reject: (error: Error) => void;
+  items: unknown[];
+  onItems?: (items: unknown[]) => void;
+  timer: ReturnType<typeof setTimeout>;
+}
+
+interface ResumeMessage {
+  type: "resume";
+  events: WebSocketMessage[];
+  lastSeq: number;
+  reset: boolean;
+  done: boolean;
 }
 
 class WebSocketService {
@@ -17,6 +45,16 @@ class WebSocketService {
   private reconnectDelay = 3000;
   private handlers: Map<string, Set<MessageHandler>> = new Map();
   private isConnecting = false;
+  private heartbeat: ReturnType<typeof setInterval> | null = null;
+  // Pings keep the server-side connection row from expiring
+  private heartbeatInterval = 5 * 60 * 1000;
+  // Last event sequence number seen; on reconnect the server replays
+  // only what came after it
+  private lastSeq = 0;
+  // Requests over the socket, by request id
+  private nextRequestId = 1;
+  private pending: Map<number, PendingRequest> = new Map();
+  private requestTimeout = 10000;
 
   connect(): void {
     if (this.ws?.readyState === WebSocket.OPEN || this.isConnecting) {
@@ -35,6 +73,7 @@ class WebSocketService {
         console.log("Operations WebSocket connected");
         this.isConnecting = false;
         this.reconnectAttempts = 0;
+        this.startHeartbeat();
         this.emit("connected", null);
 
         // Subscribe to operations channel
@@ -43,6 +82,10 @@ class WebSocketService {
           type: "subscription",
           data: { channels: ["orders", "kitchen", "inventory", "staff"] },
         });
+
+        if (this.lastSeq > 0) {
+          this.send({ action: "resume", lastSeq: this.lastSeq });
+        }
       };
 
       this.ws.onmessage = (event) => {
@@ -56,6 +99,8 @@ class WebSocketService {
 
       this.ws.onclose = () => {
         console.log("Operations WebSocket disconnected");
+        this.stopHeartbeat();
+        this.failPendingRequests("WebSocket disconnected");
         this.isConnecting = false;
         this.emit("disconnected", null);
         this.attemptReconnect();
@@ -72,7 +117,65 @@ class WebSocketService {
     }
   }
 
+  private handleResume(message: ResumeMessage): void {
+    if (message.reset) {
+      // Too much was missed to replay; reload instead
+      this.lastSeq = message.lastSeq;
+      this.emit("resync", null);
+      return;
+    }
+
+    message.events.forEach((event) => this.handleMessage(event));
+    if (message.done) {
+      this.lastSeq = Math.max(this.lastSeq, message.lastSeq);
+    }
+  }
+
+  private handleRpcResponse(message: RpcResponse): void {
+    const request = this.pending.get(message.id);
+    if (!request) return;
+
+    if (message.error) {
+      this.settle(message.id);
+      request.reject(new Error(message.error.message));
+      return;
+    }
+    if (message.items) {
+      request.items.push(...message.items);
+      request.onItems?.(message.items);
+    }
+    if (message.done) {
+      this.settle(message.id);
+      request.resolve(message.items ? request.items : message.result);
+    }
+  }
+
+  private settle(id: number): void {
+    const request = this.pending.get(id);
+    if (request) clearTimeout(request.timer);
+    this.pending.delete(id);
+  }
+
+  private failPendingRequests(reason: string): void {
+    this.pending.forEach((request, id) => {
+      this.settle(id);
+      request.reject(new Error(reason));
+    });
+  }
+
   private handleMessage(message: WebSocketMessage): void {
+    if (message.type === "rpc_response") {
+      this.handleRpcResponse(message as unknown as RpcResponse);
+      return;
+    }
+    if (message.type === "resume") {
+      this.handleResume(message as unknown as ResumeMessage);
+      return;
+    }
+    if (typeof message.seq === "number") {
+      this.lastSeq = Math.max(this.lastSeq, message.seq);
+    }
+
     const { type, action } = message;
     const payload = message.payload ?? message.data;
     const eventType = (type || action || "").toLowerCase();
@@ -119,7 +222,22 @@ class WebSocketService {
     }, this.reconnectDelay * this.reconnectAttempts);
   }
 
+  private startHeartbeat(): void {
+    this.stopHeartbeat();
+    this.heartbeat = setInterval(() => {
+      this.send({ action: "ping" });
+    }, this.heartbeatInterval);
+  }
+
+  private stopHeartbeat(): void {
+    if (this.heartbeat) {
+      clearInterval(this.heartbeat);
+      this.heartbeat = null;
+    }
+  }
+
   disconnect(): void {
+    this.stopHeartbeat();
     if (this.ws) {
       this.ws.close();
       this.ws = null;
@@ -193,6 +311,35 @@ class WebSocketService {
     });
   }
 
+  // Read data over the socket (orders.active, orders.get, queue.counts).
+  // Streamed methods resolve with every item; onItems sees each part.
+  request<T>(
+    method: string,
+    params?: Record<string, unknown>,
+    onItems?: (items: unknown[]) => void
+  ): Promise<T> {
+    if (!this.isConnected()) {
+      return Promise.reject(new Error("WebSocket not connected"));
+    }
+
+    const id = this.nextRequestId++;
+    return new Promise<T>((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`${method} timed out`));
+      }, this.requestTimeout);
+
+      this.pending.set(id, {
+        resolve: resolve as (value: unknown) => void,
+        reject,
+        items: [],
+        onItems,
+        timer,
+      });
+      this.ws!.send(JSON.stringify({ id, method, params: params ?? {} }));
+    });
+  }
+
   isConnected(): boolean {
     return this.ws?.readyState === WebSocket.OPEN;
   }